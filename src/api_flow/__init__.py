@@ -1,14 +1,22 @@
+from api_flow.bundle import compile_bundle, load_bundle
 from api_flow.config import Config
 from api_flow.context import Context
-from api_flow.flow import Flow
+from api_flow.flow import AsyncFlow, Flow
+from api_flow.hooks import Hooks, OpenTelemetryHooks, add_hooks, remove_hooks
+from api_flow.load import LoadReport, LoadTest
+from api_flow.log import configure_logging
 from api_flow.profiles import Profiles
+from api_flow.report import RunReport
+from api_flow.run import Run
+from api_flow.session import AsyncSession, Session
 
 
-def configure(data_path=None, flow_path=None, function_path=None, profile_path=None, template_path=None):
+def configure(data_path=None, flow_path=None, function_path=None, profile_path=None, template_path=None,
+              cache_path=None):
     """ Shortcut method to configure resource paths for api_flow
         See Config.configure
     """
-    Config.configure(data_path, flow_path, function_path, profile_path, template_path)
+    Config.configure(data_path, flow_path, function_path, profile_path, template_path, cache_path)
 
 
 def execute(flow_name, profile=None, profiles=None, **kwargs):
@@ -18,3 +26,12 @@ def execute(flow_name, profile=None, profiles=None, **kwargs):
     flow_instance = Flow(flow_name, profile=profile, profiles=profiles, **kwargs)
     flow_instance.execute()
     return flow_instance
+
+
+async def execute_async(flow_name, profile=None, profiles=None, **kwargs):
+    """ Shortcut to create and execute a flow on the running event loop.
+        See AsyncFlow and Flow.__init__
+    """
+    flow_instance = AsyncFlow(flow_name, profile=profile, profiles=profiles, **kwargs)
+    await flow_instance.execute()
+    return flow_instance
@@ -1,5 +1,6 @@
 import api_flow
 import argparse
+import logging
 import os
 import sys
 
@@ -12,7 +13,8 @@ parser.add_argument(
     'flow_name',
     metavar='flow',
     type=str,
-    help='basename of the YAML file containing a flow definition'
+    nargs='?',
+    help='basename of the YAML file containing a flow definition (default: the flow of --bundle)'
 )
 paths = parser.add_argument_group('optional data paths', 'Customize the data file locations for api-flow')
 paths.add_argument(
@@ -50,6 +52,13 @@ paths.add_argument(
     metavar='DIR',
     help='a directory containing template files (default: <data_path>/templates)'
 )
+paths.add_argument(
+    '--cache-path',
+    dest='cache_path',
+    type=str,
+    metavar='DIR',
+    help='a directory for cached prerequisite outputs, shared between runs (default: in memory only)'
+)
 parser.add_argument(
     '--profile',
     action='append',
@@ -57,29 +66,176 @@ parser.add_argument(
     metavar='PROFILE',
     help='basename of a profile YAML file to include (multiple --profile flags are allowed)'
 )
+bundles = parser.add_argument_group('bundles', 'Precompile a flow and everything it reads for fast startup')
+bundles.add_argument(
+    '--compile',
+    dest='compile_path',
+    type=str,
+    metavar='FILE',
+    help='write the flow, its prerequisites, profiles and templates to a bundle FILE instead of running it'
+)
+bundles.add_argument(
+    '--bundle',
+    dest='bundle_path',
+    type=str,
+    metavar='FILE',
+    help='run from a bundle FILE written by --compile instead of reading the data paths'
+)
+connections = parser.add_argument_group('connection pooling', 'Tune the HTTP session shared by every request')
+connections.add_argument(
+    '--pool-size',
+    dest='pool_size',
+    type=int,
+    default=api_flow.session.DEFAULT_POOL_SIZE,
+    metavar='N',
+    help=f'number of per-host connection pools to keep (default: {api_flow.session.DEFAULT_POOL_SIZE})'
+)
+connections.add_argument(
+    '--max-connections',
+    dest='max_connections',
+    type=int,
+    default=api_flow.session.DEFAULT_MAX_CONNECTIONS,
+    metavar='N',
+    help=f'connections kept alive per host (default: {api_flow.session.DEFAULT_MAX_CONNECTIONS})'
+)
+connections.add_argument(
+    '--http2',
+    action='store_true',
+    help='negotiate HTTP/2 where supported (requires httpx[http2])'
+)
+connections.add_argument(
+    '--connect-timeout',
+    dest='connect_timeout',
+    type=float,
+    metavar='SECONDS',
+    help=f'default seconds to wait for a connection, 0 for no limit '
+         f'(default: {api_flow.config.DEFAULT_CONNECT_TIMEOUT})'
+)
+connections.add_argument(
+    '--read-timeout',
+    dest='read_timeout',
+    type=float,
+    metavar='SECONDS',
+    help=f'default seconds to wait for the server to send data, 0 for no limit '
+         f'(default: {api_flow.config.DEFAULT_READ_TIMEOUT})'
+)
+load = parser.add_argument_group('load testing', 'Run the flow repeatedly and report throughput and latency')
+load.add_argument(
+    '--iterations',
+    type=int,
+    default=1,
+    metavar='N',
+    help='number of times to run the flow (default: 1)'
+)
+load.add_argument(
+    '--concurrency',
+    type=int,
+    default=1,
+    metavar='N',
+    help='number of flows to run at the same time (default: 1)'
+)
+load.add_argument(
+    '--rate',
+    type=float,
+    metavar='FLOWS_PER_SECOND',
+    help='maximum number of flows to start per second (default: unlimited)'
+)
+load.add_argument(
+    '--retain-responses',
+    dest='retain_responses',
+    type=int,
+    metavar='N',
+    help='keep the responses of only the last N successful steps of each run, and of failed steps '
+         '(default: keep every response)'
+)
+output = parser.add_argument_group('output', 'Control how much is logged during the run')
+output.add_argument(
+    '-q', '--quiet',
+    action='count',
+    default=0,
+    help='log flow and step progress only; repeat (-qq) to log failures only'
+)
+output.add_argument(
+    '--log-body-limit',
+    dest='log_body_limit',
+    type=int,
+    metavar='CHARS',
+    help=f'truncate logged request/response bodies to CHARS characters, 0 for no limit '
+         f'(default: {api_flow.config.DEFAULT_LOG_BODY_LIMIT})'
+)
+output.add_argument(
+    '--report',
+    dest='report_path',
+    type=str,
+    metavar='FILE',
+    help='write the per-step timings of the run (or the load test report) to FILE as JSON'
+)
 
 
 args = parser.parse_args()
+if args.flow_name is None and (args.bundle_path is None or args.compile_path):
+    parser.error('a flow is required unless running from --bundle')
 
 api_flow.configure(
     data_path=args.data_path,
     flow_path=args.flow_path,
     function_path=args.function_path,
     profile_path=args.profile_path,
-    template_path=args.template_path
-)
-print('DATA PATHS:', file=sys.stderr)
-print(f'     Base: {api_flow.Config.data_path}', file=sys.stderr)
-print(f'    Flows: {api_flow.Config.flow_path}', file=sys.stderr)
-print(f'Functions: {api_flow.Config.function_path}', file=sys.stderr)
-print(f' Profiles: {api_flow.Config.profile_path}', file=sys.stderr)
-print(f'Templates: {api_flow.Config.template_path}', file=sys.stderr)
+    template_path=args.template_path,
+    cache_path=args.cache_path
+)
+if args.log_body_limit is not None:
+    api_flow.Config.log_body_limit = args.log_body_limit
+if args.connect_timeout is not None:
+    api_flow.Config.connect_timeout = args.connect_timeout
+if args.read_timeout is not None:
+    api_flow.Config.read_timeout = args.read_timeout
+if args.retain_responses is not None:
+    api_flow.Config.retain_responses = args.retain_responses
+api_flow.log.configure_logging([logging.DEBUG, logging.INFO, logging.ERROR][min(args.quiet, 2)])
+
+if args.compile_path:
+    api_flow.compile_bundle(args.flow_name, args.compile_path, profiles=args.profile)
+    sys.exit(0)
+
+if args.bundle_path:
+    bundle = api_flow.load_bundle(args.bundle_path)
+    args.flow_name = args.flow_name or bundle['flow']
+    args.profile = args.profile or bundle['profiles']
+
+if not args.quiet:
+    print('DATA PATHS:', file=sys.stderr)
+    print(f'     Base: {api_flow.Config.data_path}', file=sys.stderr)
+    print(f'    Flows: {api_flow.Config.flow_path}', file=sys.stderr)
+    print(f'Functions: {api_flow.Config.function_path}', file=sys.stderr)
+    print(f' Profiles: {api_flow.Config.profile_path}', file=sys.stderr)
+    print(f'Templates: {api_flow.Config.template_path}', file=sys.stderr)
+    if api_flow.Config.cache_path:
+        print(f'    Cache: {api_flow.Config.cache_path}', file=sys.stderr)
+
+    if args.profile:
+        print('PROFILES:', file=sys.stderr)
+        for profile in args.profile:
+            print(f' - {os.path.join(api_flow.Config.profile_path, profile)}.yaml', file=sys.stderr)
 
-if args.profile:
-    print('PROFILES:', file=sys.stderr)
-    for profile in args.profile:
-        print(f' - {os.path.join(api_flow.Config.profile_path, profile)}.yaml', file=sys.stderr)
+    print(f'FLOW:\n {os.path.join(api_flow.Config.flow_path, args.flow_name)}.yaml', file=sys.stderr)
 
-print(f'FLOW:\n {os.path.join(api_flow.Config.flow_path, args.flow_name)}.yaml', file=sys.stderr)
+    if args.bundle_path:
+        print(f'BUNDLE:\n {args.bundle_path}', file=sys.stderr)
 
-api_flow.execute(args.flow_name, profiles=args.profile)
+with api_flow.Session(pool_size=args.pool_size, max_connections=args.max_connections, http2=args.http2) as session:
+    if args.iterations > 1 or args.concurrency > 1 or args.rate:
+        report = api_flow.LoadTest(
+            args.flow_name,
+            profiles=args.profile,
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            session=session
+        ).run()
+        print(report.format())
+    else:
+        report = api_flow.execute(args.flow_name, profiles=args.profile, session=session).flow_report
+    if args.report_path:
+        with open(args.report_path, 'w') as report_file:
+            report_file.write(report.to_json())
@@ -0,0 +1,151 @@
+import logging
+import os
+import pickle
+from api_flow import complex_namespace, jsonpath, template
+from api_flow.complex_namespace import ComplexNamespace, freeze
+from api_flow.config import Config
+from api_flow.jsonpath import compile_jsonpath
+from api_flow.profiles import Profiles
+from api_flow.template import Template
+
+
+"""
+A bundle is a single file holding everything a flow run reads at startup:
+the flow definition and every flow in its "depends_on" closure, the profiles,
+the template files those flows name and their compiled JSONPath outputs.
+
+    compile_bundle('checkout', 'checkout.bundle', profiles=['test'])
+    load_bundle('checkout.bundle')
+    execute('checkout', profiles=['test'])
+
+Once loaded, bundled documents take precedence over the files they were
+compiled from, so a bundle must be compiled again after editing its sources.
+Bundles are pickled: only load bundles you compiled yourself.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Incremented whenever the bundle layout changes
+BUNDLE_VERSION = 1
+
+
+def compile_bundle(flow_name, bundle_path, profile=None, profiles=None):
+    """
+    Resolve a flow, its prerequisite flows, profiles and templates from the
+    configured data paths and write them to a bundle file.
+    :param flow_name: the base name of the flow to bundle
+    :type flow_name: str
+    :param bundle_path: the bundle file to write
+    :type bundle_path: str
+    :param profile: an optional single profile, as for Flow
+    :type profile: str | None
+    :param profiles: optional profile names, as for Flow
+    :type profiles: list[str] | str | None
+    :return: the bundle contents
+    :rtype: dict
+    :raise: ValueError if a flow or profile is not a YAML dictionary, or an
+            output expression is invalid
+    """
+    flows = {}
+    _collect_flows(flow_name, flows)
+    profile_names = Profiles._get_profiles(profile, list(profiles) if isinstance(profiles, list) else profiles)
+    bundle = {
+        'version': BUNDLE_VERSION,
+        'flow': flow_name,
+        'profiles': profile_names,
+        'flows': flows,
+        'profile_documents': dict(
+            (name, _load_document(os.path.join(Config.profile_path, f'{name}.yaml')))
+            for name in profile_names
+        ),
+        'templates': _collect_templates(flows.values()),
+        'jsonpaths': _collect_jsonpaths(flows.values())
+    }
+    with open(bundle_path, 'wb') as bundle_file:
+        pickle.dump(bundle, bundle_file, protocol=pickle.HIGHEST_PROTOCOL)
+    logger.info('Compiled %s flows, %s profiles and %s templates into %s',
+                len(flows), len(profile_names), len(bundle['templates']), bundle_path)
+    return bundle
+
+
+def load_bundle(bundle_path):
+    """
+    Read a bundle file and install its contents, so that flows, profiles,
+    templates and output expressions are taken from the bundle instead of
+    being read and parsed from the data paths. Paths are resolved against
+    the current Config, so configure paths before loading.
+    :param bundle_path: the bundle file to read
+    :type bundle_path: str
+    :return: the bundle contents
+    :rtype: dict
+    :raise: ValueError if the file was written by an incompatible version
+    """
+    with open(bundle_path, 'rb') as bundle_file:
+        bundle = pickle.load(bundle_file)
+    if not isinstance(bundle, dict) or bundle.get('version') != BUNDLE_VERSION:
+        raise ValueError(f'{bundle_path} is not a compatible api-flow bundle.')
+    for name, document in bundle['flows'].items():
+        complex_namespace._bundled_yaml[os.path.join(Config.flow_path, f'{name}.yaml')] = freeze(document)
+    for name, document in bundle['profile_documents'].items():
+        complex_namespace._bundled_yaml[os.path.join(Config.profile_path, f'{name}.yaml')] = freeze(document)
+    for name, source in bundle['templates'].items():
+        template._bundled_templates[os.path.join(Config.template_path, name)] = source
+    jsonpath._bundled_jsonpaths.update(bundle['jsonpaths'])
+    return bundle
+
+
+def unload_bundles():
+    """
+    Forget every loaded bundle, so that flows are read from the data paths
+    again.
+    """
+    complex_namespace._bundled_yaml.clear()
+    template._bundled_templates.clear()
+    jsonpath._bundled_jsonpaths.clear()
+
+
+def _load_document(file_path):
+    document = ComplexNamespace.load_yaml(file_path)
+    if not isinstance(document, dict):
+        raise ValueError(f'{file_path} is not a YAML dictionary.')
+    return document
+
+
+def _collect_flows(flow_name, flows):
+    if flow_name in flows:
+        return
+    document = _load_document(os.path.join(Config.flow_path, f'{flow_name}.yaml'))
+    flows[flow_name] = document
+    depends_on = document.get('depends_on', [])
+    for dependency in depends_on if isinstance(depends_on, list) else [depends_on]:
+        _collect_flows(dependency, flows)
+
+
+def _collect_templates(documents):
+    templates = {}
+
+    def visit(value):
+        if isinstance(value, str):
+            match = Template.TEMPLATE_TAG.fullmatch(value)
+            if match is not None and match.group(1) not in templates:
+                with open(os.path.join(Config.template_path, match.group(1))) as template_file:
+                    templates[match.group(1)] = template_file.read()
+        elif isinstance(value, dict):
+            for item in value.values():
+                visit(item)
+        elif isinstance(value, list):
+            for item in value:
+                visit(item)
+
+    for document in documents:
+        visit(document)
+    return templates
+
+
+def _collect_jsonpaths(documents):
+    expressions = {}
+    for document in documents:
+        for step_definition in (document.get('steps') or {}).values():
+            for expression in (step_definition.get('outputs') or {}).values():
+                expressions[expression] = compile_jsonpath(expression)
+    return expressions
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from api_flow.config import Config
+
+
+class MemoryCache:
+    """
+    Keeps cached prerequisite outputs in memory, for the lifetime of the
+    process. This is the default backend.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up an unexpired entry.
+        :param key: the cache key
+        :type key: str
+        :return: the cached value, or None if missing or expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self.entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        """
+        Store a value.
+        :param key: the cache key
+        :type key: str
+        :param value: the value to cache
+        :param ttl: the number of seconds the value stays valid
+        :type ttl: float
+        """
+        with self.lock:
+            self.entries[key] = (time.time() + ttl, value)
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        with self.lock:
+            self.entries.clear()
+
+
+class DiskCache:
+    """
+    Keeps cached prerequisite outputs as JSON files in a directory, so they
+    survive between processes (separate CLI or cron invocations, for example).
+    Values must be JSON-serializable.
+    """
+
+    def __init__(self, directory):
+        """
+        DiskCache constructor.
+        :param directory: the directory holding the cache files, created when
+                          the first value is stored
+        :type directory: str
+        """
+        self.directory = directory
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, f'{hashlib.sha256(key.encode()).hexdigest()}.json')
+
+    def get(self, key):
+        """
+        Look up an unexpired entry. Unreadable files count as missing.
+        :param key: the cache key
+        :type key: str
+        :return: the cached value, or None if missing or expired
+        """
+        try:
+            with open(self._get_path(key)) as cache_file:
+                entry = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if entry['expires'] <= time.time():
+            return None
+        return entry['value']
+
+    def set(self, key, value, ttl):
+        """
+        Store a value. The file is written under a temporary name and then
+        moved into place, so concurrent readers never see a partial entry.
+        Cached outputs are typically credentials, so the file is only
+        readable by its owner.
+        :param key: the cache key
+        :type key: str
+        :param value: the value to cache
+        :param ttl: the number of seconds the value stays valid
+        :type ttl: float
+        """
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        path = self._get_path(key)
+        temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}'
+        descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w') as cache_file:
+            json.dump({'key': key, 'expires': time.time() + ttl, 'value': value}, cache_file)
+        os.replace(temporary_path, path)
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        if os.path.isdir(self.directory):
+            for file_name in os.listdir(self.directory):
+                if file_name.endswith('.json'):
+                    os.remove(os.path.join(self.directory, file_name))
+
+
+MEMORY_CACHE = MemoryCache()
+
+
+def get_flow_cache():
+    """
+    The backend used for prerequisite flows that declare "cache": a DiskCache
+    in "Config.cache_path" if that is set, otherwise the process-wide
+    MEMORY_CACHE.
+    :rtype: MemoryCache | DiskCache
+    """
+    cache_path = Config.cache_path
+    return DiskCache(cache_path) if cache_path else MEMORY_CACHE
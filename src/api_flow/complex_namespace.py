@@ -1,42 +1,171 @@
+import logging
+import os
 import yaml
 from types import SimpleNamespace
 
+# Use the libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YAML_LOADER
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader as YAML_LOADER
+
+logger = logging.getLogger(__name__)
+
+# Parsed YAML documents, keyed by file path. Values are
+# ((modification time, size), data) tuples. The cached data is frozen (see
+# "freeze"), since every load of the same file shares it.
+_yaml_cache = {}
+
+# Documents installed from a precompiled bundle (see api_flow.bundle), keyed
+# by file path. These are used as-is, without consulting the file system.
+_bundled_yaml = {}
+
+
+class FrozenDict(dict):
+    """
+    A read-only dict. Cached YAML documents are made of these and FrozenList,
+    so that no caller can modify a document shared by every load of a file.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Cached YAML documents are read-only. Use ComplexNamespace.as_dict for a modifiable copy.')
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class FrozenList(list):
+    """
+    A read-only list, see FrozenDict.
+    """
+
+    _read_only = FrozenDict._read_only
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = clear = extend = insert = pop = remove = reverse = sort = _read_only
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def freeze(value):
+    """
+    Make a read-only copy of a parsed document.
+    :param value: any value
+    :return: the value with dicts and lists (recursively) replaced by
+             FrozenDicts and FrozenLists. Values that are already frozen are
+             returned as they are.
+    """
+    if value.__class__ in (FrozenDict, FrozenList):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    elif isinstance(value, list):
+        return FrozenList(map(freeze, value))
+    return value
+
+
+class NamespaceList(list):
+    """
+    A list whose dict members have been upgraded to ComplexNamespaces. Plain
+    lists held by a ComplexNamespace are upgraded to one when first read.
+    """
+
 
 class ComplexNamespace(SimpleNamespace):
     """
-    Extends SimpleNamespace with recursive transformation of nested dicts.
-    Enables universal dot-notation syntax in template tags.
+    Extends SimpleNamespace with transformation of nested dicts, enabling
+    universal dot-notation syntax in template tags.
+
+    The transformation is lazy: nested dicts and lists are kept as given and
+    only wrapped, one level at a time, when they are read. Wrapping copies the
+    keys of that level (never the values), so the source data is never
+    modified and parts of a large document that are never read are never
+    copied. Values that are never read are also handed back as-is by
+    "as_dict", except for frozen parts of cached YAML documents, which are
+    copied so that the result can always be modified.
     """
 
     @staticmethod
     def from_yaml(file_path, exit_on_error=True):
         """
-        Wraps yaml.safe_load with error handling to log and exit.
+        Wraps ComplexNamespace.load_yaml with error handling to log and exit.
         :param file_path: The file path to load.
         :param exit_on_error: (boolean, default True) Terminate immediately on error?
         :return: A ComplexNamespace containing deserialized YAML content.
         """
+        try:
+            yaml_data = ComplexNamespace.load_yaml(file_path)
+            if not isinstance(yaml_data, dict):
+                raise ValueError('YAML configuration documents for api_flow are expected to be dictionaries.')
+            return ComplexNamespace(**yaml_data)
+        except ValueError as e:
+            logger.error('Unexpected YAML config in %s: %s', file_path, e)
+            if exit_on_error:
+                exit(1)
+        except yaml.YAMLError as e:
+            logger.error('YAML parsing error in %s\n%s', file_path, e)
+            if exit_on_error:
+                exit(1)
+
+    @staticmethod
+    def load_yaml(file_path):
+        """
+        Read and parse a YAML document. Parsed documents are cached by path and
+        only parsed again when the file's modification time or size changes,
+        so flows and profiles shared by many executions are read once.
+        :param file_path: The file path to load.
+        :return: the parsed document, frozen (see "freeze")
+        :raise: yaml.YAMLError if the document cannot be parsed
+        """
+        if file_path in _bundled_yaml:
+            return _bundled_yaml[file_path]
+        try:
+            stat = os.stat(file_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        cached = _yaml_cache.get(file_path)
+        if signature is not None and cached is not None and cached[0] == signature:
+            return cached[1]
         with open(file_path, 'r') as stream:
-            try:
-                yaml_data = yaml.safe_load(stream)
-                if not isinstance(yaml_data, dict):
-                    raise ValueError('YAML configuration documents for api_flow are expected to be dictionaries.')
-                return ComplexNamespace(**yaml_data)
-            except ValueError as e:
-                print(f'Unexpected YAML config in {file_path}: {str(e)}')
-                if exit_on_error:
-                    exit(1)
-            except yaml.YAMLError as e:
-                print(f'YAML parsing error in {file_path}\n{str(e)}')
-                if exit_on_error:
-                    exit(1)
+            yaml_data = freeze(yaml.load(stream, Loader=YAML_LOADER))
+        if signature is not None:
+            _yaml_cache[file_path] = (signature, yaml_data)
+        return yaml_data
 
     def __init__(self, **kwargs):
         """
         Constructor for ComplexNamespace
-        :param kwargs: optional splatted dict of source data
+        :param kwargs: optional splatted dict of source data. Nested dicts
+                       and lists are wrapped when they are first read.
+        """
+        super().__init__(**kwargs)
+
+    def __getattribute__(self, key):
+        """
+        Wrap nested dicts and lists as they are read. The wrapper replaces
+        the raw value, so later reads (and writes to it) see the same object.
+        Values that do not come from the namespace itself (properties and
+        class attributes) are returned as they are.
         """
-        super().__init__(**dict(map(self.upgrade_dict_mapper, kwargs.items())))
+        value = object.__getattribute__(self, key)
+        if isinstance(value, (dict, list)) and value.__class__ is not NamespaceList and key[:2] != '__' \
+                and object.__getattribute__(self, '__dict__').get(key) is value:
+            return self._upgrade_member(key, value)
+        return value
+
+    def _upgrade_member(self, key, value):
+        upgraded = self.upgrade_dict(value)
+        self.__dict__[key] = upgraded
+        return upgraded
+
+    def _upgrade_members(self):
+        for key, value in list(self.__dict__.items()):
+            if isinstance(value, (dict, list)) and value.__class__ is not NamespaceList:
+                self._upgrade_member(key, value)
 
     def __getattr__(self, key):
         """
@@ -60,7 +189,35 @@ class ComplexNamespace(SimpleNamespace):
         :return: the value, if any.
         :raise: KeyError if no such key
         """
-        return self.__dict__.__getitem__(key)
+        value = self.__dict__.__getitem__(key)
+        if isinstance(value, (dict, list)) and value.__class__ is not NamespaceList:
+            return self._upgrade_member(key, value)
+        return value
+
+    def __eq__(self, other):
+        if not isinstance(other, ComplexNamespace):
+            return NotImplemented
+        return self.downgrade_value(self) == self.downgrade_value(other)
+
+    def get(self, key, default=None):
+        """
+        dict.get, with nested values wrapped.
+        """
+        return self[key] if key in self.__dict__ else default
+
+    def items(self):
+        """
+        dict.items, with nested values wrapped.
+        """
+        self._upgrade_members()
+        return self.__dict__.items()
+
+    def values(self):
+        """
+        dict.values, with nested values wrapped.
+        """
+        self._upgrade_members()
+        return self.__dict__.values()
 
     def __setattr__(self, key, value):
         """
@@ -71,30 +228,50 @@ class ComplexNamespace(SimpleNamespace):
         super().__setattr__(key, self.upgrade_dict(value))
 
     def as_dict(self):
-        return self.downgrade_value(self)
+        """
+        Convert back to a dict. The levels that were wrapped are copied, and
+        so are the parts of cached YAML documents that were never read.
+        Other nested dicts and lists that were never read are returned as
+        they were given, shared with the data the namespace was built from.
+        :rtype: dict
+        """
+        return self._downgrade(self, True)
 
     def downgrade_value(self, value):
+        """
+        Convert a value back to plain dicts and lists for reading (for
+        instance to serialize it). Unlike "as_dict", parts of cached YAML
+        documents that were never read are returned as they are, read-only
+        and without copying them.
+        :param value: any value
+        """
+        return self._downgrade(value, False)
+
+    def _downgrade(self, value, thaw):
         if isinstance(value, ComplexNamespace):
             return dict(
                 map(
-                    lambda item: (item[0], self.downgrade_value(item[1])),
-                    value.items()
+                    lambda item: (item[0], self._downgrade(item[1], thaw)),
+                    value.__dict__.items()
                 )
             )
-        elif isinstance(value, list):
-            return list(map(self.downgrade_value, value))
+        elif isinstance(value, NamespaceList) or thaw and value.__class__ is FrozenList:
+            return list(map(lambda item: self._downgrade(item, thaw), value))
+        elif thaw and value.__class__ is FrozenDict:
+            return dict((key, self._downgrade(item, thaw)) for key, item in value.items())
         return value
 
     def upgrade_dict(self, value):
         """
         Given a value, checks types and, if appropriate, upgrades dicts to ComplexNamespaces.
         :param value: any value
-        :returns: the same value with nested dicts transformed to ComplexNamespaces as needed.
+        :returns: the same value with dicts (and the dicts in lists) transformed to ComplexNamespaces as needed.
+                  Their own nested values are transformed when they are read.
         """
         if isinstance(value, dict):
             return ComplexNamespace(**value)
-        elif isinstance(value, list):
-            return list(map(self.upgrade_dict, value))
+        elif isinstance(value, list) and value.__class__ is not NamespaceList:
+            return NamespaceList(map(self.upgrade_dict, value))
         return value
 
     def upgrade_dict_mapper(self, item):
@@ -113,6 +290,6 @@ class ComplexNamespace(SimpleNamespace):
         :param other: (ComplexNamespace) the other namespace to merge in
         :return: self
         """
-        self.__dict__.update(other.__dict__)
+        self.__dict__.update(map(self.upgrade_dict_mapper, other.__dict__.items()))
         return self
 
@@ -1,22 +1,38 @@
 import os
 
 
+# Logged request and response bodies are truncated to this many characters
+DEFAULT_LOG_BODY_LIMIT = 10000
+
+# Seconds to wait for a connection to be established, and for the server to
+# send data, unless a step or flow sets its own "timeout"
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 60
+
+
 class _Config:
     """
-    Class for configuring the data directories for api-flow. Defaults are relative to the current directory,
-    and can be overridden either by setting the attributes here or by providing environment variables. This class
-    is protected and an instance is exposed as the Config export to provide singleton behavior.
+    Class for configuring the data directories (and a few runtime options) for api-flow. Defaults are relative to
+    the current directory, and can be overridden either by setting the attributes here or by providing environment
+    variables. This class is protected and an instance is exposed as the Config export to provide singleton behavior.
     """
     _data_path = None
     _profile_path = None
     _flow_path = None
     _template_path = None
     _function_path = None
+    _reload_functions = None
+    _log_body_limit = None
+    _cache_path = None
+    _connect_timeout = None
+    _read_timeout = None
+    _retain_responses = None
 
     def __init__(self):
         pass
 
-    def configure(self, data_path=None, flow_path=None, function_path=None, profile_path=None, template_path=None):
+    def configure(self, data_path=None, flow_path=None, function_path=None, profile_path=None, template_path=None,
+                  cache_path=None):
         if data_path is not None:
             self.data_path = data_path
         if flow_path is not None:
@@ -27,6 +43,8 @@ class _Config:
             self.profile_path = profile_path
         if template_path is not None:
             self.template_path = template_path
+        if cache_path is not None:
+            self.cache_path = cache_path
 
     def get_data_path(self):
         """
@@ -118,11 +136,128 @@ class _Config:
         """
         self.__class__._function_path = path
 
+    def get_reload_functions(self):
+        """
+        Getter for the function reload flag. When set, the user functions module is reloaded whenever its file
+        changes; otherwise it is loaded once and cached. Can be enabled by setting the RELOAD_FUNCTIONS environment
+        variable to "true" or "1".
+        :return: Whether user functions are hot-reloaded.
+        """
+        if self.__class__._reload_functions is not None:
+            return self.__class__._reload_functions
+        return os.environ.get('RELOAD_FUNCTIONS', '').lower() in ('1', 'true', 'yes')
+
+    def set_reload_functions(self, reload_functions):
+        """
+        Setter for the function reload flag.
+        :param reload_functions: Whether to hot-reload user functions, or None to defer to the environment.
+        :return: nothing
+        """
+        self.__class__._reload_functions = reload_functions
+
+    def get_log_body_limit(self):
+        """
+        Getter for the maximum number of characters of a request or response body written to the log. Zero disables
+        truncation. Can be overridden by the LOG_BODY_LIMIT environment variable.
+        :return: The configured body limit.
+        """
+        if self.__class__._log_body_limit is not None:
+            return self.__class__._log_body_limit
+        return int(os.environ.get('LOG_BODY_LIMIT', DEFAULT_LOG_BODY_LIMIT))
+
+    def set_log_body_limit(self, limit):
+        """
+        Setter for the logged body limit.
+        :param limit: The maximum number of characters, zero for no limit, or None to use the default.
+        :return: nothing
+        """
+        self.__class__._log_body_limit = limit
+
+    def get_cache_path(self):
+        """
+        Getter for the prerequisite cache path. Prerequisite flows that declare "cache" store their outputs in
+        this directory, so they are shared between processes. If unset, they are cached in memory instead.
+        Can be overridden by the CACHE_PATH environment variable.
+        :return: The configured cache directory, or None.
+        """
+        return self.__class__._cache_path or os.environ.get('CACHE_PATH')
+
+    def set_cache_path(self, path):
+        """
+        Setter for the prerequisite cache path.
+        :param path: The new cache directory, or None to cache in memory.
+        :return: nothing
+        """
+        self.__class__._cache_path = path
+
+    def get_connect_timeout(self):
+        """
+        Getter for the default connect timeout, in seconds. Zero disables the timeout. Can be overridden by the
+        CONNECT_TIMEOUT environment variable.
+        :return: The configured connect timeout, or None for no timeout.
+        """
+        if self.__class__._connect_timeout is not None:
+            return self.__class__._connect_timeout or None
+        return float(os.environ.get('CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)) or None
+
+    def set_connect_timeout(self, timeout):
+        """
+        Setter for the default connect timeout.
+        :param timeout: Seconds, zero for no timeout, or None to use the default.
+        :return: nothing
+        """
+        self.__class__._connect_timeout = timeout
+
+    def get_read_timeout(self):
+        """
+        Getter for the default read timeout: the seconds to wait for the server to send data. Zero disables the
+        timeout. Can be overridden by the READ_TIMEOUT environment variable.
+        :return: The configured read timeout, or None for no timeout.
+        """
+        if self.__class__._read_timeout is not None:
+            return self.__class__._read_timeout or None
+        return float(os.environ.get('READ_TIMEOUT', DEFAULT_READ_TIMEOUT)) or None
+
+    def set_read_timeout(self, timeout):
+        """
+        Setter for the default read timeout.
+        :param timeout: Seconds, zero for no timeout, or None to use the default.
+        :return: nothing
+        """
+        self.__class__._read_timeout = timeout
+
+    def get_retain_responses(self):
+        """
+        Getter for the response retention limit. None (the default) keeps every executed step, with its response,
+        for the life of its flow. A number N compacts finished steps: only the last N successful steps of a run,
+        and every failed step, keep their responses, and the others are replaced in their flow by a StepRecord of
+        their outputs, status and timings. Can be overridden by the RETAIN_RESPONSES environment variable.
+        :return: The configured number of responses to retain, or None to retain them all.
+        """
+        if self.__class__._retain_responses is not None:
+            return self.__class__._retain_responses
+        retain = os.environ.get('RETAIN_RESPONSES')
+        return int(retain) if retain else None
+
+    def set_retain_responses(self, retain):
+        """
+        Setter for the response retention limit.
+        :param retain: The number of successful responses to retain per run, or None to retain them all.
+        :return: nothing
+        """
+        self.__class__._retain_responses = retain
+
     data_path = property(get_data_path, set_data_path)
     profile_path = property(get_profile_path, set_profile_path)
     flow_path = property(get_flow_path, set_flow_path)
     function_path = property(get_function_path, set_function_path)
     template_path = property(get_template_path, set_template_path)
+    reload_functions = property(get_reload_functions, set_reload_functions)
+    log_body_limit = property(get_log_body_limit, set_log_body_limit)
+    cache_path = property(get_cache_path, set_cache_path)
+    connect_timeout = property(get_connect_timeout, set_connect_timeout)
+    read_timeout = property(get_read_timeout, set_read_timeout)
+    retain_responses = property(get_retain_responses, set_retain_responses)
 
 
 Config = _Config()
@@ -1,6 +1,32 @@
+import itertools
 import os
+from types import SimpleNamespace
 from api_flow.complex_namespace import ComplexNamespace
 
+# Generation numbers are drawn from one counter, so every write produces a
+# number no memoized lookup was tagged with.
+_generations = itertools.count(1)
+
+# The generation of Context.GLOBALS, renewed by "set_global"
+_global_generation = 0
+
+# Memoized marker for names that did not resolve
+_MISSING = object()
+
+
+class _Scope:
+    """
+    The generation shared by a chain of contexts: a context, its parent and
+    their descendants (for a flow execution, its flows and steps).
+    Memoized lookups are tagged with it, and any write that contexts in the
+    chain can see renews it. Writes in other chains, such as concurrent
+    runs, leave it alone.
+    """
+    __slots__ = ('generation',)
+
+    def __init__(self):
+        self.generation = next(_generations)
+
 
 class Context(ComplexNamespace):
     """
@@ -8,15 +34,36 @@ class Context(ComplexNamespace):
     aggregating values from the environment, loaded YAML profiles, other
     context(s) and a set of global values. Flows and steps inherit from Context
     to share and expose data.
+
+    Contexts taking part in a flow execution resolve environment values from
+    a snapshot taken when the execution's Run is created, and memoize the
+    names they resolve through the environment, the globals and the parent
+    chain. Memoized names are resolved again after a write to a context in
+    their scope that has children of its own (such as a flow), or to the
+    globals. Writes to childless contexts, such as steps, only change their
+    own attributes, which are never memoized, and writes in other scopes,
+    such as concurrent runs, are not seen at all. Names that a parent
+    computes through a property are never memoized.
     """
 
     # The GLOBALS data set is used to store values that should have immediate,
-    # priority availability to all contexts. The Flow and Step classes use this
-    # for making their instances available to other parts of the same request
-    # chain. It is not possible to set global variables via the flow
-    # configuration. We add things exclusively in the api-flow code itself.
+    # priority availability to all contexts in the process. It is not possible
+    # to set global variables via the flow configuration. We add things
+    # exclusively in the api-flow code itself, through "set_global". (State
+    # belonging to a single flow execution lives in its Run instead, see
+    # api_flow.run.)
     GLOBALS = ComplexNamespace()
 
+    # Resolution state is kept out of the namespace itself, so it never shows
+    # up as a context value
+    __slots__ = ('_environment', '_resolved', '_scope', '_visible')
+
+    # Context values are upgraded when they are set rather than when they are
+    # read, so flows and steps keep plain (fast) attribute access and
+    # comparison
+    __getattribute__ = object.__getattribute__
+    __eq__ = SimpleNamespace.__eq__
+
     def __init__(self, parent=None, **kwargs):
         """
         Constructor for Context.
@@ -26,22 +73,100 @@ class Context(ComplexNamespace):
                        will override the same value set in the parent within
                        the scope of this context, but not modify it. Outside
                        the current scope, the parent context value will remain
-                       set to whatever it was before.
+                       set to whatever it was before. A parent's environment
+                       snapshot, if any, is shared.
         :type parent: Context | None
         :param kwargs: the context is initialized with these values
         """
-        super().__init__(**kwargs)
+        object.__setattr__(self, '_visible', False)
+        if isinstance(parent, Context):
+            object.__setattr__(parent, '_visible', True)
+            self._use_environment(parent._environment, parent._scope)
+        else:
+            self._use_environment(None, _Scope())
+        super().__init__(**dict(map(self.upgrade_dict_mapper, kwargs.items())))
         self.parent = parent
 
+    def _use_environment(self, environment, scope=None):
+        """
+        Resolve environment values from a snapshot instead of os.environ, and
+        memoize resolved names. Without a snapshot every lookup is resolved
+        again, so changes to os.environ are seen immediately.
+        :param environment: a copy of os.environ, or None
+        :type environment: dict[str, str] | None
+        :param scope: the scope to share with other contexts, if not the
+                      current one
+        :type scope: _Scope | None
+        """
+        object.__setattr__(self, '_environment', environment)
+        object.__setattr__(self, '_resolved', {})
+        if scope is not None:
+            object.__setattr__(self, '_scope', scope)
+
+    def _invalidate(self):
+        # only a context that others resolve names through can make their
+        # memoized lookups stale
+        if self._visible:
+            self._scope.generation = next(_generations)
+
     def __getattr__(self, name):
-        if name in os.environ:
-            return os.environ[name]
+        if name in Context.__slots__:
+            raise AttributeError(name)
+        if self._environment is None:
+            return self._resolve(name, os.environ)
+        generation = self._scope.generation
+        global_generation = _global_generation
+        resolved = self._resolved.get(name)
+        if resolved is not None and resolved[0] == generation and resolved[1] == global_generation:
+            value = resolved[2]
+        else:
+            try:
+                value = self._resolve(name, self._environment)
+            except AttributeError:
+                value = _MISSING
+            if not self._is_computed(name):
+                self._resolved[name] = (generation, global_generation, value)
+        if value is _MISSING:
+            raise AttributeError()
+        return value
+
+    def _is_computed(self, name):
+        """
+        Whether a context in the parent chain computes the name through a
+        property (such as a flow's "current_step", read from its Run), so its
+        value can change without any write to the chain and is not memoized.
+        """
+        context = self.parent
+        while isinstance(context, Context):
+            if isinstance(getattr(context.__class__, name, None), property):
+                return True
+            context = context.parent
+        return False
+
+    def _resolve(self, name, environment):
+        if name in environment:
+            return environment[name]
         elif hasattr(self.__class__.GLOBALS, name):
             return getattr(self.__class__.GLOBALS, name)
         elif self.parent is not None:
             return getattr(self.parent, name)
         raise AttributeError()
 
+    def __setattr__(self, key, value):
+        super().__setattr__(key, value)
+        self._invalidate()
+
+    def __delattr__(self, key):
+        super().__delattr__(key)
+        self._invalidate()
+
+    def merge(self, other):
+        super().merge(other)
+        self._invalidate()
+        return self
+
     @staticmethod
     def set_global(name, value):
+        global _global_generation
         setattr(Context.GLOBALS, name, value)
+        _global_generation = next(_generations)
@@ -1,9 +1,26 @@
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from functools import reduce
+from api_flow import hooks
+from api_flow.cache import get_flow_cache
 from api_flow.config import Config
+from api_flow.complex_namespace import ComplexNamespace
 from api_flow.context import Context
+from api_flow.jsonpath import compile_jsonpath
 from api_flow.profiles import Profiles
-from api_flow.step import Step
+from api_flow.record import StepRecord
+from api_flow.report import RunReport
+from api_flow.run import Run
+from api_flow.session import AsyncSession, Session, get_timeout
+from api_flow.step import AsyncStep, Step
+from api_flow.template import Template
+
+logger = logging.getLogger(__name__)
 
 
 class Flow(Context):
@@ -16,7 +33,7 @@ class Flow(Context):
     using the step identifier as a property of the inherited context.
     """
 
-    def __init__(self, flow_name, profile=None, profiles=None, parent=None, **kwargs):
+    def __init__(self, flow_name, profile=None, profiles=None, parent=None, session=None, **kwargs):
         """
         Flow constructor.  Loads a named flow as YAML from the
         *Config.flows_path* directory.
@@ -39,6 +56,11 @@ class Flow(Context):
         :type profiles: list[str] | None
         :argument parent: optional context from which this flow inherits values
         :type parent: Context
+        :argument session: an optional pooled HTTP session shared by every
+                          request in the run. Prerequisite flows always use
+                          their parent's session. If omitted, a top-level
+                          flow creates its own and closes it after execution.
+        :type session: Session | None
         :argument kwargs: additional arguments stored as context vars
         :type kwargs: dict[any]
         """
@@ -52,68 +74,619 @@ class Flow(Context):
         ))
         self.flow_description = self.flow_definition.get('description', self.flow_name)
         self.flow_dependencies = self._get_flow_dependencies()
+        if not isinstance(parent, Flow):
+            self._check_flow_cycles()
+        self.flow_dependency_workers = self._get_workers('parallel_dependencies', len(self.flow_dependencies))
         self.flow_steps = self.flow_definition.get('steps', {})
+        self.flow_step_workers = self._get_workers('parallel_steps', len(self.flow_steps.keys()))
+        self.flow_step_dependencies = self._get_step_dependencies() if self.flow_step_workers else None
+        self._compile_outputs()
+        self.flow_timeout = get_timeout(self.flow_definition.get('timeout'))
+        self.flow_deadline_seconds = self._get_deadline_seconds()
+        self.flow_deadline = None
+        self.flow_cache_ttl = self._get_cache_ttl() if isinstance(parent, Flow) else None
         self.flow_store = self._get_flow_store()
+        self._use_environment(self.flow_store._environment)
         self.flow_dependencies_succeeded = None
         self.flow_steps_succeeded = None
         self.succeeded = False
+        self.flow_executed = False
+        self.flow_elapsed = None
+        self._execution_lock = self._create_execution_lock()
+        self.flow_session = self._get_flow_session(session)
         setattr(self.flow_store, flow_name, self)
         if isinstance(parent, Flow):
             setattr(parent, flow_name, self)
 
-    def _get_flow_dependencies(self):
-        depends_on = self.flow_definition.get('depends_on', [])
+    def _get_flow_dependencies(self, flow_definition=None):
+        depends_on = (flow_definition or self.flow_definition).get('depends_on', [])
         if not isinstance(depends_on, list):
             depends_on = [depends_on]
         return depends_on
 
+    def _check_flow_cycles(self):
+        """
+        Walk the whole prerequisite graph of a top-level flow before anything
+        is executed, so that flows depending on each other are reported
+        instead of recursing forever.
+        :raise: ValueError naming the flows in a dependency cycle
+        """
+        resolved = set()
+
+        def visit(flow_name, flow_definition, path):
+            if flow_name in path:
+                cycle = ' -> '.join(path[path.index(flow_name):] + [flow_name])
+                raise ValueError(f'Prerequisite flows depend on each other: {cycle}.')
+            if flow_name in resolved:
+                return
+            for dependency in self._get_flow_dependencies(flow_definition):
+                visit(dependency, self.from_yaml(os.path.join(
+                    Config.flow_path,
+                    f"{dependency}.yaml"
+                )), path + [flow_name])
+            resolved.add(flow_name)
+
+        visit(self.flow_name, self.flow_definition, [])
+
+    def _compile_outputs(self):
+        """
+        Compile the JSONPath expression of every step output when the flow is
+        loaded. Compiled expressions are cached for the steps to use, and an
+        invalid expression is reported before any request is made.
+        :raise: ValueError naming the step and output of an invalid expression
+        """
+        for step_name, step_definition in self.flow_steps.items():
+            for output_name, expression in step_definition.get('outputs', {}).items():
+                try:
+                    compile_jsonpath(expression)
+                except ValueError as e:
+                    raise ValueError(
+                        f'Output "{output_name}" of step "{step_name}" in flow "{self.flow_name}": {str(e)}'
+                    ) from e
+
+    def _get_deadline_seconds(self):
+        """
+        A flow declaring "deadline: seconds" must finish within that time,
+        prerequisites included. Every step sees the budget that remains:
+        request timeouts are shortened to fit it, retries that would overrun
+        it are abandoned, and once it has passed steps fail without making
+        requests.
+        :return: the flow's time budget in seconds, or None
+        :rtype: float | None
+        """
+        deadline = self.flow_definition.get('deadline')
+        if deadline is None:
+            return None
+        if not isinstance(deadline, (int, float)) or isinstance(deadline, bool) or deadline <= 0:
+            raise ValueError(f'The deadline of flow "{self.flow_name}" must be a positive number of seconds.')
+        return deadline
+
+    def _get_deadline(self):
+        """
+        :return: the perf_counter time by which this execution must finish:
+                 the earlier of this flow's own deadline and its parent's
+        :rtype: float | None
+        """
+        deadlines = []
+        if self.flow_deadline_seconds is not None:
+            deadlines.append(time.perf_counter() + self.flow_deadline_seconds)
+        if isinstance(self.parent, Flow) and self.parent.flow_deadline is not None:
+            deadlines.append(self.parent.flow_deadline)
+        return min(deadlines) if deadlines else None
+
+    def _get_cache_ttl(self):
+        """
+        A prerequisite flow declaring "cache: {ttl: seconds}" keeps the
+        outputs of a successful execution for that long, and later runs with
+        the same inputs reuse them instead of executing the flow again.
+        :return: the number of seconds to cache outputs for, or None
+        :rtype: float | None
+        """
+        cache = self.flow_definition.get('cache')
+        if cache is None:
+            return None
+        ttl = cache.get('ttl') if isinstance(cache, ComplexNamespace) else None
+        if not isinstance(ttl, (int, float)) or isinstance(ttl, bool) or ttl <= 0:
+            raise ValueError(f'Flow "{self.flow_name}" must declare a positive "cache: {{ttl: seconds}}".')
+        return ttl
+
+    def _get_cache_key(self):
+        """
+        Cached outputs are keyed by flow name and the values of every context
+        name the flow's templates reference (profile, environment and keyword
+        values), other than its own steps and prerequisites. Values read by
+        template functions are not part of the key.
+        :return: the cache key
+        :rtype: str
+        """
+        names = Template.references([
+            [step.get('url'), step.get('headers'), step.get('body')] for step in self.flow_steps.values()
+        ]).difference(self.flow_steps.keys(), self.flow_dependencies, ['previous_step', 'current_step'])
+        inputs = {}
+        for name in sorted(names):
+            value = getattr(self, name, None)
+            if not isinstance(value, Context):
+                inputs[name] = self.downgrade_value(value)
+        digest = hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+        return f'{self.flow_name}:{digest}'
+
+    def _restore_cached_outputs(self, cache_key):
+        """
+        Construct the steps of a cached prerequisite with their cached
+        outputs, without making any requests.
+        :param cache_key: the key of this execution (see "_get_cache_key"),
+                          or None if the flow is not cached
+        :type cache_key: str | None
+        :return: whether unexpired outputs were found
+        :rtype: bool
+        """
+        if cache_key is None:
+            return False
+        outputs = get_flow_cache().get(cache_key)
+        if outputs is None:
+            return False
+        logger.info('Using cached outputs for %s', self.flow_description)
+        for step in self._create_steps():
+            for item in outputs.get(step.step_name, {}).items():
+                setattr(step, *item)
+        self.flow_dependencies_succeeded = True
+        self.flow_steps_succeeded = True
+        return True
+
+    def _store_cached_outputs(self, cache_key):
+        outputs = {}
+        for step_name in self.flow_steps.keys():
+            step = vars(self).get(step_name)
+            if isinstance(step, (Step, StepRecord)):
+                outputs[step_name] = dict(
+                    (name, self.downgrade_value(value)) for name, value in step.step_outputs.items()
+                )
+        get_flow_cache().set(cache_key, outputs, self.flow_cache_ttl)
+
+    def _get_workers(self, key, count):
+        """
+        Prerequisites and steps run one after another unless the definition
+        opts in with "parallel_dependencies" or "parallel_steps", either
+        "true" (one worker per item) or a maximum number of concurrent workers.
+        :param key: the definition key to read
+        :type key: str
+        :param count: the number of items that could run concurrently
+        :type count: int
+        :return: the number of concurrent workers, or None to run in sequence
+        :rtype: int | None
+        """
+        parallel = self.flow_definition.get(key, False)
+        if parallel is True:
+            return count
+        if isinstance(parallel, int) and parallel > 1:
+            return parallel
+        return None
+
+    def _get_step_dependencies(self):
+        """
+        Build the step dependency graph used by "parallel_steps". A step
+        depends on every step of this flow it references in its url, headers
+        or body templates, on the step declared before it if it references
+        "previous_step", and on any steps listed under its optional "after"
+        key for ordering that is not visible in the data.
+        :return: a map of step names to the names of the steps they wait for
+        :rtype: dict[str, set[str]]
+        :raise: ValueError for unknown "after" steps or dependency cycles
+        """
+        step_names = list(self.flow_steps.keys())
+        dependencies = {}
+        for index, (step_name, step_definition) in enumerate(self.flow_steps.items()):
+            references = Template.references([
+                step_definition.get('url'),
+                step_definition.get('headers'),
+                step_definition.get('body'),
+            ])
+            after = step_definition.get('after', [])
+            after = set(after if isinstance(after, list) else [after])
+            unknown = after.difference(step_names)
+            if unknown:
+                raise ValueError(f'Step "{step_name}" of flow "{self.flow_name}" is after unknown steps {sorted(unknown)}.')
+            if 'previous_step' in references and index > 0:
+                after.add(step_names[index - 1])
+            dependencies[step_name] = after.union(references.intersection(step_names)).difference([step_name])
+        self._check_step_cycles(dependencies)
+        return dependencies
+
+    def _check_step_cycles(self, dependencies):
+        resolved = set()
+        while len(resolved) < len(dependencies):
+            ready = [name for name, names in dependencies.items() if name not in resolved and names <= resolved]
+            if not ready:
+                cycle = sorted(set(dependencies.keys()).difference(resolved))
+                raise ValueError(f'Steps {cycle} of flow "{self.flow_name}" depend on each other.')
+            resolved.update(ready)
+
+    def _get_ready_steps(self, pending, completed):
+        return [step for step in pending if self.flow_step_dependencies[step.step_name] <= completed]
+
+    def _get_flow_session(self, session):
+        self._owns_session = False
+        if isinstance(self.parent, Flow):
+            return self.parent.flow_session
+        if session is None:
+            self._owns_session = True
+            session = self._create_session()
+        return session
+
+    def _create_session(self):
+        return Session()
+
     def _get_flow_store(self):
-        if not hasattr(self, '_flow_store'):
-            self.set_global('_flow_store', Context())
-        return self._flow_store
+        if isinstance(self.parent, Flow):
+            return self.parent.flow_store
+        return Run()
+
+    def _create_execution_lock(self):
+        return threading.Lock()
+
+    def _create_dependencies(self):
+        with self.flow_store.flow_lock:
+            return [self._create_dependency(dependency) for dependency in self.flow_dependencies]
+
+    def _create_dependency(self, flow_name):
+        """
+        Prerequisites are shared across a run: a flow that several flows
+        depend on is constructed (and executed) once, and every later
+        dependent reuses that flow and its outcome.
+        :param flow_name: the prerequisite flow name
+        :type flow_name: str
+        :return: the prerequisite flow
+        :rtype: Flow
+        """
+        dependency = vars(self.flow_store).get(flow_name)
+        if isinstance(dependency, Flow):
+            setattr(self, flow_name, dependency)
+            return dependency
+        return self.__class__(flow_name, parent=self)
+
+    def _create_steps(self):
+        """
+        Construct the steps in declaration order. Each step after the first
+        resolves "previous_step" to the step declared before it, which is
+        also the step "parallel_steps" makes it wait for. The first step sees
+        the run's previous step, from the prerequisite flows.
+        :rtype: list[Step]
+        """
+        steps = []
+        for step_name, step_definition in self.flow_steps.items():
+            step = self._create_step(step_name, step_definition)
+            if steps:
+                step.step_predecessor = steps[-1].step_name
+            steps.append(step)
+        return steps
+
+    def _create_step(self, step_name, step_definition):
+        return Step(step_name, step_definition, parent=self)
 
     def _execute_dependencies(self):
         if self.flow_dependencies_succeeded is None:
             if self.flow_dependencies:
-                print(f'Executing prerequisites for {self.flow_description}')
-                self.flow_dependencies_succeeded = reduce(
-                    lambda r, dependency: r and dependency.execute(),
-                    [Flow(dependency, parent=self) for dependency in self.flow_dependencies],
-                    True
-                )
+                logger.info('Executing prerequisites for %s', self.flow_description)
+                dependencies = self._create_dependencies()
+                if self.flow_dependency_workers:
+                    self.flow_dependencies_succeeded = self._execute_parallel_dependencies(dependencies)
+                else:
+                    self.flow_dependencies_succeeded = reduce(
+                        lambda r, dependency: r and dependency.execute(),
+                        dependencies,
+                        True
+                    )
                 if self.flow_dependencies_succeeded:
                     self.flow_store.current_flow = self
             else:
                 self.flow_dependencies_succeeded = True
         return self.flow_dependencies_succeeded
 
+    def _execute_parallel_dependencies(self, dependencies):
+        """
+        Run prerequisites concurrently on a thread pool, failing fast: as soon
+        as one of them fails (or raises), prerequisites that have not started
+        yet are cancelled.
+        :param dependencies: the constructed prerequisite flows
+        :type dependencies: list[Flow]
+        :return: whether every prerequisite succeeded
+        :rtype: bool
+        """
+        with ThreadPoolExecutor(max_workers=self.flow_dependency_workers) as executor:
+            futures = [executor.submit(dependency.execute) for dependency in dependencies]
+            try:
+                for future in as_completed(futures):
+                    if not future.result():
+                        return False
+            finally:
+                # also when a prerequisite raises, so that the executor does
+                # not run the remaining ones before the error surfaces
+                for future in futures:
+                    future.cancel()
+        return True
+
+    def _execute_parallel_steps(self, steps):
+        """
+        Run steps concurrently on a thread pool, starting each one as soon as
+        every step it depends on has succeeded. After a failure no new steps
+        are started, but steps already running are allowed to finish. When a
+        step raises, steps that have not started yet are cancelled.
+        :param steps: the constructed steps
+        :type steps: list[Step]
+        :return: whether every step succeeded
+        :rtype: bool
+        """
+        pending = list(steps)
+        completed = set()
+        running = {}
+        succeeded = True
+        with ThreadPoolExecutor(max_workers=self.flow_step_workers) as executor:
+            try:
+                while succeeded and pending or running:
+                    if succeeded:
+                        for step in self._get_ready_steps(pending, completed):
+                            pending.remove(step)
+                            running[executor.submit(step.execute)] = step
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        step = running.pop(future)
+                        if future.result():
+                            completed.add(step.step_name)
+                        else:
+                            succeeded = False
+            finally:
+                # when a step raises, steps that have not started are dropped
+                for future in running:
+                    future.cancel()
+        return succeeded and not pending
+
     def _execute_steps(self):
         if self.flow_steps_succeeded is None:
             if self.flow_steps.keys():
-                print(f'Executing steps for {self.flow_description}')
-                self.flow_steps_succeeded = reduce(
-                    lambda r, step: r and step.execute(),
-                    [Step(step[0], step[1], parent=self) for step in self.flow_steps.items()],
-                    True
-                )
+                logger.info('Executing steps for %s', self.flow_description)
+                steps = self._create_steps()
+                if self.flow_step_workers:
+                    self.flow_steps_succeeded = self._execute_parallel_steps(steps)
+                else:
+                    self.flow_steps_succeeded = reduce(
+                        lambda r, step: r and step.execute(),
+                        steps,
+                        True
+                    )
             else:
                 self.flow_steps_succeeded = True
         return self.flow_steps_succeeded
 
-    def execute(self):
-        print(f'Executing flow {self.flow_description}')
+    def _begin_execution(self):
+        logger.info('Executing flow %s', self.flow_description)
+        self._flow_started = time.perf_counter()
         self.flow_store.current_flow = self
-        self.succeeded = self._execute_dependencies() and self._execute_steps()
+        self.flow_deadline = self._get_deadline()
+        if hooks.HANDLERS:
+            hooks.emit('on_flow_start', self)
+
+    def _end_execution(self):
+        self.flow_elapsed = time.perf_counter() - self._flow_started
         if self.succeeded:
             self.flow_store.previous_flow = self
             self.flow_store.current_flow = None
         else:
-            flow_name = self.flow_store.current_flow.flow_name
-            step_name = self.flow_store.current_step.step_name
-            print(f"Flow \"{flow_name}\" failed at step \"{step_name}\".")
+            current_flow = self.flow_store.current_flow or self
+            current_step = self.flow_store.current_step
+            flow_name = current_flow.flow_name
+            step_name = current_step.step_name if current_step is not None else None
+            logger.error('Flow "%s" failed at step "%s".', flow_name, step_name)
+        if hooks.HANDLERS:
+            hooks.emit('on_flow_end', self)
+
+    def _get_execution_cache_key(self):
+        """
+        The key of a cached flow is computed once per execution, before the
+        flow changes its own context, so outputs are stored under the key
+        they were looked up with.
+        :return: the cache key, or None if the flow is not cached
+        :rtype: str | None
+        """
+        return self._get_cache_key() if self.flow_cache_ttl else None
+
+    def _run(self):
+        cache_key = self._get_execution_cache_key()
+        if self._restore_cached_outputs(cache_key):
+            return True
+        succeeded = self._execute_dependencies() and self._execute_steps()
+        if succeeded and cache_key is not None:
+            self._store_cached_outputs(cache_key)
+        return succeeded
+
+    def execute(self):
+        """
+        Execute the prerequisites and steps, once. If a step raises, the flow
+        is still finished (as failed) and a session it owns is still closed
+        before the exception propagates.
+        :return: whether the flow succeeded
+        :rtype: bool
+        """
+        with self._execution_lock:
+            if not self.flow_executed:
+                self._begin_execution()
+                try:
+                    self.succeeded = self._run()
+                finally:
+                    self.flow_executed = True
+                    try:
+                        self._end_execution()
+                    finally:
+                        if self._owns_session:
+                            self.flow_session.close()
         return self.succeeded
 
+    def get_executed_steps(self, prefix='', visited=None):
+        """
+        Yield every step of this flow and its prerequisites that has been
+        executed, prerequisites first. Steps of a prerequisite are named after
+        the path to it ("prerequisite_flow.step_name"); a prerequisite shared
+        by several flows is only visited once.
+        :param prefix: the prefix for step names
+        :type prefix: str
+        :param visited: the prerequisite flows already visited
+        :type visited: set[int] | None
+        :return: (qualified name, step) pairs
+        :rtype: collections.abc.Iterator[tuple[str, Step]]
+        """
+        visited = set() if visited is None else visited
+        for dependency_name in self.flow_dependencies:
+            dependency = vars(self).get(dependency_name)
+            if isinstance(dependency, Flow) and id(dependency) not in visited:
+                visited.add(id(dependency))
+                yield from dependency.get_executed_steps(f'{prefix}{dependency_name}.', visited)
+        for step_name in self.flow_steps.keys():
+            step = vars(self).get(step_name)
+            if isinstance(step, (Step, StepRecord)) and step.step_elapsed is not None:
+                yield f'{prefix}{step_name}', step
+
     current_flow = property(lambda self: self.flow_store.current_flow)
     current_step = property(lambda self: self.flow_store.current_step)
     previous_flow = property(lambda self: self.flow_store.previous_flow)
     previous_step = property(lambda self: self.flow_store.previous_step)
+    flow_report = property(lambda self: RunReport(self))
+
+
+class AsyncFlow(Flow):
+    """
+    The asyncio counterpart of Flow. Construction is identical, but "execute"
+    is a coroutine: requests are made through a non-blocking AsyncSession and
+    retry delays use asyncio.sleep, so a single event loop can drive many
+    flows concurrently. Prerequisites are constructed as AsyncFlows and steps
+    as AsyncSteps; templates, contexts and outputs behave as they do for Flow.
+    """
+
+    def _create_session(self):
+        return AsyncSession()
+
+    def _create_execution_lock(self):
+        # asyncio is imported on use, so that synchronous runs never load it
+        import asyncio
+        return asyncio.Lock()
+
+    def _create_step(self, step_name, step_definition):
+        return AsyncStep(step_name, step_definition, parent=self)
+
+    async def _execute_dependencies(self):
+        if self.flow_dependencies_succeeded is None:
+            if self.flow_dependencies:
+                logger.info('Executing prerequisites for %s', self.flow_description)
+                dependencies = self._create_dependencies()
+                if self.flow_dependency_workers:
+                    self.flow_dependencies_succeeded = await self._execute_parallel_dependencies(dependencies)
+                else:
+                    self.flow_dependencies_succeeded = True
+                    for dependency in dependencies:
+                        if not await dependency.execute():
+                            self.flow_dependencies_succeeded = False
+                            break
+                if self.flow_dependencies_succeeded:
+                    self.flow_store.current_flow = self
+            else:
+                self.flow_dependencies_succeeded = True
+        return self.flow_dependencies_succeeded
+
+    async def _execute_parallel_dependencies(self, dependencies):
+        """
+        Run prerequisites as concurrent tasks on the event loop, limited to
+        "flow_dependency_workers" at a time. The first failure cancels every
+        prerequisite still pending.
+        """
+        import asyncio
+        semaphore = asyncio.Semaphore(self.flow_dependency_workers)
+
+        async def execute_dependency(dependency):
+            async with semaphore:
+                return await dependency.execute()
+
+        tasks = [asyncio.ensure_future(execute_dependency(dependency)) for dependency in dependencies]
+        try:
+            for next_completed in asyncio.as_completed(tasks):
+                if not await next_completed:
+                    return False
+            return True
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _execute_parallel_steps(self, steps):
+        """
+        Run steps as concurrent tasks, limited to "flow_step_workers" at a
+        time, starting each one as soon as the steps it depends on succeed.
+        When a step raises, the steps still running are cancelled.
+        """
+        import asyncio
+        pending = list(steps)
+        completed = set()
+        running = {}
+        succeeded = True
+        try:
+            while succeeded and pending or running:
+                if succeeded:
+                    for step in self._get_ready_steps(pending, completed)[:self.flow_step_workers - len(running)]:
+                        pending.remove(step)
+                        running[asyncio.ensure_future(step.execute())] = step
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    step = running.pop(task)
+                    if task.result():
+                        completed.add(step.step_name)
+                    else:
+                        succeeded = False
+        finally:
+            # when a step raises, the steps still running are cancelled before
+            # the flow closes its session
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+        return succeeded and not pending
+
+    async def _execute_steps(self):
+        if self.flow_steps_succeeded is None:
+            if self.flow_steps.keys():
+                logger.info('Executing steps for %s', self.flow_description)
+                steps = self._create_steps()
+                if self.flow_step_workers:
+                    self.flow_steps_succeeded = await self._execute_parallel_steps(steps)
+                else:
+                    self.flow_steps_succeeded = True
+                    for step in steps:
+                        if not await step.execute():
+                            self.flow_steps_succeeded = False
+                            break
+            else:
+                self.flow_steps_succeeded = True
+        return self.flow_steps_succeeded
+
+    async def _run(self):
+        cache_key = self._get_execution_cache_key()
+        if self._restore_cached_outputs(cache_key):
+            return True
+        succeeded = await self._execute_dependencies() and await self._execute_steps()
+        if succeeded and cache_key is not None:
+            self._store_cached_outputs(cache_key)
+        return succeeded
+
+    async def execute(self):
+        async with self._execution_lock:
+            if not self.flow_executed:
+                self._begin_execution()
+                try:
+                    self.succeeded = await self._run()
+                finally:
+                    self.flow_executed = True
+                    try:
+                        self._end_execution()
+                    finally:
+                        if self._owns_session:
+                            await self.flow_session.close()
+        return self.succeeded
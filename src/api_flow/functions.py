@@ -1,6 +1,6 @@
 import os
 import random as random_lib
-import sys
+import threading
 import uuid as uuid_lib
 from importlib.util import spec_from_file_location, module_from_spec
 from api_flow.config import Config
@@ -20,6 +20,13 @@ function call.
 """
 
 
+# Loaded user function modules, keyed by the path of their __init__.py.
+# Values are (modification time, module) tuples; the module is None when
+# no user functions exist at that path.
+_user_function_modules = {}
+_user_function_modules_lock = threading.Lock()
+
+
 def get_template_function(function_name):
     """
     Resolver for template utility functions.
@@ -34,24 +41,51 @@ def get_template_function(function_name):
             'get_template_function is not a valid name for template functions'
         )
 
-    if function_name in dir(sys.modules[__name__]):
-        return getattr(sys.modules[__name__], function_name)
+    if function_name in BUILTIN_FUNCTIONS:
+        return BUILTIN_FUNCTIONS[function_name]
 
-    user_functions_init_path = os.path.join(Config.function_path, '__init__.py')
-    if os.path.exists(user_functions_init_path):
-        user_functions_spec = spec_from_file_location(
-            'user_functions',
-            user_functions_init_path,
-            submodule_search_locations=[Config.function_path]
-        )
-        user_functions = module_from_spec(user_functions_spec)
-        user_functions_spec.loader.exec_module(user_functions)
-        if function_name in dir(user_functions):
-            return getattr(user_functions, function_name)
+    user_functions = get_user_functions()
+    if user_functions is not None:
+        return getattr(user_functions, function_name, None)
 
     return None
 
 
+def get_user_functions():
+    """
+    Return the user functions module from "Config.function_path", loading it
+    on first use. The module is executed once per path and cached. If
+    "Config.reload_functions" is set, the file's modification time is checked
+    on each call and the module is reloaded when it changes.
+    :return: the user functions module, or None if there is none
+    :rtype: module | None
+    """
+    user_functions_init_path = os.path.join(Config.function_path, '__init__.py')
+    cached = _user_function_modules.get(user_functions_init_path)
+    if cached is not None and not Config.reload_functions:
+        return cached[1]
+
+    try:
+        modified = os.stat(user_functions_init_path).st_mtime_ns
+    except OSError:
+        modified = None
+    if cached is not None and cached[0] == modified:
+        return cached[1]
+
+    with _user_function_modules_lock:
+        user_functions = None
+        if modified is not None:
+            user_functions_spec = spec_from_file_location(
+                'user_functions',
+                user_functions_init_path,
+                submodule_search_locations=[Config.function_path]
+            )
+            user_functions = module_from_spec(user_functions_spec)
+            user_functions_spec.loader.exec_module(user_functions)
+        _user_function_modules[user_functions_init_path] = (modified, user_functions)
+        return user_functions
+
+
 def random(ctx, max_value):
     """
     Return a random integer in the range [0, max_value) as a fixed-length
@@ -74,3 +108,9 @@ def uuid(ctx):
     :rtype: str
     """
     return str(uuid_lib.uuid4())
+
+
+BUILTIN_FUNCTIONS = {
+    'random': random,
+    'uuid': uuid,
+}
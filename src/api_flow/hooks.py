@@ -0,0 +1,194 @@
+import threading
+
+# The optional OpenTelemetry API is imported when OpenTelemetryHooks are
+# created, so that importing api_flow does not pay for it
+propagate = trace = None
+
+
+"""
+Hooks let applications observe a run as it happens, for tracing or metrics.
+A handler subclasses Hooks, overrides the events it needs and is registered
+with "add_hooks":
+
+    class StepPrinter(Hooks):
+        def on_step_end(self, step, succeeded):
+            print(step.step_name, succeeded, step.step_elapsed)
+
+    add_hooks(StepPrinter())
+
+Events are fired from Flow, Step and Request execution (and their asyncio
+counterparts), on whichever thread or task runs them, so handlers shared by
+parallel steps must be thread-safe. Call sites check HANDLERS before building
+any event, so a run without handlers pays nothing for them.
+"""
+
+# The registered handlers, in the order they are called
+HANDLERS = []
+
+
+class Hooks:
+    """
+    The hook interface. Every event is a no-op here, so handlers only
+    override what they use.
+    """
+
+    def on_flow_start(self, flow):
+        """
+        A flow (top-level or prerequisite) starts executing.
+        :type flow: api_flow.flow.Flow
+        """
+
+    def on_flow_end(self, flow):
+        """
+        A flow finished executing; "flow.succeeded" holds the outcome.
+        :type flow: api_flow.flow.Flow
+        """
+
+    def on_step_start(self, step):
+        """
+        A step starts executing, before its first attempt.
+        :type step: api_flow.step.Step
+        """
+
+    def on_step_end(self, step, succeeded):
+        """
+        A step finished executing, after its outputs were gathered.
+        :type step: api_flow.step.Step
+        :type succeeded: bool
+        """
+
+    def on_attempt(self, step, attempt):
+        """
+        A step starts an attempt, numbered from 1.
+        :type step: api_flow.step.Step
+        :type attempt: int
+        """
+
+    def on_request(self, request):
+        """
+        A request is about to be sent. Its url, headers and body are
+        rendered, and changes to "request.request_headers" are sent.
+        :type request: api_flow.request.Request
+        """
+
+    def on_response(self, request, error=None):
+        """
+        A request returned, with "request.response" holding the response, or
+        raised "error".
+        :type request: api_flow.request.Request
+        :type error: Exception | None
+        """
+
+
+def add_hooks(handler):
+    """
+    Register a handler for every flow run in the process.
+    :param handler: the handler
+    :type handler: Hooks
+    """
+    HANDLERS.append(handler)
+
+
+def remove_hooks(handler):
+    """
+    Unregister a handler.
+    :param handler: a handler passed to add_hooks
+    :type handler: Hooks
+    """
+    HANDLERS.remove(handler)
+
+
+def emit(event, *args):
+    """
+    Call an event on every registered handler.
+    :param event: the name of the Hooks method
+    :type event: str
+    """
+    for handler in HANDLERS:
+        getattr(handler, event)(*args)
+
+
+class OpenTelemetryHooks(Hooks):
+    """
+    Reports runs to OpenTelemetry: every flow, step and request becomes a
+    span, nested as they are in the run (prerequisite flows within the flows
+    that started them), and each request carries the "traceparent" header of
+    its span, so server-side traces join the run's trace. Requires the
+    optional "opentelemetry-api" package (pip install opentelemetry-api) and
+    an SDK configured by the application.
+    """
+
+    def __init__(self, tracer=None):
+        """
+        OpenTelemetryHooks constructor.
+        :param tracer: the tracer that creates spans, defaults to the global
+                       tracer provider's "api_flow" tracer
+        :type tracer: opentelemetry.trace.Tracer | None
+        """
+        global propagate, trace
+        try:
+            from opentelemetry import propagate, trace
+        except ImportError:
+            raise ImportError('OpenTelemetry hooks require the opentelemetry-api package '
+                              '(pip install opentelemetry-api).') from None
+        self.tracer = tracer or trace.get_tracer('api_flow')
+        self.spans = {}
+        self.lock = threading.Lock()
+
+    def _start_span(self, owner, parent, name, kind, attributes):
+        with self.lock:
+            parent_span = self.spans.get(id(parent))
+        span = self.tracer.start_span(
+            name,
+            context=trace.set_span_in_context(parent_span) if parent_span is not None else None,
+            kind=kind,
+            attributes=attributes
+        )
+        with self.lock:
+            self.spans[id(owner)] = span
+        return span
+
+    def _end_span(self, owner, succeeded):
+        with self.lock:
+            span = self.spans.pop(id(owner), None)
+        if span is not None:
+            if not succeeded:
+                span.set_status(trace.StatusCode.ERROR)
+            span.end()
+        return span
+
+    def on_flow_start(self, flow):
+        self._start_span(flow, flow.parent, f'flow {flow.flow_name}', trace.SpanKind.INTERNAL,
+                         {'api_flow.flow': flow.flow_name})
+
+    def on_flow_end(self, flow):
+        self._end_span(flow, flow.succeeded)
+
+    def on_step_start(self, step):
+        self._start_span(step, step.parent, f'step {step.step_name}', trace.SpanKind.INTERNAL,
+                         {'api_flow.step': step.step_name})
+
+    def on_step_end(self, step, succeeded):
+        with self.lock:
+            span = self.spans.get(id(step))
+        if span is not None:
+            span.set_attribute('api_flow.attempts', step.step_attempts)
+        self._end_span(step, succeeded)
+
+    def on_request(self, request):
+        method = request.request_step.step_method.upper()
+        span = self._start_span(request, request.request_step, method, trace.SpanKind.CLIENT, {
+            'http.request.method': method,
+            'url.full': request.request_url,
+        })
+        propagate.inject(request.request_headers, context=trace.set_span_in_context(span))
+
+    def on_response(self, request, error=None):
+        with self.lock:
+            span = self.spans.get(id(request))
+        if span is not None:
+            if error is not None:
+                span.record_exception(error)
+            else:
+                span.set_attribute('http.response.status_code', request.response_status_code)
+        self._end_span(request, error is None and request.response_succeeded)
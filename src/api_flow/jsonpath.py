@@ -0,0 +1,26 @@
+from functools import lru_cache
+from jsonpath_ng import parse
+
+# Expressions installed from a precompiled bundle (see api_flow.bundle),
+# keyed by expression string.
+_bundled_jsonpaths = {}
+
+
+@lru_cache(maxsize=1024)
+def compile_jsonpath(expression):
+    """
+    Parse a JSONPath expression, caching the result by expression string.
+    The jsonpath_ng parser is slow, so steps, flows and retry conditions
+    share compiled expressions through this function rather than calling
+    "parse" themselves.
+    :param expression: the JSONPath expression
+    :type expression: str
+    :return: the compiled expression
+    :raise: ValueError if the expression is invalid
+    """
+    if expression in _bundled_jsonpaths:
+        return _bundled_jsonpaths[expression]
+    try:
+        return parse(expression)
+    except Exception as e:
+        raise ValueError(f'Invalid JSONPath expression "{expression}": {str(e)}') from e
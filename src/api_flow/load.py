@@ -0,0 +1,210 @@
+import json
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from api_flow.flow import Flow
+from api_flow.profiles import Profiles
+from api_flow.session import Session
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of a list of numbers.
+    :param values: the sorted values
+    :type values: list[float]
+    :param percent: the percentile to compute, from 0 to 100
+    :type percent: float
+    :return: the percentile value, or None if there are no values
+    :rtype: float | None
+    """
+    if not values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
+class LoadTest:
+    """
+    Runs a flow many times, optionally concurrently and at a fixed rate, and
+    reports throughput, error rates and latency percentiles for the flow and
+    for each of its steps (including the steps of prerequisite flows).
+
+    Profiles are loaded once and every iteration shares one pooled Session,
+    but each iteration executes its own Flow instance.
+    """
+
+    def __init__(self, flow_name, profile=None, profiles=None, iterations=1, concurrency=1, rate=None, session=None,
+                 **kwargs):
+        """
+        LoadTest constructor.
+
+        :argument flow_name: the flow to run, as for Flow
+        :type flow_name: str
+        :argument profile: an optional single profile, as for Flow
+        :type profile: str | None
+        :argument profiles: optional profiles, as for Flow
+        :type profiles: list[str] | None
+        :argument iterations: the number of times to run the flow
+        :type iterations: int
+        :argument concurrency: the number of flows to run at the same time
+        :type concurrency: int
+        :argument rate: the maximum number of flows to start per second, or
+                        None to start them as fast as workers allow
+        :type rate: float | None
+        :argument session: the pooled session shared by every iteration. If
+                           omitted, one sized for the concurrency is created.
+        :type session: Session | None
+        :argument kwargs: additional context values, as for Flow
+        :type kwargs: dict[any]
+        """
+        self.flow_name = flow_name
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.rate = rate
+        self.session = session
+        self.context = kwargs
+        self.profile_values = {}
+        if profile or profiles:
+            self.profile_values = dict(Profiles(profile=profile, profiles=profiles).items())
+        self.results = []
+
+    def _execute_iteration(self, session):
+        started = time.perf_counter()
+        flow = error = None
+        try:
+            flow = Flow(self.flow_name, session=session, **{**self.profile_values, **self.context})
+            flow.execute()
+        except Exception as e:
+            logger.error('Flow "%s" raised %s: %s', self.flow_name, e.__class__.__name__, e)
+            error = e.__class__.__name__
+        return flow, time.perf_counter() - started, error
+
+    def run(self):
+        """
+        Run every iteration and collect the results.
+        :return: the report of the run
+        :rtype: LoadReport
+        """
+        started = time.perf_counter()
+        session = self.session or Session(max_connections=max(self.concurrency, 1))
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                futures = []
+                for iteration in range(self.iterations):
+                    if self.rate:
+                        delay = started + iteration / self.rate - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                    futures.append(executor.submit(self._execute_iteration, session))
+                self.results = [future.result() for future in futures]
+        finally:
+            if self.session is None:
+                session.close()
+        return LoadReport(self.flow_name, self.results, time.perf_counter() - started)
+
+
+class LoadReport:
+    """
+    Aggregated results of a LoadTest.
+    """
+
+    PERCENTILES = (50, 90, 95, 99)
+
+    def __init__(self, flow_name, results, elapsed):
+        """
+        LoadReport constructor.
+
+        :param flow_name: the name of the flow that was run
+        :type flow_name: str
+        :param results: (flow, seconds, exception name or None) per iteration.
+                        The flow is None if it could not be created.
+        :type results: list[tuple]
+        :param elapsed: wall-clock seconds for the whole run
+        :type elapsed: float
+        """
+        self.flow_name = flow_name
+        self.elapsed = elapsed
+        self.iterations = len(results)
+        self.failures = len([result for result in results if result[2] is not None or not result[0].succeeded])
+        self.exceptions = {}
+        for _, _, error in results:
+            if error is not None:
+                self.exceptions[error] = self.exceptions.get(error, 0) + 1
+        self.flow_latency = self._summarize([seconds for _, seconds, _ in results], self.failures)
+        self.step_latency = self._summarize_steps([flow for flow, _, _ in results if flow is not None])
+
+    @classmethod
+    def _summarize(cls, latencies, errors):
+        latencies = sorted(latencies)
+        summary = {
+            'count': len(latencies),
+            'errors': errors,
+            'mean': sum(latencies) / len(latencies) if latencies else None,
+            'max': latencies[-1] if latencies else None,
+        }
+        for percent in cls.PERCENTILES:
+            summary[f'p{percent}'] = percentile(latencies, percent)
+        return summary
+
+    @classmethod
+    def _summarize_steps(cls, flows):
+        latencies = {}
+        errors = {}
+        for flow in flows:
+            for name, step in flow.get_executed_steps():
+                latencies.setdefault(name, []).append(step.step_elapsed)
+                errors[name] = errors.get(name, 0) + (0 if step.step_succeeded else 1)
+        return {name: cls._summarize(values, errors[name]) for name, values in latencies.items()}
+
+    error_rate = property(lambda self: self.failures / self.iterations if self.iterations else 0.0)
+    throughput = property(lambda self: self.iterations / self.elapsed if self.elapsed else 0.0)
+
+    def as_dict(self):
+        return {
+            'flow_name': self.flow_name,
+            'iterations': self.iterations,
+            'failures': self.failures,
+            'error_rate': self.error_rate,
+            'elapsed': self.elapsed,
+            'throughput': self.throughput,
+            'exceptions': self.exceptions,
+            'flow_latency': self.flow_latency,
+            'step_latency': self.step_latency,
+        }
+
+    def to_json(self, indent=2):
+        """
+        Serialize the report. Times are in seconds.
+        :param indent: the JSON indentation, or None for a single line
+        :type indent: int | None
+        :rtype: str
+        """
+        return json.dumps(self.as_dict(), indent=indent)
+
+    def format(self):
+        """
+        Render the report as a plain-text table.
+        :rtype: str
+        """
+        def milliseconds(value):
+            return '-' if value is None else f'{value * 1000:.1f}'
+
+        columns = ['count', 'errors', 'mean'] + [f'p{percent}' for percent in self.PERCENTILES] + ['max']
+        rows = [(f'flow {self.flow_name}', self.flow_latency)] + list(self.step_latency.items())
+        width = max(len(name) for name, _ in rows)
+        lines = [
+            f'Flow {self.flow_name}: {self.iterations} iterations in {self.elapsed:.2f}s '
+            f'({self.throughput:.2f} flows/s), {self.failures} failed ({self.error_rate:.1%})',
+        ]
+        for name, count in self.exceptions.items():
+            lines.append(f'  {name}: {count}')
+        lines.append(f'{"latency (ms)".ljust(width)} ' + ' '.join(column.rjust(8) for column in columns))
+        for name, summary in rows:
+            values = [str(summary['count']), str(summary['errors'])] + [
+                milliseconds(summary[column]) for column in columns[2:]
+            ]
+            lines.append(f'{name.ljust(width)} ' + ' '.join(value.rjust(8) for value in values))
+        return '\n'.join(lines)
@@ -0,0 +1,68 @@
+import logging
+import sys
+from api_flow.config import Config
+
+
+"""
+api-flow reports progress through the standard "logging" module, using
+loggers under the "api_flow" namespace:
+
+- INFO: flow and step progress, step outputs
+- DEBUG: full request and response dumps (headers and bodies)
+- ERROR: failed flows and unreadable configuration
+
+Nothing is printed unless the application configures logging (the CLI does
+so through "configure_logging"). Expensive messages such as serialized
+bodies are wrapped in LazyMessage, so they are only built if a handler
+actually emits them.
+"""
+
+
+class LazyMessage:
+    """
+    Defers building a log message argument until a handler formats it. The
+    result is kept, so several handlers formatting the same record share it.
+    """
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+        self.message = None
+
+    def __str__(self):
+        if self.message is None:
+            self.message = self.function(*self.args)
+        return self.message
+
+
+def truncate(text, limit=None):
+    """
+    Shorten text for logging to the configured body limit.
+    :param text: the text to shorten
+    :type text: str
+    :param limit: the maximum length, defaults to "Config.log_body_limit".
+                  Zero or None means no limit.
+    :type limit: int | None
+    :return: the text, truncated with a note of how much was dropped
+    :rtype: str
+    """
+    limit = Config.log_body_limit if limit is None else limit
+    if limit and len(text) > limit:
+        return f'{text[:limit]}... ({len(text) - limit} more characters)'
+    return text
+
+
+def configure_logging(level=logging.DEBUG, stream=None):
+    """
+    Send api-flow log messages to a stream (stdout by default), unadorned,
+    at the given level. Intended for command-line use.
+    :param level: the minimum level to emit
+    :type level: int
+    :param stream: the stream to write to
+    """
+    logger = logging.getLogger('api_flow')
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    return logger
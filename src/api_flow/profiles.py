@@ -1,7 +1,10 @@
+import logging
 import os
 from api_flow.config import Config
 from api_flow.complex_namespace import ComplexNamespace
 
+logger = logging.getLogger(__name__)
+
 
 class Profiles(ComplexNamespace):
     def __init__(self, profile=None, profiles=None):
@@ -34,7 +37,7 @@ class Profiles(ComplexNamespace):
 
     def _load_profiles(self):
         if len(self._profiles) > 0:
-            print(f'Loading {str(self._profiles)} from {Config.profile_path}')
+            logger.info('Loading %s from %s', self._profiles, Config.profile_path)
             for profile in self._profiles:
                 self.merge(self.from_yaml(os.path.join(
                     Config.profile_path,
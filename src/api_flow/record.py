@@ -0,0 +1,36 @@
+class StepRecord:
+    """
+    The compact result of a finished step: its outputs, status and timings,
+    without the step's request, response or definition. When responses are
+    not retained (see "Config.retain_responses"), finished steps are replaced
+    in their flow by a StepRecord, so later templates still resolve their
+    outputs ({? step_one.my_value ?}) and reports still see their timings.
+    """
+
+    __slots__ = ('step_name', 'step_description', 'step_succeeded', 'step_status_code', 'step_attempts',
+                 'step_elapsed', 'step_timings', 'step_outputs')
+
+    def __init__(self, step):
+        """
+        StepRecord constructor.
+        :param step: the finished step to record
+        :type step: api_flow.step.Step
+        """
+        self.step_name = step.step_name
+        self.step_description = step.step_description
+        self.step_succeeded = step.step_succeeded
+        self.step_status_code = step.step_status_code
+        self.step_attempts = step.step_attempts
+        self.step_elapsed = step.step_elapsed
+        self.step_timings = step.step_timings.as_dict()
+        self.step_outputs = step.step_outputs
+
+    def __getattr__(self, name):
+        # Only called for names that are not slots: look the name up in the outputs
+        outputs = object.__getattribute__(self, 'step_outputs')
+        if name in outputs:
+            return outputs[name]
+        raise AttributeError(name)
+
+    def __repr__(self):
+        return f'StepRecord({self.step_name!r}, status_code={self.step_status_code!r})'
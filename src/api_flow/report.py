@@ -0,0 +1,56 @@
+import json
+
+
+# The phases of a step, in the order they happen (see Step.step_timings)
+PHASES = ('render', 'wait', 'download', 'parse', 'outputs', 'sleep')
+
+
+class RunReport:
+    """
+    Timings of a single flow execution: the total, every executed step of the
+    flow and its prerequisites with its per-phase timings, and the time
+    spent in each phase across all steps. Obtain one from "Flow.flow_report"
+    after executing the flow.
+    """
+
+    def __init__(self, flow):
+        """
+        RunReport constructor.
+
+        :param flow: an executed flow
+        :type flow: Flow
+        """
+        self.flow_name = flow.flow_name
+        self.succeeded = flow.succeeded
+        self.elapsed = flow.flow_elapsed
+        self.steps = {}
+        self.phases = dict((phase, 0.0) for phase in PHASES)
+        for name, step in flow.get_executed_steps():
+            timings = dict((phase, step.step_timings.get(phase, 0.0)) for phase in PHASES)
+            self.steps[name] = {
+                'succeeded': step.step_succeeded,
+                'status_code': step.step_status_code,
+                'attempts': step.step_attempts,
+                'elapsed': step.step_elapsed,
+                'timings': timings,
+            }
+            for phase, seconds in timings.items():
+                self.phases[phase] += seconds
+
+    def as_dict(self):
+        return {
+            'flow_name': self.flow_name,
+            'succeeded': self.succeeded,
+            'elapsed': self.elapsed,
+            'phases': self.phases,
+            'steps': self.steps,
+        }
+
+    def to_json(self, indent=2):
+        """
+        Serialize the report. Times are in seconds.
+        :param indent: the JSON indentation, or None for a single line
+        :type indent: int | None
+        :rtype: str
+        """
+        return json.dumps(self.as_dict(), indent=indent)
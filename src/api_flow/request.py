@@ -1,6 +1,39 @@
 import json
+import logging
 import requests
+import time
+from collections.abc import Iterator
+from contextlib import nullcontext
+from datetime import timedelta
+from functools import lru_cache, partial
+from api_flow import hooks
 from api_flow.complex_namespace import ComplexNamespace
+from api_flow.log import LazyMessage, truncate
+from api_flow.session import AsyncSession
+from api_flow.stream import STREAM_CHUNK_SIZE, StreamExtractor
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _get_json_loads():
+    """
+    Response bodies are decoded with the fastest JSON library available. It
+    is looked up when the first body is decoded, so that importing api_flow
+    does not pay for it.
+    """
+    try:
+        from orjson import loads
+    except ImportError:  # pragma: no cover
+        try:
+            from ujson import loads
+        except ImportError:
+            from json import loads
+    return loads
+
+
+def json_loads(content):
+    return _get_json_loads()(content)
 
 
 DEFAULT_HEADERS = {
@@ -20,7 +53,9 @@ class Request:
         elif isinstance(body, str):
             return body
         elif isinstance(body, ComplexNamespace):
-            return json.dumps(body.as_dict(), indent=2)
+            return json.dumps(body.downgrade_value(body), indent=2)
+        elif isinstance(body, Iterator):
+            return '<streamed body>'
         else:
             return json.dumps(body, indent=2)
 
@@ -31,71 +66,358 @@ class Request:
             return f"{output_headers}\n\n"
         return ''
 
+    @staticmethod
+    def _response_ok(response):
+        # requests exposes "ok", httpx (used for HTTP/2 sessions) "is_success"
+        if hasattr(response, 'ok'):
+            return response.ok
+        return response.is_success
+
     def __init__(self, step):
         self.request_step = step
+        self.request_url = None
+        self.request_headers = None
+        self.request_body = None
+        self.request_spool_path = None
         self.response = None
+        self.response_matches = None
+        self._parsed_response = (None, '')
+
+    def _render(self):
+        """
+        Render the step's url, headers and body templates once for the current
+        attempt. Logging and sending both use these rendered values, so
+        templates (and any functions they call) are evaluated once per attempt.
+        """
+        self.request_url = self.request_step.step_url
+        self.request_headers = {
+            **DEFAULT_HEADERS,
+            **self.request_step.step_headers
+        }
+        self.request_body = self.request_step.step_body
+        if self.request_step.step_stream is not None:
+            self.request_spool_path = self.request_step.step_spool_path
+
+    def _get_request_method(self):
+        """
+        Resolve the callable used to send the request. Steps running inside a
+        flow share the flow's pooled Session; a step used on its own falls back
+        to the module-level "requests" functions.
+        """
+        if self.request_session is not None:
+            return partial(self.request_session.request, self.request_step.step_method.upper())
+        return getattr(requests, self.request_step.step_method.lower())
 
     def _get_response_body(self):
-        if self.response is not None and hasattr(self.response, 'text'):
-            body = self.response.text
-            if isinstance(body, str) and len(body) > 0:
+        """
+        Decode the response body, once per response. JSON content is decoded
+        from the raw bytes; other text is only parsed if it looks like a JSON
+        document, and is otherwise returned as-is.
+        :return: the decoded body, the body text, or '' if there is none
+        """
+        response, body = self._parsed_response
+        if response is not self.response:
+            started = time.perf_counter()
+            body = self._parse_response_body(self.response)
+            self._add_timing('parse', time.perf_counter() - started)
+            self._parsed_response = (self.response, body)
+        return body
+
+    @staticmethod
+    def _parse_response_body(response):
+        if response is None:
+            return ''
+        content_type = (response.headers or {}).get('Content-Type', '') if hasattr(response, 'headers') else ''
+        if 'json' in content_type:
+            content = getattr(response, 'content', None)
+            if isinstance(content, (bytes, str)) and len(content) > 0:
                 try:
-                    body = json.loads(body)
+                    return Request._decode_json(content)
                 except ValueError:
                     pass
-                return body
+        body = getattr(response, 'text', None)
+        if isinstance(body, str) and len(body) > 0:
+            if body.lstrip()[:1] in ('{', '['):
+                try:
+                    return Request._decode_json(body)
+                except ValueError:
+                    pass
+            return body
         return ''
 
+    @staticmethod
+    def _decode_json(content):
+        try:
+            return json_loads(content)
+        except ValueError:
+            # ujson rejects some valid documents (e.g. integers beyond 64
+            # bits), so give the standard library the final word
+            return json.loads(content)
+
+    def _add_timing(self, phase, seconds):
+        timings = self.request_step.step_timings
+        setattr(timings, phase, timings.get(phase, 0.0) + seconds)
+
+    def _record_request_timings(self, sent, received):
+        """
+        Split the time spent in the HTTP call into waiting for the response
+        headers (DNS, connecting and time to first byte, which the HTTP
+        clients do not report separately) and downloading the body, using the
+        response's own "elapsed" measurement where the client provides one.
+        """
+        total = received - sent
+        elapsed = getattr(self.response, 'elapsed', None)
+        wait = min(elapsed.total_seconds(), total) if isinstance(elapsed, timedelta) else total
+        self._add_timing('wait', wait)
+        self._add_timing('download', total - wait)
+
     def _log_request(self):
-        print('vvvvvvvvvvvvvvvvvvv')
-        print('===== REQUEST =====')
-        print(f'{self.request_step.step_method.upper()} {self.request_step.step_url}')
-        print(self._format_headers(self.request_headers))
-        print(self._format_body(self.request_step.step_body))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'vvvvvvvvvvvvvvvvvvv\n===== REQUEST =====\n%s %s\n%s\n%s',
+                self.request_step.step_method.upper(),
+                self.request_url,
+                LazyMessage(self._format_headers, self.request_headers),
+                LazyMessage(lambda: truncate(self._format_body(self.request_body)))
+            )
 
     def _log_response(self):
-        print('===== RESPONSE =====')
-        print(f'HTTP {self.response.status_code}')
-        print(self._format_headers(self.response.headers))
-        print(self._format_body(self.response_body))
-        print("^^^^^^^^^^^^^^^^^^^^")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                '===== RESPONSE =====\nHTTP %s\n%s\n%s\n^^^^^^^^^^^^^^^^^^^^',
+                self.response.status_code,
+                LazyMessage(self._format_headers, self.response.headers),
+                LazyMessage(lambda: truncate(self._format_body(self.response_body)))
+            )
 
-    def _make_request(self):
-        body = self.request_step.step_body
-        headers = self.request_headers
-        url = self.request_step.step_url
-        if body is None:
-            return self.request_method(url, headers=headers)
-        elif isinstance(body, str):
-            return self.request_method(url, headers=headers, data=body)
-        else:
+    def _get_timeout(self):
+        """
+        The step's connect and read timeouts, shortened to whatever remains
+        of the flow's deadline.
+        :rtype: tuple[float | None, float | None]
+        """
+        connect, read = self.request_step.step_timeout
+        remaining = self.request_step.step_time_remaining
+        if remaining is not None:
+            remaining = max(remaining, 0.001)
+            connect = remaining if connect is None else min(connect, remaining)
+            read = remaining if read is None else min(read, remaining)
+        return connect, read
+
+    def _get_request_arguments(self):
+        """
+        Build the keyword arguments for the HTTP call from the rendered
+        request. Structured bodies are sent as JSON, string bodies as-is and
+        streamed bodies with chunked transfer encoding.
+        :return: the URL and a dict of keyword arguments
+        :rtype: tuple[str, dict]
+        """
+        body = self.request_body
+        arguments = {'headers': self.request_headers, 'timeout': self._get_timeout()}
+        if self.request_step.step_stream is not None:
+            arguments['stream'] = True
+        if isinstance(body, (str, Iterator)):
+            arguments['data'] = body
+        elif body is not None:
             if isinstance(body, ComplexNamespace):
-                body = body.as_dict()
-            return self.request_method(url, headers=headers, json=body)
+                body = body.downgrade_value(body)
+            arguments['json'] = body
+        return self.request_url, arguments
 
-    def execute(self):
+    def _make_request(self):
+        url, arguments = self._get_request_arguments()
+        try:
+            response = self.request_method(url, **arguments)
+        finally:
+            self._close_body()
+        if self.request_step.step_stream is not None:
+            self._read_stream(response)
+        return response
+
+    def _close_body(self):
+        # closing a streamed body closes its template file, even when the
+        # request failed before reading all of it
+        if isinstance(self.request_body, Iterator):
+            self.request_body.close()
+
+    @staticmethod
+    def _load_body(response):
+        # httpx reads stream bodies explicitly, requests on the first access
+        # to "content"
+        return response.read() if hasattr(response, 'read') else response.content
+
+    def _create_extractor(self):
+        outputs = self.request_step.step_definition.get('outputs', {})
+        return StreamExtractor(outputs) if outputs else None
+
+    def _open_spool(self):
+        return open(self.request_spool_path, 'wb') if self.request_spool_path else nullcontext()
+
+    def _finish_stream(self, response, extractor):
+        self.response_matches = extractor.close() if extractor is not None else {}
+        self._parsed_response = (response, '')
+
+    def _read_stream(self, response):
+        """
+        Read a streamed response in chunks, matching the step's outputs as the
+        chunks arrive and writing them to the spool file, if any, so the body
+        is never held in memory. Unsuccessful responses are read whole, so
+        they can be logged as usual.
+        """
+        self.response_matches = {}
+        try:
+            if not self._response_ok(response):
+                self._load_body(response)
+                return
+            extractor = self._create_extractor()
+            chunks = response.iter_content(STREAM_CHUNK_SIZE) if hasattr(response, 'iter_content') \
+                else response.iter_bytes(STREAM_CHUNK_SIZE)
+            with self._open_spool() as spool:
+                for chunk in chunks:
+                    if extractor is not None:
+                        extractor.feed(chunk)
+                    if self.request_spool_path:
+                        spool.write(chunk)
+            self._finish_stream(response, extractor)
+        finally:
+            response.close()
+
+    def _begin_execution(self):
+        """
+        Render and log the request before it is sent. Shared by Request and
+        AsyncRequest, which only differ in how they send it.
+        :return: the time the request is sent
+        :rtype: float
+        """
+        started = time.perf_counter()
+        self._render()
+        self._add_timing('render', time.perf_counter() - started)
         self._log_request()
-        self.response = self._make_request()
+        if hooks.HANDLERS:
+            hooks.emit('on_request', self)
+        return time.perf_counter()
+
+    def _fail_execution(self, error):
+        if hooks.HANDLERS:
+            hooks.emit('on_response', self, error)
+
+    def _end_execution(self, sent):
+        self._record_request_timings(sent, time.perf_counter())
         self._log_response()
+        if hooks.HANDLERS:
+            hooks.emit('on_response', self, None)
         return self.response_succeeded
 
+    def execute(self):
+        sent = self._begin_execution()
+        try:
+            self.response = self._make_request()
+        except Exception as e:
+            self._fail_execution(e)
+            raise
+        return self._end_execution(sent)
+
+    def release(self):
+        """
+        Drop the response and its decoded body, so they can be garbage
+        collected. The request then reads as not executed.
+        """
+        self.response = None
+        self._parsed_response = (None, '')
+
     request_executed = property(
         lambda self: self.response is not None
     )
-    request_method = property(
-        lambda self: getattr(requests, self.request_step.step_method.lower())
-    )
-    request_headers = property(
-        lambda self: {
-            **DEFAULT_HEADERS,
-            **self.request_step.step_headers
-        }
+    request_method = property(_get_request_method)
+    request_session = property(
+        lambda self: getattr(self.request_step, 'flow_session', None)
     )
     response_body = property(_get_response_body)
+    response_headers = property(
+        lambda self:
+            self.response.headers if self.request_executed else None
+    )
     response_status_code = property(
         lambda self:
             self.response.status_code if self.request_executed else None
     )
     response_succeeded = property(
-        lambda self: self.request_executed and self.response.ok
+        lambda self: self.request_executed and self._response_ok(self.response)
     )
+
+
+class AsyncRequest(Request):
+    """
+    The asyncio counterpart of Request, used by AsyncStep. The HTTP call is
+    awaited on the step's AsyncSession so it does not block the event loop.
+    """
+
+    def _get_request_arguments(self):
+        url, arguments = super()._get_request_arguments()
+        if isinstance(arguments.get('data'), Iterator):
+            arguments['data'] = self._iterate_async(arguments['data'])
+        return url, arguments
+
+    @staticmethod
+    async def _iterate_async(chunks):
+        # httpx.AsyncClient only streams request bodies from async iterators.
+        # The chunks are read from template files, so they are read on the
+        # default executor rather than on the event loop. asyncio is imported
+        # on use, so that synchronous runs never load it.
+        import asyncio
+        loop = asyncio.get_running_loop()
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    async def _make_request(self):
+        url, arguments = self._get_request_arguments()
+        method = self.request_step.step_method.upper()
+        try:
+            if self.request_session is not None:
+                return await self._receive(await self.request_session.request(method, url, **arguments))
+            async with AsyncSession() as session:
+                return await self._receive(await session.request(method, url, **arguments))
+        finally:
+            self._close_body()
+
+    async def _receive(self, response):
+        # streamed bodies are read before a temporary session closes
+        if self.request_step.step_stream is not None:
+            await self._read_stream(response)
+        return response
+
+    async def _read_stream(self, response):
+        self.response_matches = {}
+        try:
+            if not self._response_ok(response):
+                await response.aread()
+                return
+            extractor = self._create_extractor()
+            # file operations on the spool run on the default executor, so
+            # they do not block the event loop
+            import asyncio
+            loop = asyncio.get_running_loop()
+            spool = await loop.run_in_executor(None, self._open_spool)
+            try:
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    if extractor is not None:
+                        extractor.feed(chunk)
+                    if self.request_spool_path:
+                        await loop.run_in_executor(None, spool.write, chunk)
+            finally:
+                await loop.run_in_executor(None, spool.__exit__, None, None, None)
+            self._finish_stream(response, extractor)
+        finally:
+            await response.aclose()
+
+    async def execute(self):
+        sent = self._begin_execution()
+        try:
+            self.response = await self._make_request()
+        except Exception as e:
+            self._fail_execution(e)
+            raise
+        return self._end_execution(sent)
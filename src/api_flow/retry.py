@@ -0,0 +1,195 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from api_flow.complex_namespace import ComplexNamespace
+from api_flow.jsonpath import compile_jsonpath
+
+
+class ResponseCondition:
+    """
+    A test over a decoded response body. A condition is declared either as a
+    JSONPath expression, which holds when it matches a truthy value:
+
+        $.error.retryable
+
+    or as a map of JSONPath expressions to the value (or list of values) each
+    must match, all of which must hold:
+
+        $.status: [QUEUED, RUNNING]
+    """
+
+    def __init__(self, definition):
+        """
+        ResponseCondition constructor.
+        :param definition: the JSONPath expression or map of expressions
+        :type definition: str | ComplexNamespace | dict
+        :raise: ValueError for invalid expressions or definitions
+        """
+        if isinstance(definition, str):
+            self.expectations = [(compile_jsonpath(definition), None)]
+        elif isinstance(definition, (ComplexNamespace, dict)):
+            self.expectations = [
+                (compile_jsonpath(expression), expected)
+                for expression, expected in definition.items()
+            ]
+        else:
+            raise ValueError(f'Response conditions must be JSONPath expressions or maps, not {definition!r}.')
+
+    def matches(self, body):
+        """
+        :param body: the decoded response body
+        :return: whether the condition holds. Bodies that are not JSON
+                 documents never match.
+        :rtype: bool
+        """
+        if not isinstance(body, (dict, list)):
+            return False
+        return all(self._expectation_holds(expression, expected, body) for expression, expected in self.expectations)
+
+    @staticmethod
+    def _expectation_holds(expression, expected, body):
+        values = [match.value for match in expression.find(body)]
+        if expected is None:
+            return any(values)
+        if isinstance(expected, list):
+            return any(value in expected for value in values)
+        return expected in values
+
+
+class RetryPolicy:
+    """
+    Decides whether, and after how long, a failed request is tried again. A
+    step's "wait_for_success" settings are turned into a RetryPolicy:
+
+    - attempt: the maximum number of attempts, or None for no limit
+    - delay: seconds to wait before the second attempt
+    - backoff: the factor the delay grows by after every further attempt
+               (1 keeps it fixed, 2 doubles it)
+    - max_delay: an upper limit for a single delay
+    - jitter: wait a random time between zero and the delay instead ("full
+              jitter"), so that many clients do not retry in lockstep
+    - max_elapsed: stop retrying once the next attempt would start more than
+                   this many seconds after the first
+    - delay_first: also wait "delay" seconds before the first attempt
+    - until: a ResponseCondition that a successful response must also meet
+             to end the step. Responses that do not meet it yet are polled
+             again, whatever "retry_on" says.
+    - retry_on: which failures are retried. Without it every failed response
+                is retried, and exceptions are raised immediately. Otherwise
+                only failures matching one of these are:
+                - status: a list of HTTP status codes
+                - exceptions: a list of exception class names (matching
+                  subclasses too), e.g. [ConnectionError, Timeout]
+                - body: a ResponseCondition over the decoded response body
+
+    A "Retry-After" header on a retried response is honoured: the delay is
+    never shorter than what the server asked for.
+    """
+
+    def __init__(self, attempt=1, delay=0, backoff=1, max_delay=None, jitter=False, max_elapsed=None,
+                 delay_first=False, until=None, retry_on=None):
+        """
+        RetryPolicy constructor. Arguments are described on the class.
+        :raise: ValueError for an invalid "until" or "retry_on" body condition
+        """
+        self.attempt = attempt
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+        self.delay_first = delay_first
+        self.until = ResponseCondition(until) if until is not None else None
+        self.retry_on = retry_on
+        retry_on = retry_on or {}
+        self.retry_statuses = set(retry_on.get('status', None) or [])
+        self.retry_exceptions = set(retry_on.get('exceptions', None) or [])
+        self.retry_condition = ResponseCondition(retry_on['body']) if retry_on.get('body') is not None else None
+
+    def get_first_delay(self):
+        """
+        :return: seconds to wait before the first attempt
+        :rtype: float
+        """
+        return self.delay if self.delay_first else 0
+
+    def get_next_delay(self, attempt, elapsed, request, error=None):
+        """
+        Decide what happens after a failed attempt.
+        :param attempt: the number of the attempt that failed, starting at 1
+        :type attempt: int
+        :param elapsed: seconds since the first attempt started
+        :type elapsed: float
+        :param request: the step's request, holding the failed response
+        :type request: api_flow.request.Request
+        :param error: the exception the attempt raised, if any
+        :type error: Exception | None
+        :return: seconds to wait before the next attempt, or None to give up
+        :rtype: float | None
+        """
+        if (self.attempt is not None and attempt >= self.attempt) or not self.should_retry(request, error):
+            return None
+        delay = self.delay * self.backoff ** (attempt - 1)
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if error is None:
+            delay = max(delay, self._get_retry_after(request.response_headers))
+        if self.max_elapsed is not None and elapsed + delay > self.max_elapsed:
+            return None
+        return delay
+
+    def is_complete(self, body):
+        """
+        :param body: the decoded body of a successful response
+        :return: whether the "until" condition, if any, holds
+        :rtype: bool
+        """
+        return self.until is None or self.until.matches(body)
+
+    def retries_exception(self, error):
+        """
+        :param error: an exception raised while making a request
+        :type error: Exception
+        :return: whether "retry_on" lists its class or one of its bases
+        :rtype: bool
+        """
+        return any(cls.__name__ in self.retry_exceptions for cls in type(error).__mro__)
+
+    def should_retry(self, request, error=None):
+        """
+        :param request: the step's request, holding the failed response
+        :type request: api_flow.request.Request
+        :param error: the exception the attempt raised, if any
+        :type error: Exception | None
+        :return: whether the failure is retryable
+        :rtype: bool
+        """
+        if error is not None:
+            return self.retries_exception(error)
+        if self.retry_on is None or self.until is not None and request.response_succeeded:
+            return True
+        if request.response_status_code in self.retry_statuses:
+            return True
+        return self.retry_condition is not None and self.retry_condition.matches(request.response_body)
+
+    @staticmethod
+    def _get_retry_after(headers):
+        """
+        :param headers: the response headers
+        :return: the seconds a "Retry-After" header (in seconds or as an HTTP
+                 date) asks clients to wait, or 0
+        :rtype: float
+        """
+        value = (headers or {}).get('Retry-After')
+        if not isinstance(value, str) or not value:
+            return 0
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return 0
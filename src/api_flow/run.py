@@ -0,0 +1,62 @@
+import os
+import threading
+from collections import deque
+from api_flow.config import Config
+from api_flow.context import Context
+
+
+class Run(Context):
+    """
+    Storage scoped to a single top-level flow execution. A top-level Flow
+    creates a Run and shares it with its steps and every prerequisite flow,
+    so flows executing at the same time (in threads or asyncio tasks) never
+    see each other's state.
+
+    A Run exposes every flow constructed in it by name, and tracks the
+    current and previous flow and step. Prerequisite flows are looked up
+    here by name, so a prerequisite shared by several flows is only
+    constructed once per run; "flow_lock" guards that lookup.
+
+    The environment is read once, when the Run is created: every context in
+    the run resolves environment values from that snapshot.
+
+    With "Config.retain_responses" set, the Run also decides which finished
+    steps keep their responses: the most recent successful ones, up to that
+    number, and every failed one. Older successful steps are compacted into
+    StepRecords.
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Constructor for Run.
+
+        :param kwargs: the run is initialized with these values
+        """
+        super().__init__(**kwargs)
+        self._use_environment(dict(os.environ))
+        self.current_flow = None
+        self.previous_flow = None
+        self.current_step = None
+        self.previous_step = None
+        self.flow_lock = threading.Lock()
+        self._retain_responses = Config.retain_responses
+        self._retained_steps = deque()
+        self._retention_lock = threading.Lock()
+
+    def retain_step(self, step):
+        """
+        Track a finished step, compacting the oldest retained successful step
+        once more than "Config.retain_responses" are retained.
+        :param step: the finished step
+        :type step: api_flow.step.Step
+        """
+        if self._retain_responses is None or not step.step_succeeded:
+            return
+        with self._retention_lock:
+            self._retained_steps.append(step)
+            expired = [
+                self._retained_steps.popleft()
+                for _ in range(len(self._retained_steps) - self._retain_responses)
+            ]
+        for expired_step in expired:
+            expired_step.compact()
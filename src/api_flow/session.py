@@ -0,0 +1,206 @@
+import requests
+from requests.adapters import HTTPAdapter
+from api_flow.complex_namespace import ComplexNamespace
+from api_flow.config import Config
+
+# httpx is optional, and only imported when an HTTP/2 or asynchronous
+# session is created (see "_import_httpx"), so that importing api_flow does
+# not pay for it
+httpx = None
+
+
+# Baseline connection pool configuration. "pool_size" is the number of
+# per-host pools kept alive, "max_connections" the number of connections
+# kept alive in each of those pools.
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_CONNECTIONS = 10
+
+
+def get_timeout(value, default=None):
+    """
+    Resolve a "timeout" setting from a step or flow definition: a number of
+    seconds for both the connect and read timeouts, or a map with "connect"
+    and/or "read" keys. Zero means no timeout.
+    :param value: the setting, if any
+    :type value: float | ComplexNamespace | None
+    :param default: the (connect, read) timeouts used for missing values,
+                    defaulting to "Config.connect_timeout" and
+                    "Config.read_timeout"
+    :type default: tuple[float | None, float | None] | None
+    :return: the connect and read timeouts in seconds (None for no timeout)
+    :rtype: tuple[float | None, float | None]
+    :raise: ValueError for settings of any other form
+    """
+    connect, read = default or (Config.connect_timeout, Config.read_timeout)
+    if value is None:
+        return connect, read
+    if isinstance(value, ComplexNamespace):
+        unknown = set(value.keys()).difference(['connect', 'read'])
+        if unknown:
+            raise ValueError(f'Unknown timeout settings {sorted(unknown)}.')
+        connect = value.get('connect', connect)
+        read = value.get('read', read)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        connect = read = value
+    else:
+        raise ValueError(f'A timeout must be a number of seconds or a map of "connect" and "read", not {value!r}.')
+    return connect or None, read or None
+
+
+def _import_httpx(message):
+    """
+    Import the optional httpx package.
+    :param message: the error message if it is not installed
+    :type message: str
+    :raise: ImportError if httpx is not installed
+    """
+    global httpx
+    try:
+        import httpx
+    except ImportError:
+        raise ImportError(message) from None
+
+
+def _get_httpx_timeout(timeout):
+    # requests takes a (connect, read) tuple; httpx also applies the read
+    # timeout to writes and to waiting for a pooled connection
+    connect, read = timeout
+    return httpx.Timeout(read, connect=connect)
+
+
+class Session:
+    """
+    A connection-pooling HTTP session shared by every Request in a flow run.
+
+    A top-level Flow creates one of these (unless one is supplied) and hands
+    it down to its steps and prerequisite flows, so that repeated requests to
+    the same host reuse keep-alive connections instead of paying a new TCP/TLS
+    handshake for every step. Sessions can also be constructed directly and
+    passed to several flows to share connections across runs.
+
+    HTTP/2 is supported through the optional "httpx" package
+    (pip install httpx[http2]).
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, max_connections=DEFAULT_MAX_CONNECTIONS, http2=False):
+        """
+        Session constructor.
+
+        :param pool_size: the number of per-host connection pools to keep
+        :type pool_size: int
+        :param max_connections: the maximum number of connections kept alive
+                                in each per-host pool
+        :type max_connections: int
+        :param http2: negotiate HTTP/2 where the server supports it (requires
+                      httpx)
+        :type http2: bool
+        """
+        self.pool_size = pool_size
+        self.max_connections = max_connections
+        self.http2 = http2
+        self.client = self._create_client()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _create_client(self):
+        if self.http2:
+            _import_httpx('HTTP/2 sessions require the httpx package (pip install httpx[http2]).')
+            total_connections = self.pool_size * self.max_connections
+            return httpx.Client(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=total_connections,
+                    max_keepalive_connections=total_connections
+                )
+            )
+        client = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.max_connections)
+        client.mount('http://', adapter)
+        client.mount('https://', adapter)
+        return client
+
+    def close(self):
+        """
+        Release every pooled connection.
+        """
+        self.client.close()
+
+    def request(self, method, url, stream=False, **kwargs):
+        """
+        Perform a request using the pooled client. Accepts the same keyword
+        arguments as "requests.request".
+
+        :param method: the HTTP method
+        :type method: str
+        :param url: the URL to request
+        :type url: str
+        :param stream: return as soon as the headers arrive, leaving the body
+                       to be read (and the response closed) by the caller
+        :type stream: bool
+        :return: the response object
+        """
+        if self.http2:
+            if 'data' in kwargs:
+                kwargs['content'] = kwargs.pop('data')
+            if 'timeout' in kwargs:
+                kwargs['timeout'] = _get_httpx_timeout(kwargs['timeout'])
+            if stream:
+                return self.client.send(self.client.build_request(method.upper(), url, **kwargs), stream=True)
+            return self.client.request(method.upper(), url, **kwargs)
+        if stream:
+            kwargs['stream'] = True
+        return self.client.request(method.upper(), url, **kwargs)
+
+
+class AsyncSession:
+    """
+    The asyncio counterpart of Session, shared by every AsyncRequest in an
+    AsyncFlow run. Built on "httpx.AsyncClient", so the optional httpx
+    package is required (pip install httpx).
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, max_connections=DEFAULT_MAX_CONNECTIONS, http2=False):
+        """
+        AsyncSession constructor. Arguments are the same as for Session.
+        """
+        _import_httpx('Asynchronous flows require the httpx package (pip install httpx).')
+        self.pool_size = pool_size
+        self.max_connections = max_connections
+        self.http2 = http2
+        total_connections = self.pool_size * self.max_connections
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=total_connections,
+                max_keepalive_connections=total_connections
+            )
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        """
+        Release every pooled connection.
+        """
+        await self.client.aclose()
+
+    async def request(self, method, url, stream=False, **kwargs):
+        """
+        Perform a request using the pooled client without blocking the event
+        loop. Accepts the same keyword arguments as Session.request.
+        """
+        if 'data' in kwargs:
+            kwargs['content'] = kwargs.pop('data')
+        if 'timeout' in kwargs:
+            kwargs['timeout'] = _get_httpx_timeout(kwargs['timeout'])
+        if stream:
+            return await self.client.send(self.client.build_request(method.upper(), url, **kwargs), stream=True)
+        return await self.client.request(method.upper(), url, **kwargs)
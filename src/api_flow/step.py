@@ -1,158 +1,428 @@
-import time
-from functools import reduce
-from jsonpath_ng import parse
-from api_flow.complex_namespace import ComplexNamespace
-from api_flow.context import Context
-from api_flow.request import Request
-from api_flow.template import Template
-
-
-# Baseline configuration for retryable requests.
-# These are only applied if wait_for_success is
-# provided in the step definition.
-DEFAULT_ATTEMPT_COUNT = 3
-DEFAULT_DELAY_SECONDS = 5
-RUN_ONCE = {
-    'attempt': 1,
-    'delay': 0
-}
-RETRY = {
-    'attempt': DEFAULT_ATTEMPT_COUNT,
-    'delay': DEFAULT_DELAY_SECONDS
-}
-
-
-class Step(Context):
-    """ a class representing a single API request
-        After the request is executed, the following properties are available on the step object:
-        - response (Response): the raw result of the requests call
-        - status_code (int): the HTTP status code from the response
-        - succeeded (boolean): whether the HTTP request was successful
-        - mapped properties as defined by the "outputs" section of the step config.
-
-        Substitution values are available from the parent context, which will include the base environment values and
-        output from previous steps.  The previous steps can be referred to by their YAML dict key string.  As a
-        shortcut, the step immediately prior to this one in the current flow is available as 'previous_step'.
-
-        For instance, in a flow starting with "step_one" with an output "my_value", a valid substitution would be
-        {? step_one.my_value ?}, but in "step_two" this could also be expressed {? previous_step.my_value ?}.
-    """
-
-    def __init__(self, step_name, step_definition, parent=None):
-        """ Step constructor
-            :argument step_name (str) The name string derived from the Flow yaml.  Used in output if no description.
-            :argument step_definition (dict) The step structure pulled from the Flow yaml.
-                      The step can contain the following fields:
-                      description (str): (optional) a descriptive string used in output
-                      url (str): (required) the URL for the request
-                      method (str): (optional) an HTTP request method (default GET)
-                      headers (dict): (optional) a dict of HTTP headers to send with the request (default above)
-                      body (str): (optional) the body for requests that require one.
-                                  The body can be defined in YAML, and will be rendered as JSON for the request,
-                                  or can load a JSON template from the templates directory using, e.g.,
-                                  template:my_template as the body value.
-                      outputs (dict): A map of variable names to JSONPath expressions that will be used to pull
-                                      the corresponding values out of response JSON.
-                      wait_for_success (bool|dict): (optional, default false) If true, requests will be retried
-                                                    until a success response is returned. If the dict form is
-                                                    given, the following configuration options are supported:
-                                                    - delay: (number, default 5) Time in seconds to wait before
-                                                             trying the request. The delay will be applied before
-                                                             every attempt, including the first one.
-                                                    - attempts: (number, default 3) The number of times to try the
-                                                                request before giving up. On failure, the last
-                                                                response returned will be exposed.
-                      All values support template substitutions except "method", "description" and "outputs".
-            :argument parent (Context) The parent context, typically the Flow, provides substitution values.
-        """
-        super().__init__(parent=parent)
-        self.step_name = step_name
-        self.step_definition = step_definition
-        self.step_description = self.step_definition.get('description', self.step_name)
-        self.step_method = self.step_definition.get('method', 'GET')
-        self.step_request = Request(self)
-        self.step_retry_config = self._get_retry_config()
-        if parent is not None:
-            setattr(parent, self.step_name, self)
-
-    def _gather_outputs(self):
-        """ After the request is completed, every key in the "outputs" section of the step is evaluated as a
-            JSONPath against the response json, and the result stored as properties on the object. """
-        outputs = dict(map(
-            lambda match: (
-                match[0],
-                match[1][0] if len(match[1]) == 1 else match[1],
-            ),
-            map(
-                lambda output: (
-                    output[0],
-                    list(map(
-                        lambda v: v.value,
-                        parse(output[1]).find(self.step_request.response_body)
-                    ))
-                ),
-                self.step_definition.get('outputs', {}).items()
-            )
-        )) if isinstance(self.step_request.response_body, dict) else {}
-        if outputs:
-            print('\n===== STEP OUTPUTS =====')
-            for item in outputs.items():
-                setattr(self, *item)
-                print(f'{item[0]}: {item[1]}')
-
-    def _generate_attempts(self):
-        attempt_count = self.step_retry_config.attempt
-        delay_in_seconds = self.step_retry_config.delay
-
-        attempt = 0
-        succeeded = False
-        while attempt < attempt_count and not succeeded:
-            attempt = attempt + 1
-            print(f'(Attempt {attempt}/{attempt_count})')
-            if delay_in_seconds > 0:
-                time.sleep(delay_in_seconds)
-            succeeded = self.step_request.execute()
-            yield succeeded
-
-    def _get_retry_config(self):
-        wait_for_success = self.step_definition.get('wait_for_success', False)
-        wait_for_success = {
-            **RETRY,
-            **wait_for_success
-        } if isinstance(wait_for_success, ComplexNamespace) else (
-            RETRY if wait_for_success else RUN_ONCE
-        )
-        return ComplexNamespace(**wait_for_success)
-
-    def execute(self):
-        """ Run the API request and make the outputs available.
-            This will be triggered automatically by accessing the "response" attribute if the request has not yet been
-            run.  The "requests" response object is stored on the step object itself.
-        """
-        print(f'\nExecuting step {self.step_description} of flow {self.flow_description}')
-        self.flow_store.current_step = self
-        if reduce(lambda r, v: r or v, self._generate_attempts(), False):
-            self._gather_outputs()
-            self.flow_store.previous_step = self
-            self.flow_store.current_step = None
-        print(f'Completed step {self.step_description}\n')
-        return self.step_request.response_succeeded
-
-    step_body = property(
-        lambda self: Template.interpolate(
-            self.step_definition.get('body'),
-            self
-        )
-    )
-    step_headers = property(
-        lambda self: Template.interpolate(
-            self.step_definition.get('headers', {}),
-            self
-        )
-    )
-    step_url = property(
-        lambda self: Template.interpolate(
-            self.step_definition['url'],
-            self
-        )
-    )
+import logging
+import time
+from api_flow import hooks
+from api_flow.complex_namespace import ComplexNamespace
+from api_flow.context import Context
+from api_flow.jsonpath import compile_jsonpath
+from api_flow.log import LazyMessage
+from api_flow.record import StepRecord
+from api_flow.request import AsyncRequest, Request
+from api_flow.retry import RetryPolicy
+from api_flow.session import get_timeout
+from api_flow.stream import StreamExtractor
+from api_flow.template import Template
+
+logger = logging.getLogger(__name__)
+
+
+# Baseline configuration for retryable requests.
+# These are only applied if wait_for_success is
+# provided in the step definition.
+DEFAULT_ATTEMPT_COUNT = 3
+DEFAULT_DELAY_SECONDS = 5
+RUN_ONCE = {
+    'attempt': 1,
+    'delay': 0
+}
+RETRY = {
+    'attempt': DEFAULT_ATTEMPT_COUNT,
+    'delay': DEFAULT_DELAY_SECONDS
+}
+# Steps that poll with an "until" condition start polling quickly and slow
+# down, until the condition holds or the deadline passes.
+POLL = {
+    'attempt': None,
+    'delay': 0.5,
+    'backoff': 1.5,
+    'max_delay': 30,
+    'max_elapsed': 300
+}
+
+
+class Step(Context):
+    """ a class representing a single API request
+        After the request is executed, the following properties are available on the step object:
+        - response (Response): the raw result of the requests call
+        - status_code (int): the HTTP status code from the response
+        - succeeded (boolean): whether the HTTP request was successful
+        - step_elapsed (float): seconds spent executing the step, including retries
+        - step_time_remaining (float|None): seconds left before the flow's deadline, if it has one
+        - step_attempts (int): the number of requests made
+        - step_spool_path (str|None): the file a streamed response body was written to, if any
+        - step_timings (dict): seconds spent in each phase of the step, summed over attempts: "render" (templates),
+          "wait" (DNS, connecting and time to first byte), "download" (the response body), "parse" (decoding the
+          body), "outputs" (extracting outputs) and "sleep" (retry delays)
+        - mapped properties as defined by the "outputs" section of the step config.
+
+        Substitution values are available from the parent context, which will include the base environment values and
+        output from previous steps.  The previous steps can be referred to by their YAML dict key string.  As a
+        shortcut, the step immediately prior to this one in the current flow is available as 'previous_step'.
+
+        For instance, in a flow starting with "step_one" with an output "my_value", a valid substitution would be
+        {? step_one.my_value ?}, but in "step_two" this could also be expressed {? previous_step.my_value ?}.
+    """
+
+    def __init__(self, step_name, step_definition, parent=None):
+        """ Step constructor
+            :argument step_name (str) The name string derived from the Flow yaml.  Used in output if no description.
+            :argument step_definition (dict) The step structure pulled from the Flow yaml.
+                      The step can contain the following fields:
+                      description (str): (optional) a descriptive string used in output
+                      url (str): (required) the URL for the request
+                      method (str): (optional) an HTTP request method (default GET)
+                      headers (dict): (optional) a dict of HTTP headers to send with the request (default above)
+                      body (str): (optional) the body for requests that require one.
+                                  The body can be defined in YAML, and will be rendered as JSON for the request,
+                                  or can load a JSON template from the templates directory using, e.g.,
+                                  template:my_template as the body value.
+                      stream_body (bool): (optional, default false) send a template:my_template body as a chunked
+                                          upload, reading and rendering the template file piece by piece
+                                          (see Template.stream).
+                      outputs (dict): A map of variable names to JSONPath expressions that will be used to pull
+                                      the corresponding values out of response JSON.
+                      wait_for_success (bool|dict): (optional, default false) If true, requests will be retried
+                                                    until a success response is returned. If the dict form is
+                                                    given, the following configuration options are supported:
+                                                    - delay: (number, default 5) Time in seconds to wait before
+                                                             retrying the request. The first attempt is not
+                                                             delayed unless "delay_first" is set.
+                                                    - attempt: (number, default 3) The number of times to try the
+                                                               request before giving up. On failure, the last
+                                                               response returned will be exposed.
+                                                    - until: (condition) poll until the response body meets
+                                                             this JSONPath condition (see ResponseCondition).
+                                                             Polling defaults are given in POLL.
+                                                    - backoff, max_delay, jitter, max_elapsed, retry_on: see
+                                                      RetryPolicy.
+                      stream (bool|dict): (optional, default false) read the response body in chunks instead of
+                                          loading it whole, matching "outputs" as it arrives (see
+                                          api_flow.stream). The dict form takes a "spool" path the body is
+                                          written to. The response body is not available to templates.
+                      timeout (number|dict): (optional) seconds to wait for a connection and for the server to send
+                                             data, or a dict with "connect" and "read" keys. Defaults to the flow's
+                                             "timeout", then to Config.connect_timeout and Config.read_timeout.
+                      All values support template substitutions except "method", "description" and "outputs".
+            :argument parent (Context) The parent context, typically the Flow, provides substitution values.
+        """
+        super().__init__(parent=parent)
+        self.step_name = step_name
+        self.step_definition = step_definition
+        self.step_description = self.step_definition.get('description', self.step_name)
+        self.step_method = self.step_definition.get('method', 'GET')
+        self.step_timings = {}
+        self.step_attempts = 0
+        self.step_request = self._create_request()
+        self.step_retry_config = self._get_retry_config()
+        self.step_stream = self._get_stream_config()
+        self.step_stream_body = self._get_stream_body_config()
+        self.step_timeout = get_timeout(self.step_definition.get('timeout'), getattr(self, 'flow_timeout', None))
+        self.step_elapsed = None
+        self.step_succeeded = None
+        self.step_status_code = None
+        self.step_predecessor = None
+        if parent is not None:
+            setattr(parent, self.step_name, self)
+
+    def _create_request(self):
+        return Request(self)
+
+    def _find_outputs(self):
+        """ The values matched by each output's JSONPath: collected while the body was read for streamed steps,
+            otherwise found in the decoded response json. """
+        if self.step_stream is not None:
+            return self.step_request.response_matches or {}
+        return dict(map(
+            lambda output: (
+                output[0],
+                list(map(
+                    lambda v: v.value,
+                    compile_jsonpath(output[1]).find(self.step_request.response_body)
+                ))
+            ),
+            self.step_definition.get('outputs', {}).items()
+        )) if isinstance(self.step_request.response_body, dict) else {}
+
+    def _gather_outputs(self):
+        """ After the request is completed, every key in the "outputs" section of the step is evaluated as a
+            JSONPath against the response json, and the result stored as properties on the object. """
+        outputs = dict(map(
+            lambda match: (
+                match[0],
+                match[1][0] if len(match[1]) == 1 else match[1],
+            ),
+            self._find_outputs().items()
+        ))
+        if outputs:
+            for item in outputs.items():
+                setattr(self, *item)
+            logger.info(
+                '===== STEP OUTPUTS =====\n%s',
+                LazyMessage(lambda: '\n'.join(f'{name}: {value}' for name, value in outputs.items()))
+            )
+
+    def _is_complete(self, succeeded):
+        """ A successful response only completes a polling step once its "until" condition holds.  The body is only
+            decoded here if there is a condition to check. """
+        retry_config = self.step_retry_config
+        if succeeded and retry_config.until is not None \
+                and not retry_config.is_complete(self.step_request.response_body):
+            logger.info('Waiting for the "until" condition of step %s', self.step_description)
+            return False
+        return succeeded
+
+    def _add_timing(self, phase, seconds):
+        setattr(self.step_timings, phase, self.step_timings.get(phase, 0.0) + seconds)
+
+    def _get_time_remaining(self):
+        deadline = getattr(self, 'flow_deadline', None)
+        return None if deadline is None else deadline - time.perf_counter()
+
+    def _get_previous_step(self):
+        """ The step declared before this one in its flow (or its StepRecord), named by "step_predecessor". Without
+            one, "previous_step" resolves through the parent chain to the run's previous step. """
+        predecessor = vars(self.parent).get(self.step_predecessor) if self.step_predecessor is not None else None
+        return predecessor if predecessor is not None else self.__getattr__('previous_step')
+
+    def _out_of_time(self, needed=0):
+        """ Whether the flow's deadline leaves no time for the next "needed" seconds (and an attempt after them). """
+        remaining = self._get_time_remaining()
+        return remaining is not None and remaining <= needed
+
+    def _fail_deadline(self):
+        logger.error('Step %s ran out of time: the deadline of flow %s has passed', self.step_description,
+                     self.flow_description)
+        return False
+
+    def _retries_error(self, error):
+        """ Whether a request that raised is retried: the retry policy retries on the error, or the flow's deadline
+            has passed (so the step fails on it instead). """
+        if not self.step_retry_config.retries_exception(error) and not self._out_of_time():
+            return False
+        logger.info('Request failed: %r', error)
+        return True
+
+    def _attempts(self):
+        """ The retry loop, shared by Step and AsyncStep, which only differ in how they wait and send the request.
+            Before each attempt this generator yields the seconds to sleep, if any, and then None to have the request
+            sent, which is answered with the (succeeded, error) outcome of "_execute_attempt". It returns whether the
+            step succeeded, or raises the error of its last attempt. """
+        retry_policy = self.step_retry_config
+        started = time.perf_counter()
+        delay = retry_policy.get_first_delay()
+        attempt = 0
+        while True:
+            attempt = attempt + 1
+            logger.info('(Attempt %d/%s)', attempt, retry_policy.attempt or '-')
+            if delay > 0:
+                yield delay
+                self._add_timing('sleep', delay)
+            if self._out_of_time():
+                return self._fail_deadline()
+            self.step_attempts = attempt
+            if hooks.HANDLERS:
+                hooks.emit('on_attempt', self, attempt)
+            succeeded, error = yield None
+            if succeeded:
+                return True
+            delay = retry_policy.get_next_delay(attempt, time.perf_counter() - started, self.step_request, error)
+            if self._out_of_time(delay or 0):
+                return self._fail_deadline()
+            if delay is None:
+                if error is not None:
+                    raise error
+                return False
+
+    def _execute_attempt(self):
+        """ Send the request once. Exceptions the retry policy retries on are returned rather than raised. """
+        try:
+            return self._is_complete(self.step_request.execute()), None
+        except Exception as e:
+            if not self._retries_error(e):
+                raise
+            return False, e
+
+    def _run_attempts(self):
+        attempts = self._attempts()
+        outcome = None
+        try:
+            while True:
+                delay = attempts.send(outcome)
+                outcome = self._execute_attempt() if delay is None else time.sleep(delay)
+        except StopIteration as stop:
+            return stop.value
+
+    def compact(self):
+        """
+        Replace this finished step in its flow with a StepRecord, and release
+        its response. The step object itself keeps its outputs, status and
+        timings.
+        :return: the record
+        :rtype: StepRecord
+        """
+        record = StepRecord(self)
+        if self.parent is not None and vars(self.parent).get(self.step_name) is self:
+            setattr(self.parent, self.step_name, record)
+        self.step_request.release()
+        return record
+
+    def _get_retry_config(self):
+        wait_for_success = self.step_definition.get('wait_for_success', False)
+        wait_for_success = {
+            **RETRY,
+            **(POLL if 'until' in wait_for_success.keys() else {}),
+            **wait_for_success
+        } if isinstance(wait_for_success, ComplexNamespace) else (
+            RETRY if wait_for_success else RUN_ONCE
+        )
+        try:
+            return RetryPolicy(**wait_for_success)
+        except TypeError as e:
+            raise ValueError(f'Invalid wait_for_success for step "{self.step_name}": {str(e)}') from e
+
+    def _get_stream_config(self):
+        stream = self.step_definition.get('stream', False)
+        if not stream:
+            return None
+        if stream is True:
+            stream = ComplexNamespace()
+        elif not isinstance(stream, ComplexNamespace) or set(stream.keys()).difference(['spool']):
+            raise ValueError(f'Invalid stream for step "{self.step_name}": expected true or a map with a "spool" '
+                             f'path, not {stream!r}.')
+        if self.step_retry_config.until is not None or self.step_retry_config.retry_condition is not None:
+            raise ValueError(f'Step "{self.step_name}" streams its response, so its wait_for_success conditions '
+                             f'cannot test the response body.')
+        # fail now, not mid-run, on a missing ijson or outputs that cannot be matched incrementally
+        StreamExtractor(self.step_definition.get('outputs', {}))
+        return stream
+
+    def _get_stream_body_config(self):
+        stream_body = self.step_definition.get('stream_body', False)
+        if not isinstance(stream_body, bool):
+            raise ValueError(f'Invalid stream_body for step "{self.step_name}": expected true or false, '
+                             f'not {stream_body!r}.')
+        body = self.step_definition.get('body')
+        if stream_body and not (isinstance(body, str) and Template.TEMPLATE_TAG.fullmatch(body)):
+            raise ValueError(f'Step "{self.step_name}" streams its body, so the body must be a "template:" file.')
+        return stream_body
+
+    def _get_body(self):
+        if self.step_stream_body:
+            return Template.stream(self.step_definition.get('body'), self)
+        return Template.interpolate(self.step_definition.get('body'), self)
+
+    def _begin_execution(self):
+        logger.info('Executing step %s of flow %s', self.step_description, self.flow_description)
+        self.flow_store.current_step = self
+        self._step_started = time.perf_counter()
+        if hooks.HANDLERS:
+            hooks.emit('on_step_start', self)
+
+    def _end_execution(self, succeeded):
+        if succeeded:
+            if self.step_stream is None:
+                # decode the body first, so its 'parse' time is not counted as 'outputs' too
+                self.step_request.response_body
+            started = time.perf_counter()
+            self._gather_outputs()
+            self._add_timing('outputs', time.perf_counter() - started)
+        self.step_elapsed = time.perf_counter() - self._step_started
+        if succeeded:
+            self.flow_store.previous_step = self
+            self.flow_store.current_step = None
+        logger.info('Completed step %s', self.step_description)
+        succeeded = bool(succeeded and self.step_request.response_succeeded)
+        self.step_succeeded = succeeded
+        self.step_status_code = self.step_request.response_status_code
+        if hooks.HANDLERS:
+            hooks.emit('on_step_end', self, succeeded)
+        self.flow_store.retain_step(self)
+        return succeeded
+
+    def _abort_execution(self):
+        """ Finish a step whose execution raised before it could end normally: it counts as failed, and hooks see
+            it end. """
+        if self.step_succeeded is not None:
+            return
+        self.step_elapsed = time.perf_counter() - self._step_started
+        self.step_succeeded = False
+        self.step_status_code = self.step_request.response_status_code
+        if hooks.HANDLERS:
+            hooks.emit('on_step_end', self, False)
+
+    def execute(self):
+        """ Run the API request and make the outputs available.
+            This will be triggered automatically by accessing the "response" attribute if the request has not yet been
+            run.  The "requests" response object is stored on the step object itself.
+        """
+        self._begin_execution()
+        try:
+            return self._end_execution(self._run_attempts())
+        finally:
+            self._abort_execution()
+
+    step_body = property(_get_body)
+    step_headers = property(
+        lambda self: Template.interpolate(
+            self.step_definition.get('headers', {}),
+            self
+        )
+    )
+    step_outputs = property(
+        lambda self: dict(
+            (name, vars(self)[name])
+            for name in self.step_definition.get('outputs', {}).keys() if name in vars(self)
+        )
+    )
+    step_spool_path = property(
+        lambda self: Template.interpolate(
+            self.step_stream.get('spool'),
+            self
+        ) if self.step_stream is not None else None
+    )
+    previous_step = property(_get_previous_step)
+    step_time_remaining = property(_get_time_remaining)
+    step_url = property(
+        lambda self: Template.interpolate(
+            self.step_definition['url'],
+            self
+        )
+    )
+
+
+class AsyncStep(Step):
+    """ The asyncio counterpart of Step, executed by AsyncFlow.
+        Requests are awaited through an AsyncRequest and retry delays use asyncio.sleep, so many steps can wait on
+        the same event loop at once. Templates, retry configuration and outputs behave exactly as they do for Step.
+    """
+
+    def _create_request(self):
+        return AsyncRequest(self)
+
+    async def _execute_attempt(self):
+        try:
+            return self._is_complete(await self.step_request.execute()), None
+        except Exception as e:
+            if not self._retries_error(e):
+                raise
+            return False, e
+
+    async def _run_attempts(self):
+        # asyncio is imported on use, so that synchronous runs never load it
+        import asyncio
+        attempts = self._attempts()
+        outcome = None
+        try:
+            while True:
+                delay = attempts.send(outcome)
+                outcome = await self._execute_attempt() if delay is None else await asyncio.sleep(delay)
+        except StopIteration as stop:
+            return stop.value
+
+    async def execute(self):
+        """ Run the API request without blocking the event loop and make the outputs available.
+        """
+        self._begin_execution()
+        try:
+            return self._end_execution(await self._run_attempts())
+        finally:
+            self._abort_execution()
@@ -0,0 +1,164 @@
+from jsonpath_ng.jsonpath import Child, Fields, Index, Root, Slice
+from api_flow.jsonpath import compile_jsonpath
+
+# The optional ijson package is imported when a StreamExtractor is created,
+# so that importing api_flow does not pay for it
+ijson = ObjectBuilder = None
+
+
+"""
+Streamed steps ("stream: true") never hold their response body in memory:
+the body is read in chunks, fed to an incremental JSON parser, and only the
+values matched by the step's outputs are built. Memory use depends on the
+size of those values, not of the response.
+
+Incremental matching supports JSONPath expressions made of plain steps from
+the root: fields ($.a.b, $['a b']), wildcards ($.a.*, $.a[*]) and array
+indices ($.a[0]). Requires the optional "ijson" package (pip install ijson).
+"""
+
+# Bytes read from a streamed response at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Path components matching any object key, and any array index
+ANY_KEY = object()
+ANY_INDEX = object()
+
+_SCALAR_EVENTS = ('null', 'boolean', 'integer', 'double', 'number', 'string')
+
+
+def compile_stream_path(expression):
+    """
+    Convert a JSONPath expression into the list of path components the
+    StreamExtractor matches: object keys (str), array indices (int), ANY_KEY
+    and ANY_INDEX.
+    :param expression: the JSONPath expression
+    :type expression: str
+    :return: the path components, from the root
+    :rtype: list
+    :raise: ValueError for invalid expressions and expressions that cannot be
+            matched incrementally
+    """
+    def visit(node):
+        if isinstance(node, Root):
+            return []
+        if isinstance(node, Child):
+            return visit(node.left) + visit(node.right)
+        if isinstance(node, Fields) and len(node.fields) == 1:
+            return [ANY_KEY if node.fields[0] == '*' else node.fields[0]]
+        if isinstance(node, Slice) and node.start is None and node.end is None and node.step is None:
+            return [ANY_INDEX]
+        if isinstance(node, Index) and len(node.indices) == 1 and node.indices[0] >= 0:
+            return [node.indices[0]]
+        raise ValueError(f'JSONPath expression "{expression}" cannot be matched in a streamed response: only fields, '
+                         f'wildcards and array indices are supported.')
+
+    return visit(compile_jsonpath(expression))
+
+
+class StreamExtractor:
+    """
+    Matches JSONPath outputs against a JSON document fed in chunks. Values
+    are collected in document order, as jsonpath_ng would find them.
+    """
+
+    def __init__(self, outputs):
+        """
+        StreamExtractor constructor.
+        :param outputs: output names mapped to JSONPath expressions
+        :type outputs: dict[str, str] | ComplexNamespace
+        :raise: ImportError if ijson is not installed, ValueError for
+                expressions that cannot be matched incrementally
+        """
+        global ijson, ObjectBuilder
+        try:
+            import ijson
+            from ijson.common import ObjectBuilder
+        except ImportError:
+            raise ImportError('Streamed responses require the ijson package (pip install ijson).') from None
+        self.paths = [(name, compile_stream_path(expression)) for name, expression in outputs.items()]
+        self.values = dict((name, []) for name, _ in self.paths)
+        self.root_is_object = None
+        # one [is_object, key or index] entry per open container
+        self._containers = []
+        # (output names, builder, depth) for every matched value being built
+        self._builders = []
+        self._events = ijson.sendable_list()
+        self._parser = ijson.basic_parse_coro(self._events, use_float=True)
+
+    def feed(self, chunk):
+        """
+        Parse the next chunk of the document.
+        :param chunk: the next bytes of the document
+        :type chunk: bytes
+        :raise: ijson.JSONError if the document is not valid JSON
+        """
+        self._parser.send(chunk)
+        self._handle_events()
+
+    def close(self):
+        """
+        Finish parsing.
+        :return: the values matched by each output, or an empty dict if the
+                 document is not a JSON object
+        :rtype: dict[str, list]
+        :raise: ijson.IncompleteJSONError if the document was cut short
+        """
+        self._parser.close()
+        self._handle_events()
+        return self.values if self.root_is_object else {}
+
+    def _matching_outputs(self):
+        path = [entry[1] for entry in self._containers]
+        return [name for name, components in self.paths if self._path_matches(components, path)]
+
+    def _path_matches(self, components, path):
+        if len(components) != len(path):
+            return False
+        for component, (is_object, _), step in zip(components, self._containers, path):
+            if component is ANY_KEY or component is ANY_INDEX:
+                if is_object != (component is ANY_KEY):
+                    return False
+            elif isinstance(component, int) != (not is_object) or component != step:
+                return False
+        return True
+
+    def _handle_events(self):
+        for event, value in self._events:
+            if event == 'map_key':
+                self._containers[-1][1] = value
+            elif event in ('end_map', 'end_array'):
+                self._containers.pop()
+            else:
+                self._begin_value(event, value)
+            for builder in self._builders:
+                builder[1].event(event, value)
+            if event in ('end_map', 'end_array'):
+                self._end_value()
+            elif event in _SCALAR_EVENTS:
+                self._advance_index()
+        del self._events[:]
+
+    def _begin_value(self, event, value):
+        if self.root_is_object is None:
+            self.root_is_object = event == 'start_map'
+        names = self._matching_outputs() if self.paths else []
+        if event in _SCALAR_EVENTS:
+            for name in names:
+                self.values[name].append(value)
+            return
+        if names:
+            self._builders.append((names, ObjectBuilder(), len(self._containers)))
+        self._containers.append([event == 'start_map', None if event == 'start_map' else 0])
+
+    def _end_value(self):
+        depth = len(self._containers)
+        while self._builders and self._builders[-1][2] == depth:
+            names, builder, _ = self._builders.pop()
+            for name in names:
+                self.values[name].append(builder.value)
+        self._advance_index()
+
+    def _advance_index(self):
+        if self._containers and not self._containers[-1][0]:
+            self._containers[-1][1] += 1
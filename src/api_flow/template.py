@@ -1,10 +1,19 @@
 import json
 import os
 import re
+from functools import lru_cache, partial
+from string import Formatter
 from api_flow.functions import get_template_function
 from api_flow.config import Config
 from api_flow.complex_namespace import ComplexNamespace
 
+# Template file contents installed from a precompiled bundle (see
+# api_flow.bundle), keyed by file path.
+_bundled_templates = {}
+
+# Characters read from a template file at a time when it is streamed
+TEMPLATE_CHUNK_SIZE = 64 * 1024
+
 
 class Template:
     """
@@ -17,6 +26,7 @@ class Template:
     SUBSTITUTION = re.compile(r'{\?\s*([^?]*\S)\s*\?}')
     FUNCTION_CALL = re.compile(r'^([a-z][a-z_0-9]*)\((.*)\)$')
     TEMPLATE_TAG = re.compile(r'^template:(.*)$')
+    FIELD_ACCESSOR = re.compile(r'\.([^.\[]+)|\[([^\]]+)\]')
 
     def __init__(self):
         raise TypeError(
@@ -24,35 +34,19 @@ class Template:
         )
 
     @classmethod
-    def _get_value_renderer(cls, context):
+    @lru_cache(maxsize=1024)
+    def compile(cls, source):
         """
-        *Pattern.sub* can take a function that receives a regex Match object
-        and returns the substituted value, allowing dynamic substitutions.
-        This method constructs a substitution function that replaces a
-        value with values defined in the supplied context.
+        Parse a template source into a CompiledTemplate. Results are cached by
+        source string, so identical templates across steps and flows share a
+        single compiled form and are only scanned once.
 
-        :param context: Any context object (usually a Step) containing
-                        substitution values.
-        :type context: Context
-        :return: a function that will be used to perform replacements on a
-                 regex match
-        """
-        def render(substitution):
-            """
-            A regex "Pattern.sub" match handler that replaces a substitution
-            with the appropriate values
-
-            :param substitution: the template tag match object
-            :type substitution: re.Match
-            :return: the appropriate substitution from the context
-            :rtype: str
-            """
-            function_match = cls.FUNCTION_CALL.match(substitution.group(1))
-            if function_match is not None:
-                return cls._render_function(function_match, context)
-            else:
-                return cls._render_value(substitution.group(1), context)
-        return render
+        :param source: the template source
+        :type source: str
+        :return: the compiled template
+        :rtype: CompiledTemplate
+        """
+        return CompiledTemplate(source)
 
     @classmethod
     def interpolate(cls, value, context):
@@ -76,7 +70,9 @@ class Template:
         elif isinstance(value, dict):
             return cls._interpolate_dict(value, context)
         elif isinstance(value, ComplexNamespace):
-            return cls._interpolate_dict(value.as_dict(), context)
+            # interpolation builds a new dict anyway, so the namespace is not
+            # downgraded (and cached YAML is not copied) first
+            return cls._interpolate_dict(vars(value), context)
         return value
 
     @classmethod
@@ -129,37 +125,121 @@ class Template:
         :return: value with all substitution tags replaced
         :rtype: str
         """
+        return cls._render_template(cls._load_template(value), context)
+
+    @classmethod
+    def stream(cls, value, context):
+        """
+        Render a string as "interpolate_str" does, as a generator of UTF-8
+        encoded chunks. A "template:file_name" value is read and rendered
+        TEMPLATE_CHUNK_SIZE characters at a time, so neither the template nor
+        the rendered result is ever held in memory whole.
+
+        :param value: a string possibly naming a template file
+        :type value: str
+        :param context: the source of substitution data
+        :type context: Context
+        :return: the rendered chunks
+        :rtype: Iterator[bytes]
+        """
+        for source in cls._read_template(value):
+            yield cls._compile_source(source).render(context).encode('utf-8')
+
+    @classmethod
+    def _get_template_path(cls, value):
         match = cls.TEMPLATE_TAG.fullmatch(value)
-        if match is not None:
-            value = open(
-                os.path.join(
-                    Config.template_path,
-                    f"{match.group(1)}"
-                )
-            ).read()
-        return cls._render_template(value, context)
+        return os.path.join(Config.template_path, f"{match.group(1)}") if match is not None else None
 
     @classmethod
-    def _render_function(cls, function_match, context):
+    def _load_template(cls, value):
         """
-        Templates can call simple functions to produce dynamic values. At
-        present this is highly limited. Nested function calls are not
-        supported, and neither are nested template substitutions of arguments.
-        Arguments must decode as JSON values, because that's how they are
-        decoded to pass to the function.
+        Resolve a "template:file_name" value to the content of that file in
+        the template directory. Any other string is returned unchanged.
 
-        :param function_match: (re.Match) the regex match containing a
-                               function call
-        :param context: (Context) the context object to supply
-        :return: return value from the indicated function call as str
+        :param value: a string possibly naming a template file
+        :type value: str
+        :return: the template source
+        :rtype: str
+        """
+        template_path = cls._get_template_path(value)
+        if template_path is not None:
+            if template_path in _bundled_templates:
+                return _bundled_templates[template_path]
+            with open(template_path) as template_file:
+                return template_file.read()
+        return value
+
+    @classmethod
+    def _read_template(cls, value):
+        """
+        Like "_load_template", but yields the source in pieces of about
+        TEMPLATE_CHUNK_SIZE characters, split so that no substitution tag
+        spans two pieces. The template file is closed when the generator is
+        exhausted or closed.
+
+        :param value: a string possibly naming a template file
+        :type value: str
+        :return: the template source, in pieces
+        :rtype: Iterator[str]
+        """
+        template_path = cls._get_template_path(value)
+        if template_path is None or template_path in _bundled_templates:
+            yield cls._load_template(value)
+            return
+        with open(template_path) as template_file:
+            pending = ''
+            for chunk in iter(partial(template_file.read, TEMPLATE_CHUNK_SIZE), ''):
+                pending += chunk
+                split = cls._get_split(pending)
+                if split > 0:
+                    yield pending[:split]
+                    pending = pending[split:]
+            if pending:
+                yield pending
+
+    @staticmethod
+    def _get_split(source):
+        """
+        :param source: the template source read so far
+        :type source: str
+        :return: the length of the longest prefix that ends outside any
+                 substitution tag, holding back a trailing unterminated "{?"
+                 (or "{") until more of the source is read
+        :rtype: int
+        """
+        start = source.rfind('{?')
+        if start != -1 and source.find('?}', start + 2) == -1:
+            return start
+        return len(source) - 1 if source.endswith('{') else len(source)
+
+    @classmethod
+    def _compile_source(cls, source):
+        # pieces of large templates are compiled without caching, so that
+        # streaming them does not fill the compiled template cache
+        return cls.compile(source) if len(source) < TEMPLATE_CHUNK_SIZE else CompiledTemplate(source)
+
+    @classmethod
+    def references(cls, value):
+        """
+        Statically collect the root names referenced by substitution tags in
+        a value, without rendering it. For "{? step_one.token ?}" this is
+        "step_one". Function calls are skipped, since the names a function
+        reads from its context cannot be known in advance.
+
+        :param value: any value "interpolate" accepts
+        :type value: Any
+        :return: the referenced root names
+        :rtype: set[str]
         """
-        function = get_template_function(function_match.group(1))
-        if function is not None:
-            args = []
-            if len(function_match.group(2).strip()) > 0:
-                args = json.loads(f'[{function_match.group(2)}]')
-            return str(function(context, *args))
-        return ''
+        if isinstance(value, str):
+            return set().union(*(cls._compile_source(source).references for source in cls._read_template(value)))
+        elif isinstance(value, ComplexNamespace):
+            value = vars(value)
+        if isinstance(value, dict):
+            value = list(value.values())
+        if isinstance(value, list):
+            return set().union(*map(cls.references, value))
+        return set()
 
     @classmethod
     def _render_template(cls, template, context):
@@ -171,11 +251,136 @@ class Template:
                                values
             :return the template with substitutions performed
         """
-        return cls.SUBSTITUTION.sub(cls._get_value_renderer(context), template)
+        return cls.compile(template).render(context)
 
-    @classmethod
-    def _render_value(cls, name, context):
+
+class CompiledTemplate:
+    """
+    A template source parsed once into a list of segments: literal strings,
+    and renderers that resolve a substitution tag against a context. Obtain
+    instances through Template.compile, which caches them by source.
+    """
+
+    def __init__(self, source):
+        """
+        CompiledTemplate constructor.
+
+        :param source: the template source
+        :type source: str
+        """
+        self.source = source
+        self.segments = []
+        self.references = set()
+        position = 0
+        for substitution in Template.SUBSTITUTION.finditer(source):
+            if substitution.start() > position:
+                self.segments.append(source[position:substitution.start()])
+            self.segments.append(self._compile_tag(substitution.group(1)))
+            position = substitution.end()
+        if position < len(source) or not self.segments:
+            self.segments.append(source[position:])
+
+    def _compile_tag(self, tag):
+        function_match = Template.FUNCTION_CALL.match(tag)
+        if function_match is not None:
+            return self._compile_function(function_match)
+        return self._compile_value(tag)
+
+    @staticmethod
+    def _compile_function(function_match):
+        """
+        Templates can call simple functions to produce dynamic values. At
+        present this is highly limited. Nested function calls are not
+        supported, and neither are nested template substitutions of arguments.
+        Arguments must decode as JSON values, because that's how they are
+        decoded to pass to the function. They are decoded once, here.
+
+        :param function_match: (re.Match) the regex match containing a
+                               function call
+        :return: a renderer returning the function's result as str
+        """
+        function_name = function_match.group(1)
+        args = []
+        if len(function_match.group(2).strip()) > 0:
+            args = json.loads(f'[{function_match.group(2)}]')
+
+        def render(context):
+            function = get_template_function(function_name)
+            if function is not None:
+                return str(function(context, *args))
+            return ''
+        return render
+
+    def _compile_value(self, name):
+        """
+        Value tags follow "str.format" field syntax relative to the context,
+        e.g. "step_one.items[0].id!r:>10". The field is split into its
+        attribute and index accessors once, so rendering is a plain walk.
+
+        :param name: the tag content
+        :type name: str
+        :return: a renderer returning the formatted context value
+        """
         if not name.startswith('context.'):
             name = f'context.{name}'
-        return f'{{{name}}}'.format(context=context)
+        field = f'{{{name}}}'
+        try:
+            _, field_name, format_spec, conversion = next(Formatter().parse(field))
+            accessors = self._split_field_name(field_name)
+        except (ValueError, StopIteration):
+            accessors = None
+        if accessors is None or '{' in format_spec or conversion not in (None, 'r', 's', 'a'):
+            return lambda context: field.format(context=context)
+        if accessors and accessors[0][0]:
+            self.references.add(accessors[0][1])
+        converters = {'r': repr, 's': str, 'a': ascii}
+
+        def render(context):
+            value = context
+            for is_attribute, key in accessors:
+                value = getattr(value, key) if is_attribute else value[key]
+            if conversion is not None:
+                value = converters[conversion](value)
+            return format(value, format_spec)
+        return render
+
+    @staticmethod
+    def _split_field_name(field_name):
+        """
+        Split a "str.format" field name into the accessors that follow its
+        first name, e.g. "context.items[0].id" into [(True, 'items'),
+        (False, 0), (True, 'id')]. Digit-only index keys are integers, as
+        they are for "str.format".
+
+        :param field_name: the field name, starting with "context."
+        :type field_name: str
+        :return: (is_attribute, key) tuples, or None if the field name is
+                 not in a form this can split
+        :rtype: list[tuple[bool, str | int]] | None
+        """
+        accessors = []
+        position = len('context')
+        while position < len(field_name):
+            match = Template.FIELD_ACCESSOR.match(field_name, position)
+            if match is None:
+                return None
+            attribute, key = match.groups()
+            if attribute is not None:
+                accessors.append((True, attribute))
+            else:
+                accessors.append((False, int(key) if key.isdigit() else key))
+            position = match.end()
+        return accessors
+
+    def render(self, context):
+        """
+        Render the template against a context.
 
+        :param context: (Context) the object containing substitution values
+        :return: the template with substitutions performed
+        :rtype: str
+        """
+        return ''.join([
+            segment if isinstance(segment, str) else segment(context)
+            for segment in self.segments
+        ])
@@ -1,4 +1,7 @@
+import os
 import pytest
+import subprocess
+import sys
 from unittest.mock import patch
 from api_flow.config import Config
 from api_flow import configure, execute
@@ -53,3 +56,10 @@ class TestInit:
         flow = execute('my_flow', profile='p', profiles=['q', 'r'])
         flow.execute.assert_called()
 
+    def test_optional_backends_imported_lazily(self):
+        imported = subprocess.run(
+            [sys.executable, '-c', 'import sys, api_flow; print(" ".join(sorted(sys.modules)))'],
+            check=True, capture_output=True, text=True, env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)}
+        ).stdout.split()
+        for module in ('asyncio', 'httpx', 'ijson', 'opentelemetry', 'orjson', 'ujson'):
+            assert module not in imported
@@ -0,0 +1,81 @@
+import os
+import pickle
+import pytest
+import shutil
+from unittest.mock import patch
+from api_flow.bundle import BUNDLE_VERSION, compile_bundle, load_bundle, unload_bundles
+from api_flow.config import Config
+from api_flow.flow import Flow
+from api_flow.jsonpath import compile_jsonpath
+from api_flow.profiles import Profiles
+from api_flow.template import Template
+
+
+@pytest.fixture(autouse=True)
+def setup():
+    Config.data_path = os.path.join(os.path.dirname(__file__), 'test_data')
+    yield
+    Config.data_path = None
+    unload_bundles()
+
+
+@pytest.fixture
+def data_copy(tmp_path):
+    shutil.copytree(os.path.join(os.path.dirname(__file__), 'test_data'), tmp_path / 'data')
+    Config.data_path = str(tmp_path / 'data')
+    yield tmp_path / 'data'
+
+
+class TestBundle:
+    def test_compile_bundle(self, tmp_path):
+        bundle = compile_bundle('template_body', str(tmp_path / 'flow.bundle'), profile='foo', profiles=['bar'])
+        assert bundle['version'] == BUNDLE_VERSION
+        assert bundle['flow'] == 'template_body'
+        assert bundle['profiles'] == ['bar', 'foo']
+        assert set(bundle['flows'].keys()) == {'template_body', 'prerequisite_flow'}
+        assert set(bundle['profile_documents'].keys()) == {'bar', 'foo'}
+        assert bundle['templates'] == {'test_template.txt': 'The value is {? str_value ?}.\n'}
+        assert set(bundle['jsonpaths'].keys()) == {'$.name', '$.id'}
+        with open(tmp_path / 'flow.bundle', 'rb') as bundle_file:
+            assert pickle.load(bundle_file)['flows'] == bundle['flows']
+
+    def test_compile_bundle_does_not_modify_profiles(self, tmp_path):
+        profiles = ['bar']
+        compile_bundle('empty', str(tmp_path / 'flow.bundle'), profile='foo', profiles=profiles)
+        assert profiles == ['bar']
+
+    def test_load_bundle_replaces_data_files(self, tmp_path, data_copy):
+        compile_bundle('template_body', str(tmp_path / 'flow.bundle'), profile='foo')
+        shutil.rmtree(data_copy / 'flows')
+        shutil.rmtree(data_copy / 'profiles')
+        shutil.rmtree(data_copy / 'templates')
+        assert load_bundle(str(tmp_path / 'flow.bundle'))['flow'] == 'template_body'
+        compile_jsonpath.cache_clear()
+        with patch('api_flow.jsonpath.parse') as mock_parse:
+            flow = Flow('template_body', profile='foo')
+            mock_parse.assert_not_called()
+        assert flow.foo == 'Foo'
+        assert flow.flow_steps.templated.body == 'template:test_template.txt'
+        assert Template._load_template('template:test_template.txt') == 'The value is {? str_value ?}.\n'
+        assert Profiles(profile='foo').foo == 'Foo'
+
+    def test_unload_bundles(self, tmp_path):
+        compile_bundle('empty', str(tmp_path / 'flow.bundle'))
+        load_bundle(str(tmp_path / 'flow.bundle'))
+        unload_bundles()
+        with patch('api_flow.complex_namespace.ComplexNamespace.load_yaml') as mock_load_yaml:
+            mock_load_yaml.return_value = {'steps': {}}
+            Flow('empty')
+            mock_load_yaml.assert_called_once()
+
+    def test_load_bundle_incompatible(self, tmp_path):
+        with open(tmp_path / 'flow.bundle', 'wb') as bundle_file:
+            pickle.dump({'version': BUNDLE_VERSION + 1}, bundle_file)
+        with pytest.raises(ValueError):
+            load_bundle(str(tmp_path / 'flow.bundle'))
+
+    def test_compile_bundle_invalid_output(self, tmp_path):
+        with patch('api_flow.bundle.compile_jsonpath', side_effect=ValueError('bad')):
+            with pytest.raises(ValueError):
+                compile_bundle('prerequisite_flow', str(tmp_path / 'flow.bundle'))
+        assert not os.path.exists(tmp_path / 'flow.bundle')
@@ -0,0 +1,58 @@
+import os
+import pytest
+from unittest.mock import patch
+from api_flow.cache import DiskCache, MEMORY_CACHE, MemoryCache, get_flow_cache
+from api_flow.config import Config
+
+
+@pytest.fixture(params=['memory', 'disk'])
+def cache(request, tmp_path):
+    yield MemoryCache() if request.param == 'memory' else DiskCache(str(tmp_path / 'cache'))
+
+
+class TestCache:
+    def test_get_set(self, cache):
+        assert cache.get('login:abc') is None
+        cache.set('login:abc', {'login': {'token': 'TOKEN'}}, 60)
+        assert cache.get('login:abc') == {'login': {'token': 'TOKEN'}}
+        assert cache.get('login:def') is None
+
+    def test_expiry(self, cache):
+        with patch('api_flow.cache.time.time', return_value=1000.0):
+            cache.set('login:abc', {'login': {}}, 60)
+        with patch('api_flow.cache.time.time', return_value=1059.0):
+            assert cache.get('login:abc') == {'login': {}}
+        with patch('api_flow.cache.time.time', return_value=1060.0):
+            assert cache.get('login:abc') is None
+
+    def test_clear(self, cache):
+        cache.set('login:abc', {'login': {}}, 60)
+        cache.clear()
+        assert cache.get('login:abc') is None
+
+    def test_disk_cache_shared_between_instances(self, tmp_path):
+        DiskCache(str(tmp_path)).set('login:abc', [1, 2], 60)
+        assert DiskCache(str(tmp_path)).get('login:abc') == [1, 2]
+        assert [name for name in os.listdir(tmp_path) if not name.endswith('.json')] == []
+
+    def test_disk_cache_entry_private(self, tmp_path):
+        cache = DiskCache(str(tmp_path))
+        cache.set('login:abc', {'login': {'token': 'TOKEN'}}, 60)
+        assert os.stat(cache._get_path('login:abc')).st_mode & 0o777 == 0o600
+
+    def test_disk_cache_unreadable_entry(self, tmp_path):
+        cache = DiskCache(str(tmp_path))
+        cache.set('login:abc', [1, 2], 60)
+        with open(cache._get_path('login:abc'), 'w') as cache_file:
+            cache_file.write('{not json')
+        assert cache.get('login:abc') is None
+
+    def test_get_flow_cache(self, tmp_path):
+        assert get_flow_cache() is MEMORY_CACHE
+        Config.cache_path = str(tmp_path)
+        try:
+            flow_cache = get_flow_cache()
+            assert isinstance(flow_cache, DiskCache)
+            assert flow_cache.directory == str(tmp_path)
+        finally:
+            Config.cache_path = None
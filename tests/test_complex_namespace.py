@@ -1,8 +1,10 @@
 import os
+import pickle
 import pytest
 import yaml
 from unittest.mock import patch
-from api_flow.complex_namespace import ComplexNamespace
+from api_flow import complex_namespace
+from api_flow.complex_namespace import ComplexNamespace, FrozenDict, freeze
 from io import StringIO
 from yaml import YAMLError
 
@@ -37,7 +39,7 @@ def mock_exit():
 
 @pytest.fixture
 def mock_yaml_load():
-    with patch('yaml.safe_load') as yaml_load_func:
+    with patch('yaml.load') as yaml_load_func:
         yield yaml_load_func
 
 
@@ -167,3 +169,97 @@ class TestComplexNamespace:
             ],
             'strval': 'L'
         }
+
+    def test_load_yaml_cached_until_file_changes(self, tmp_path):
+        path = tmp_path / 'cached.yaml'
+        path.write_text('a: A\n')
+        with patch('yaml.load', wraps=yaml.load) as mock_load:
+            assert ComplexNamespace.from_yaml(str(path)).a == 'A'
+            assert ComplexNamespace.from_yaml(str(path)).a == 'A'
+            assert mock_load.call_count == 1
+            path.write_text('a: Changed\n')
+            os.utime(path, ns=(0, 0))
+            assert ComplexNamespace.from_yaml(str(path)).a == 'Changed'
+            assert mock_load.call_count == 2
+
+    def test_load_yaml_cache_not_modified_by_callers(self, tmp_path):
+        path = tmp_path / 'immutable.yaml'
+        path.write_text('a:\n  b: B\n')
+        first = ComplexNamespace.from_yaml(str(path))
+        first.a.b = 'Modified'
+        first.c = 'C'
+        second = ComplexNamespace.from_yaml(str(path))
+        assert second.a.b == 'B'
+        assert not hasattr(second, 'c')
+
+    def test_load_yaml_uses_libyaml_when_available(self):
+        assert complex_namespace.YAML_LOADER is getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+    def test_lazy_upgrade(self):
+        source = yaml.safe_load(StringIO(MOCK_YAML_FILE))
+        y = ComplexNamespace(**source)
+        assert vars(y)['a'] is source['a']
+        assert y.e[2].h.k.l == 'm'
+        assert y.e is y.e
+        assert isinstance(y['a'], ComplexNamespace)
+        assert y.get('a') is y.a
+        assert all(isinstance(value, ComplexNamespace) for value in y.a.values())
+        y.a.b.c = 'Changed'
+        y.e[2].h.i = 'Changed'
+        assert y.a.b.c == 'Changed'
+        assert y.e[2].h.i == 'Changed'
+        assert source == yaml.safe_load(StringIO(MOCK_YAML_FILE))
+
+    def test_downgrade_shares_unread_values(self):
+        source = yaml.safe_load(StringIO(MOCK_YAML_FILE))
+        y = ComplexNamespace(**source)
+        assert y.as_dict()['a'] is source['a']
+        y.a.b.c = 'Changed'
+        downgraded = y.as_dict()
+        assert downgraded['a'] == {'b': {'c': 'Changed'}}
+        assert downgraded['e'] is source['e']
+
+    def test_equality_ignores_upgrades(self):
+        first = ComplexNamespace(a={'b': ['c', {'d': 'e'}]})
+        second = ComplexNamespace(a={'b': ['c', {'d': 'e'}]})
+        assert first.a.b[1].d == 'e'
+        assert first == second
+        assert first != ComplexNamespace(a={'b': []})
+
+    def test_as_dict_does_not_modify_cached_yaml(self, tmp_path):
+        path = str(tmp_path / 'cached.yaml')
+        with open(path, 'w') as yaml_file:
+            yaml_file.write('auth:\n  client:\n    id: abc\n  scopes: [read]\n')
+        downgraded = ComplexNamespace.from_yaml(path).auth.as_dict()
+        downgraded['client']['id'] = 'evil'
+        downgraded['scopes'].append('write')
+        assert ComplexNamespace.from_yaml(path).as_dict() == {'auth': {'client': {'id': 'abc'}, 'scopes': ['read']}}
+        with pytest.raises(TypeError):
+            ComplexNamespace.load_yaml(path)['auth']['client']['id'] = 'evil'
+        with pytest.raises(TypeError):
+            ComplexNamespace.load_yaml(path)['auth']['scopes'].append('write')
+
+    def test_downgrade_value_does_not_copy_cached_yaml(self, tmp_path):
+        path = str(tmp_path / 'cached.yaml')
+        with open(path, 'w') as yaml_file:
+            yaml_file.write('auth:\n  client:\n    id: abc\n')
+        namespace = ComplexNamespace.from_yaml(path)
+        assert namespace.downgrade_value(namespace)['auth'] is ComplexNamespace.load_yaml(path)['auth']
+
+    def test_class_attributes_not_stored(self):
+        class WithAttributes(ComplexNamespace):
+            defaults = {'a': 'A'}
+            computed = property(lambda self: {'b': 'B'})
+
+        namespace = WithAttributes(value={'c': 'C'})
+        assert namespace.defaults == {'a': 'A'}
+        assert namespace.computed == {'b': 'B'}
+        assert isinstance(namespace.value, ComplexNamespace)
+        assert sorted(vars(namespace)) == ['value']
+
+    def test_frozen_documents_pickle(self):
+        document = freeze({'a': [{'b': 'c'}]})
+        restored = pickle.loads(pickle.dumps(document))
+        assert restored == {'a': [{'b': 'c'}]}
+        assert isinstance(restored['a'][0], FrozenDict)
+        assert freeze(restored) is restored
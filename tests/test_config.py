@@ -63,3 +63,43 @@ class TestConfig:
         assert Config.template_path == '/tmp/nowhere/templates'
         assert Config.function_path == '/tmp/funky/functions'
 
+
+    def test_cache_path(self):
+        assert Config.cache_path is None
+        os.environ['CACHE_PATH'] = '/tmp/environment/cache'
+        try:
+            assert Config.cache_path == '/tmp/environment/cache'
+            Config.cache_path = '/tmp/cache'
+            assert Config.cache_path == '/tmp/cache'
+        finally:
+            del os.environ['CACHE_PATH']
+            Config.cache_path = None
+
+    def test_timeouts(self):
+        assert Config.connect_timeout == 10
+        assert Config.read_timeout == 60
+        os.environ['CONNECT_TIMEOUT'] = '2.5'
+        os.environ['READ_TIMEOUT'] = '0'
+        try:
+            assert Config.connect_timeout == 2.5
+            assert Config.read_timeout is None
+            Config.connect_timeout = 0
+            Config.read_timeout = 30
+            assert Config.connect_timeout is None
+            assert Config.read_timeout == 30
+        finally:
+            del os.environ['CONNECT_TIMEOUT']
+            del os.environ['READ_TIMEOUT']
+            Config.connect_timeout = None
+            Config.read_timeout = None
+
+    def test_retain_responses(self):
+        assert Config.retain_responses is None
+        os.environ['RETAIN_RESPONSES'] = '5'
+        try:
+            assert Config.retain_responses == 5
+            Config.retain_responses = 0
+            assert Config.retain_responses == 0
+        finally:
+            del os.environ['RETAIN_RESPONSES']
+            Config.retain_responses = None
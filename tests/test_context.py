@@ -3,6 +3,7 @@ import pytest
 from unittest.mock import patch
 from api_flow.complex_namespace import ComplexNamespace
 from api_flow.context import Context
+from api_flow.run import Run
 
 
 @pytest.fixture
@@ -65,3 +66,56 @@ class TestContext:
         child.set_global('child_global', 'CHILD')
         assert parent.child_global == 'CHILD'
         assert child.parent_global == 'PARENT'
+
+    def test_run_environment_snapshot(self):
+        os.environ['foo'] = 'before'
+        child = Context(parent=Run())
+        assert child.foo == 'before'
+        os.environ['foo'] = 'after'
+        assert child.foo == 'before'
+        assert Context().foo == 'after'
+
+    def test_memoized_lookup_invalidated_by_writes(self):
+        parent = Context(parent=Run(), memoized='parent')
+        child = Context(parent=Context(parent=parent))
+        assert child.memoized == 'parent'
+        parent.memoized = 'changed'
+        assert child.memoized == 'changed'
+        assert not hasattr(child, 'memoized_other')
+        parent.merge(ComplexNamespace(memoized_other='merged'))
+        assert child.memoized_other == 'merged'
+        del parent.memoized_other
+        assert not hasattr(child, 'memoized_other')
+        child.set_global('memoized_other', 'global')
+        assert child.memoized_other == 'global'
+
+    def test_memoized_lookup_scoped_to_chain(self):
+        parent = Context(parent=Run(), memoized='parent')
+        child = Context(parent=parent)
+        sibling = Context(parent=parent)
+        other = Context(parent=Context(parent=Run(), memoized='other'))
+        assert child.memoized == 'parent'
+        assert other.memoized == 'other'
+        resolved = dict(child._resolved)
+        sibling.own = 'sibling'
+        other.parent.memoized = 'changed'
+        assert child._resolved == resolved
+        assert child.memoized == 'parent'
+        assert other.memoized == 'changed'
+
+    def test_computed_lookup_not_memoized(self):
+        class Computed(Context):
+            computed = property(lambda self: self.run.value)
+
+        run = Run(value='before')
+        child = Context(parent=Computed(parent=None, run=run))
+        assert child.computed == 'before'
+        run.value = 'after'
+        assert child.computed == 'after'
+        assert 'computed' not in child._resolved
+
+    def test_resolution_state_hidden(self):
+        context = Context(parent=Run(), foo='V')
+        assert context.foo == 'V'
+        assert not hasattr(context, 'bar')
+        assert sorted(vars(context).keys()) == ['foo', 'parent']
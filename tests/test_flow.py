@@ -1,14 +1,22 @@
+import asyncio
 import os
 import pytest
+import threading
+from api_flow.cache import MEMORY_CACHE
+from concurrent.futures import Future
+from api_flow.complex_namespace import ComplexNamespace
 from api_flow.config import Config
-from api_flow.flow import Flow
-from api_flow.step import Step
-from unittest.mock import patch
+from api_flow.flow import AsyncFlow, Flow
+from api_flow.run import Run
+from api_flow.session import Session
+from api_flow.step import AsyncStep, Step
+from unittest.mock import AsyncMock, patch
 
 
 @pytest.fixture(autouse=True)
 def setup():
     Config.data_path = os.path.join(os.path.dirname(__file__), 'test_data')
+    MEMORY_CACHE.clear()
 
 
 @pytest.fixture
@@ -54,3 +62,306 @@ class TestFlow:
     def test_empty_flow_succeeds(self):
         flow = Flow('empty')
         assert flow.execute()
+
+    def test_prerequisites_share_session(self, mock_step_execute):
+        session = Session()
+        flow = Flow('single_dependency', session=session)
+        assert flow.execute()
+        assert flow.flow_session is session
+        assert flow.something_else.flow_session is session
+
+    def test_owned_session_closed_after_execute(self, mock_step_execute):
+        flow = Flow('single_dependency')
+        with patch.object(flow.flow_session, 'close') as mock_close:
+            assert flow.execute()
+            mock_close.assert_called_once()
+
+    def test_owned_session_closed_when_step_raises(self, mock_step_execute):
+        mock_step_execute.side_effect = ConnectionError()
+        flow = Flow('single_dependency')
+        with patch.object(flow.flow_session, 'close') as mock_close:
+            with pytest.raises(ConnectionError):
+                flow.execute()
+            mock_close.assert_called_once()
+        assert flow.flow_executed
+        assert not flow.succeeded
+        assert flow.flow_elapsed is not None
+
+    def test_owned_async_session_closed_when_step_raises(self):
+        pytest.importorskip('httpx')
+        with patch.object(AsyncFlow, '_execute_steps', new_callable=AsyncMock) as mock_execute_steps:
+            mock_execute_steps.side_effect = ConnectionError()
+            flow = AsyncFlow('empty')
+            with patch.object(flow.flow_session, 'close', new_callable=AsyncMock) as mock_close:
+                with pytest.raises(ConnectionError):
+                    asyncio.run(flow.execute())
+                mock_close.assert_awaited_once()
+        assert flow.flow_executed
+        assert not flow.succeeded
+
+    def test_parallel_dependencies(self, mock_step_execute):
+        flow = Flow('parallel_dependencies')
+        assert flow.flow_dependency_workers == 3
+        assert flow.execute()
+        assert isinstance(flow.dependency_a, Flow)
+        assert isinstance(flow.dependency_b, Flow)
+        assert flow.prerequisite_flow.succeeded
+
+    def test_parallel_dependencies_fail(self, mock_step_execute):
+        mock_step_execute.return_value = False
+        flow = Flow('parallel_dependencies')
+        flow.flow_store.current_step = Step('bogus_step', {})
+        assert not flow.execute()
+        assert not flow.flow_dependencies_succeeded
+        assert flow.flow_steps_succeeded is None
+
+    def test_parallel_dependencies_cancelled_when_prerequisite_raises(self, mock_step_execute):
+        mock_step_execute.side_effect = RuntimeError('boom')
+        flow = Flow('parallel_dependencies')
+        flow.flow_dependency_workers = 1
+        with patch.object(Future, 'cancel', autospec=True, side_effect=Future.cancel) as mock_cancel:
+            with pytest.raises(RuntimeError):
+                flow.execute()
+        assert mock_cancel.call_count == 3
+
+    def test_parallel_dependencies_worker_limit(self):
+        flow = Flow('multiple_dependencies')
+        assert flow.flow_dependency_workers is None
+        flow.flow_definition.parallel_dependencies = 2
+        assert flow._get_workers('parallel_dependencies', 2) == 2
+
+    def test_async_parallel_dependencies(self):
+        pytest.importorskip('httpx')
+        with patch.object(AsyncFlow, '_execute_steps', new_callable=AsyncMock) as mock_execute_steps:
+            mock_execute_steps.return_value = True
+            flow = AsyncFlow('multiple_dependencies')
+            flow.flow_dependency_workers = 2
+            assert asyncio.run(flow.execute())
+            assert flow.dependency_a.succeeded
+            assert flow.dependency_b.succeeded
+
+    def test_step_dependencies(self):
+        flow = Flow('parallel_steps')
+        assert flow.flow_step_workers == 5
+        assert flow.flow_step_dependencies.as_dict() == {
+            'login': set(),
+            'first': {'login'},
+            'second': {'login'},
+            'third': {'login'},
+            'summary': {'first', 'second', 'third'},
+        }
+
+    def test_step_dependencies_unknown_after(self):
+        flow = Flow('parallel_steps')
+        flow.flow_steps.summary.after = 'missing'
+        with pytest.raises(ValueError):
+            flow._get_step_dependencies()
+
+    def test_step_dependencies_cycle(self):
+        flow = Flow('parallel_steps')
+        flow.flow_steps.login.after = 'summary'
+        with pytest.raises(ValueError):
+            flow._get_step_dependencies()
+
+    def test_parallel_steps(self, mock_step_execute):
+        flow = Flow('parallel_steps')
+        assert flow.execute()
+        assert mock_step_execute.call_count == 5
+
+    def test_parallel_steps_fail(self, mock_step_execute):
+        mock_step_execute.return_value = False
+        flow = Flow('parallel_steps')
+        flow.flow_store.current_step = Step('bogus_step', {})
+        assert not flow.execute()
+        assert mock_step_execute.call_count == 1
+
+    def test_parallel_steps_cancelled_when_step_raises(self):
+        release = threading.Event()
+
+        def execute(step):
+            if step.step_name == 'first':
+                raise RuntimeError('boom')
+            if step.step_name != 'login':
+                release.wait(timeout=5)
+            return True
+
+        def cancel(future, original_cancel=Future.cancel):
+            release.set()
+            return original_cancel(future)
+
+        with patch.object(Step, 'execute', autospec=True, side_effect=execute):
+            with patch.object(Future, 'cancel', autospec=True, side_effect=cancel) as mock_cancel:
+                with pytest.raises(RuntimeError):
+                    Flow('parallel_steps').execute()
+        assert mock_cancel.call_count == 2
+
+    def test_async_parallel_steps_cancelled_when_step_raises(self):
+        pytest.importorskip('httpx')
+        finished = []
+        cancelled = []
+
+        async def execute(step):
+            if step.step_name == 'first':
+                raise RuntimeError('boom')
+            if step.step_name != 'login':
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.append(step.step_name)
+                    raise
+            finished.append(step.step_name)
+            return True
+
+        async def run(flow):
+            with pytest.raises(RuntimeError):
+                await flow.execute()
+            return list(cancelled)
+
+        with patch.object(AsyncStep, 'execute', execute):
+            cancelled_by_flow = asyncio.run(run(AsyncFlow('parallel_steps')))
+        assert finished == ['login']
+        assert sorted(cancelled_by_flow) == ['second', 'third']
+
+    def test_invalid_output_reported_on_load(self):
+        with patch('api_flow.flow.Flow.from_yaml') as mock_from_yaml:
+            mock_from_yaml.return_value = ComplexNamespace(steps={
+                'broken': {'url': 'https://test', 'outputs': {'id': '$.id['}}
+            })
+            with pytest.raises(ValueError, match='"id" of step "broken"'):
+                Flow('broken')
+
+    def test_runs_are_isolated(self):
+        first = Flow('single_dependency')
+        second = Flow('single_dependency')
+        assert isinstance(first.flow_store, Run)
+        assert first.flow_store is not second.flow_store
+        assert first.flow_store.single_dependency is first
+        assert second.flow_store.single_dependency is second
+
+    def test_prerequisites_share_run(self, mock_step_execute):
+        flow = Flow('single_dependency')
+        assert flow.execute()
+        assert flow.something_else.flow_store is flow.flow_store
+        assert flow.flow_store.something_else is flow.something_else
+        assert flow.previous_flow is flow
+
+    def test_shared_prerequisite_executed_once(self, mock_step_execute):
+        flow = Flow('diamond')
+        assert flow.execute()
+        assert mock_step_execute.call_count == 4
+        assert flow.diamond_left.prerequisite_flow is flow.diamond_right.prerequisite_flow
+        assert flow.flow_store.prerequisite_flow is flow.diamond_left.prerequisite_flow
+
+    def test_shared_prerequisite_executed_once_in_parallel(self, mock_step_execute):
+        flow = Flow('diamond')
+        flow.flow_dependency_workers = 2
+        assert flow.execute()
+        assert mock_step_execute.call_count == 4
+        assert flow.diamond_left.prerequisite_flow is flow.diamond_right.prerequisite_flow
+
+    def test_async_shared_prerequisite_executed_once(self):
+        pytest.importorskip('httpx')
+        with patch.object(AsyncFlow, '_execute_steps', new_callable=AsyncMock) as mock_execute_steps:
+            mock_execute_steps.return_value = True
+            flow = AsyncFlow('diamond')
+            flow.flow_dependency_workers = 2
+            assert asyncio.run(flow.execute())
+            assert mock_execute_steps.call_count == 4
+
+    def test_execute_once(self, mock_step_execute):
+        flow = Flow('single_dependency')
+        assert flow.execute()
+        assert flow.execute()
+        assert flow.flow_executed
+        assert mock_step_execute.call_count == 1
+
+    def test_prerequisite_cycle(self):
+        with pytest.raises(ValueError, match='cycle_a -> cycle_b -> cycle_a'):
+            Flow('cycle')
+
+    def test_cache_ttl(self, mock_step_execute):
+        flow = Flow('uses_cached_login')
+        assert flow.flow_cache_ttl is None
+        flow.execute()
+        assert flow.cached_login.flow_cache_ttl == 60
+        assert Flow('cached_login').flow_cache_ttl is None
+
+    def test_cache_ttl_invalid(self):
+        flow = Flow('uses_cached_login')
+        flow.flow_definition.cache = {'ttl': 'soon'}
+        with pytest.raises(ValueError):
+            flow._get_cache_ttl()
+
+    def test_cached_prerequisite_reused(self, mock_step_execute):
+        assert Flow('uses_cached_login', user='alice').execute()
+        assert mock_step_execute.call_count == 2
+        flow = Flow('uses_cached_login', user='alice')
+        assert flow.execute()
+        assert mock_step_execute.call_count == 3
+        assert flow.cached_login.succeeded
+        assert isinstance(flow.cached_login.login, Step)
+        assert Flow('uses_cached_login', user='bob').execute()
+        assert mock_step_execute.call_count == 5
+
+    def test_failed_prerequisite_not_cached(self, mock_step_execute):
+        mock_step_execute.return_value = False
+        assert not Flow('uses_cached_login', user='alice').execute()
+        mock_step_execute.return_value = True
+        assert Flow('uses_cached_login', user='alice').execute()
+        assert mock_step_execute.call_count == 3
+
+    def test_cache_key_computed_once_per_execution(self, mock_step_execute):
+        with patch.object(Flow, '_get_cache_key', autospec=True, return_value='cached_login:key') as mock_key:
+            assert Flow('uses_cached_login', user='alice').execute()
+            assert mock_key.call_count == 1
+            assert Flow('uses_cached_login', user='alice').execute()
+            assert mock_key.call_count == 2
+        assert mock_step_execute.call_count == 3
+
+    def test_cache_key(self):
+        flow = Flow('uses_cached_login', user='alice', server_port=80)
+        flow._create_dependencies()
+        key = flow.cached_login._get_cache_key()
+        assert key.startswith('cached_login:')
+        same_inputs = Flow('uses_cached_login', user='alice', server_port=80, unused='x')
+        assert same_inputs._create_dependencies()[0]._get_cache_key() == key
+        other_inputs = Flow('uses_cached_login', user='bob', server_port=80)
+        assert other_inputs._create_dependencies()[0]._get_cache_key() != key
+
+    def test_timeout(self):
+        assert Flow('single_dependency').flow_timeout == (10, 60)
+        with patch('api_flow.flow.Flow.from_yaml') as mock_from_yaml:
+            mock_from_yaml.return_value = ComplexNamespace(timeout={'connect': 1}, steps={})
+            assert Flow('timeout').flow_timeout == (1, 60)
+
+    def test_deadline(self, mock_step_execute):
+        flow = Flow('single_dependency')
+        flow.flow_deadline_seconds = 30
+        with patch('api_flow.flow.time.perf_counter', return_value=100):
+            assert flow.execute()
+        assert flow.flow_deadline == 130
+        assert flow.something_else.flow_deadline == 130
+
+    def test_deadline_prerequisite_keeps_earlier(self, mock_step_execute):
+        flow = Flow('single_dependency')
+        flow.flow_deadline_seconds = 30
+        flow._create_dependencies()[0].flow_deadline_seconds = 10
+        with patch('api_flow.flow.time.perf_counter', return_value=100):
+            assert flow.execute()
+        assert flow.something_else.flow_deadline == 110
+
+    def test_deadline_invalid(self):
+        flow = Flow('single_dependency')
+        flow.flow_definition.deadline = -1
+        with pytest.raises(ValueError):
+            flow._get_deadline_seconds()
+
+    def test_previous_step_is_declared_predecessor(self):
+        flow = Flow('parallel_steps', server_port=1)
+        login, first, second, third, summary = flow._create_steps()
+        assert flow.flow_step_dependencies['summary'] == {'first', 'second', 'third'}
+        flow.flow_store.previous_step = second
+        assert summary.previous_step is third
+        assert summary.step_url == 'http://localhost:1/summary/third'
+        assert first.previous_step is login
+        assert login.previous_step is second
@@ -1,15 +1,22 @@
 import os
 import pytest
 import re
+import shutil
 from api_flow.config import Config
+from api_flow import functions
 from api_flow.functions import get_template_function, random, uuid
+from unittest.mock import patch
 
 
 @pytest.fixture(autouse=True)
 def set_function_path():
     Config.data_path = os.path.join(os.path.dirname(__file__), 'test_data')
+    functions._user_function_modules.clear()
     yield
     Config.data_path = None
+    Config.function_path = None
+    Config.reload_functions = None
+    functions._user_function_modules.clear()
 
 
 class TestFunctions:
@@ -29,6 +36,32 @@ class TestFunctions:
         missing = get_template_function('missing_function')
         assert missing is None
 
+    def test_get_template_function_ignores_module_attributes(self):
+        assert get_template_function('os') is None
+        assert get_template_function('Config') is None
+
+    def test_user_functions_loaded_once(self):
+        with patch('api_flow.functions.spec_from_file_location', wraps=functions.spec_from_file_location) as mock_spec:
+            assert get_template_function('echo') is get_template_function('echo')
+            mock_spec.assert_called_once()
+
+    def test_user_functions_hot_reload(self, tmp_path):
+        shutil.copy(os.path.join(Config.function_path, '__init__.py'), tmp_path / '__init__.py')
+        Config.function_path = str(tmp_path)
+        Config.reload_functions = True
+        echo = get_template_function('echo')
+        assert get_template_function('echo') is echo
+        with open(tmp_path / '__init__.py', 'a') as init_file:
+            init_file.write('\n\ndef shout(ctx, value):\n    return value.upper()\n')
+        os.utime(tmp_path / '__init__.py', ns=(0, 0))
+        assert get_template_function('shout')(None, 'hi') == 'HI'
+        assert get_template_function('echo') is not echo
+
+    def test_reload_functions_from_environment(self):
+        assert not Config.reload_functions
+        with patch.dict(os.environ, {'RELOAD_FUNCTIONS': 'true'}):
+            assert Config.reload_functions
+
     def test_random(self):
         random_number = random(None, 100000)
         assert re.compile(r'^[0-9]{5}$').match(random_number) is not None
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from api_flow import hooks
+from api_flow.config import Config
+from api_flow.flow import AsyncFlow, Flow
+from api_flow.hooks import Hooks, OpenTelemetryHooks, add_hooks, emit, remove_hooks
+from api_flow.request import AsyncRequest, Request
+
+
+@pytest.fixture
+def exporter():
+    in_memory_span_exporter = pytest.importorskip('opentelemetry.sdk.trace.export.in_memory_span_exporter')
+    exporter = in_memory_span_exporter.InMemorySpanExporter()
+    yield exporter
+    exporter.clear()
+
+
+@pytest.fixture
+def tracer(exporter):
+    sdk_trace = pytest.importorskip('opentelemetry.sdk.trace')
+    export = pytest.importorskip('opentelemetry.sdk.trace.export')
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(export.SimpleSpanProcessor(exporter))
+    yield provider.get_tracer('test')
+
+
+@pytest.fixture
+def events():
+    events = []
+
+    class RecordingHooks(Hooks):
+        def on_flow_end(self, flow):
+            events.append(('flow_end', flow.flow_name, flow.succeeded))
+
+        def on_step_end(self, step, succeeded):
+            events.append(('step_end', step.step_name, succeeded))
+
+    handler = RecordingHooks()
+    add_hooks(handler)
+    yield events
+    remove_hooks(handler)
+
+
+@pytest.fixture(autouse=True)
+def setup():
+    Config.data_path = os.path.join(os.path.dirname(__file__), 'test_data')
+
+
+class TestHooks:
+    def test_add_and_remove(self):
+        handler = MagicMock(spec=Hooks)
+        add_hooks(handler)
+        try:
+            emit('on_attempt', 'step', 2)
+            handler.on_attempt.assert_called_once_with('step', 2)
+        finally:
+            remove_hooks(handler)
+        assert hooks.HANDLERS == []
+        emit('on_attempt', 'step', 3)
+        handler.on_attempt.assert_called_once()
+
+    def test_base_hooks_ignore_events(self):
+        handler = Hooks()
+        handler.on_flow_start(None)
+        handler.on_response(None, ValueError())
+
+    def test_open_telemetry_requires_api(self):
+        with patch.dict('sys.modules', {'opentelemetry': None}):
+            with pytest.raises(ImportError, match='opentelemetry-api'):
+                OpenTelemetryHooks()
+
+    def test_open_telemetry_spans(self, tracer, exporter):
+        handler = OpenTelemetryHooks(tracer)
+        flow = MagicMock(flow_name='my_flow', succeeded=True)
+        flow.parent = None
+        step = MagicMock(step_name='my_step', step_attempts=1, step_method='get')
+        step.parent = flow
+        request = MagicMock(request_step=step, request_url='https://test', request_headers={},
+                            response_status_code=200, response_succeeded=True)
+        handler.on_flow_start(flow)
+        handler.on_step_start(step)
+        handler.on_request(request)
+        handler.on_response(request)
+        handler.on_step_end(step, True)
+        handler.on_flow_end(flow)
+        request_span, step_span, flow_span = exporter.get_finished_spans()
+        assert (request_span.name, step_span.name, flow_span.name) == ('GET', 'step my_step', 'flow my_flow')
+        assert request_span.parent.span_id == step_span.context.span_id
+        assert step_span.parent.span_id == flow_span.context.span_id
+        assert flow_span.parent is None
+        assert request_span.attributes['http.response.status_code'] == 200
+        trace_id = format(request_span.context.trace_id, '032x')
+        span_id = format(request_span.context.span_id, '016x')
+        assert request.request_headers['traceparent'].startswith(f'00-{trace_id}-{span_id}-')
+        assert handler.spans == {}
+
+    def test_open_telemetry_failures(self, tracer, exporter):
+        handler = OpenTelemetryHooks(tracer)
+        step = MagicMock(step_name='my_step', step_attempts=3, step_method='post')
+        step.parent = None
+        request = MagicMock(request_step=step, request_url='https://test', request_headers={})
+        handler.on_step_start(step)
+        handler.on_request(request)
+        handler.on_response(request, ConnectionError('refused'))
+        handler.on_step_end(step, False)
+        request_span, step_span = exporter.get_finished_spans()
+        assert not request_span.status.is_ok
+        assert request_span.events[0].name == 'exception'
+        assert not step_span.status.is_ok
+        assert step_span.attributes['api_flow.attempts'] == 3
+
+    def test_end_events_when_a_step_raises(self, events):
+        with patch.object(Request, '_make_request', side_effect=ConnectionError('refused')):
+            with pytest.raises(ConnectionError):
+                Flow('has_prerequisite', server_port=1).execute()
+        assert events == [
+            ('step_end', 'prerequisite_step', False),
+            ('flow_end', 'prerequisite_flow', False),
+            ('flow_end', 'has_prerequisite', False),
+        ]
+
+    def test_end_events_when_an_async_step_raises(self, events):
+        pytest.importorskip('httpx')
+        with patch.object(AsyncRequest, '_make_request', side_effect=ConnectionError('refused')):
+            with pytest.raises(ConnectionError):
+                asyncio.run(AsyncFlow('prerequisite_flow', server_port=1).execute())
+        assert events == [
+            ('step_end', 'prerequisite_step', False),
+            ('flow_end', 'prerequisite_flow', False),
+        ]
+
+    def test_open_telemetry_spans_end_when_a_step_raises(self, tracer, exporter):
+        handler = OpenTelemetryHooks(tracer)
+        add_hooks(handler)
+        try:
+            with patch.object(Request, '_make_request', side_effect=ConnectionError('refused')):
+                with pytest.raises(ConnectionError):
+                    Flow('prerequisite_flow', server_port=1).execute()
+        finally:
+            remove_hooks(handler)
+        spans = exporter.get_finished_spans()
+        assert [span.name for span in spans] == ['GET', 'step prerequisite_step', 'flow prerequisite_flow']
+        assert not any(span.status.is_ok for span in spans)
+        assert handler.spans == {}
@@ -1,9 +1,14 @@
+import asyncio
 import json
 import os
 import pytest
 import threading
-from api_flow import execute, configure
+import time
+from concurrent.futures import ThreadPoolExecutor
+from api_flow import execute, execute_async, configure, add_hooks, remove_hooks, Config, Hooks, LoadTest
+from api_flow.cache import MEMORY_CACHE
 from api_flow.complex_namespace import ComplexNamespace
+from api_flow.record import StepRecord
 from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from unittest.mock import MagicMock
 
@@ -74,6 +79,7 @@ def setup():
         function_path=None,
         template_path=None
     )
+    MEMORY_CACHE.clear()
 
 
 class TestIntegration:
@@ -90,6 +96,137 @@ class TestIntegration:
         flow = execute('has_prerequisite', server_port=httpd.server_port)
         assert flow.prerequisite_flow.prerequisite_step.id == '123abc'
 
+    def test_diamond_prerequisite_requested_once(self, httpd, http_response_factory):
+        flow = execute('diamond', server_port=httpd.server_port)
+        assert flow.succeeded
+        paths = [call.args[0].path for call in http_response_factory.call_args_list]
+        assert sorted(paths) == ['/bottom', '/left/123abc', '/prerequisite', '/right/123abc']
+
+    def test_run_report(self, httpd, http_response_factory):
+        flow = execute('diamond', server_port=httpd.server_port)
+        report = json.loads(flow.flow_report.to_json())
+        assert report['succeeded'] is True
+        assert list(report['steps'].keys()) == [
+            'diamond_left.prerequisite_flow.prerequisite_step',
+            'diamond_left.left',
+            'diamond_right.right',
+            'bottom'
+        ]
+        step = report['steps']['bottom']
+        assert step['status_code'] == 200
+        assert step['attempts'] == 1
+        assert step['timings']['wait'] > 0
+        assert sum(step['timings'].values()) <= step['elapsed']
+        assert report['elapsed'] >= sum(step['elapsed'] for step in report['steps'].values())
+
+    def test_hooks(self, httpd, http_response_factory):
+        events = []
+
+        class RecordingHooks(Hooks):
+            def on_flow_start(self, flow):
+                events.append(('flow_start', flow.flow_name))
+
+            def on_flow_end(self, flow):
+                events.append(('flow_end', flow.flow_name, flow.succeeded))
+
+            def on_step_start(self, step):
+                events.append(('step_start', step.step_name))
+
+            def on_step_end(self, step, succeeded):
+                events.append(('step_end', step.step_name, succeeded))
+
+            def on_attempt(self, step, attempt):
+                events.append(('attempt', step.step_name, attempt))
+
+            def on_request(self, request):
+                request.request_headers['X-Test'] = 'hooked'
+                events.append(('request', request.request_url.split('/')[3]))
+
+            def on_response(self, request, error=None):
+                events.append(('response', request.response_status_code, error))
+
+        handler = RecordingHooks()
+        add_hooks(handler)
+        try:
+            execute('has_prerequisite', server_port=httpd.server_port)
+        finally:
+            remove_hooks(handler)
+        assert events == [
+            ('flow_start', 'has_prerequisite'),
+            ('flow_start', 'prerequisite_flow'),
+            ('step_start', 'prerequisite_step'),
+            ('attempt', 'prerequisite_step', 1),
+            ('request', 'prerequisite'),
+            ('response', 200, None),
+            ('step_end', 'prerequisite_step', True),
+            ('flow_end', 'prerequisite_flow', True),
+            ('step_start', 'dependency'),
+            ('attempt', 'dependency', 1),
+            ('request', 'dependent'),
+            ('response', 200, None),
+            ('step_end', 'dependency', True),
+            ('flow_end', 'has_prerequisite', True),
+        ]
+        assert all(call.args[0].headers['X-Test'] == 'hooked' for call in http_response_factory.call_args_list)
+
+    def test_compact_retention(self, httpd, http_response_factory):
+        Config.retain_responses = 1
+        try:
+            flow = execute('diamond', server_port=httpd.server_port)
+        finally:
+            Config.retain_responses = None
+        assert flow.succeeded
+        prerequisite = flow.diamond_left.prerequisite_flow.prerequisite_step
+        assert isinstance(prerequisite, StepRecord)
+        assert prerequisite.id == '123abc'
+        assert prerequisite.step_status_code == 200
+        assert isinstance(flow.diamond_left.left, StepRecord)
+        assert isinstance(flow.diamond_right.right, StepRecord)
+        assert flow.bottom.step_request.response is not None
+        assert list(flow.flow_report.steps.keys())[0] == 'diamond_left.prerequisite_flow.prerequisite_step'
+
+    def test_compact_retention_keeps_failures(self, httpd, http_response_factory):
+        http_response_factory.return_value = response_fail_json
+        Config.retain_responses = 0
+        try:
+            flow = execute('prerequisite_flow', server_port=httpd.server_port)
+        finally:
+            Config.retain_responses = None
+        assert not flow.succeeded
+        assert flow.prerequisite_step.step_request.response_status_code == 400
+
+    def test_cached_prerequisite(self, httpd, http_response_factory):
+        for _ in range(3):
+            flow = execute('uses_cached_login', user='alice', server_port=httpd.server_port)
+            assert flow.succeeded
+            assert flow.orders.step_url.endswith('/orders/123abc')
+        paths = [call.args[0].path for call in http_response_factory.call_args_list]
+        assert paths.count('/login/alice') == 1
+        assert paths.count('/orders/123abc') == 3
+
+    def test_cached_prerequisite_on_disk(self, httpd, http_response_factory, tmp_path):
+        configure(cache_path=str(tmp_path))
+        try:
+            execute('uses_cached_login', user='alice', server_port=httpd.server_port)
+            MEMORY_CACHE.clear()
+            flow = execute('uses_cached_login', user='alice', server_port=httpd.server_port)
+            assert flow.cached_login.login.token == '123abc'
+        finally:
+            Config.cache_path = None
+        paths = [call.args[0].path for call in http_response_factory.call_args_list]
+        assert paths.count('/login/alice') == 1
+
+    def test_deadline(self, httpd, http_response_factory):
+        def respond(handler):
+            time.sleep(2)
+            return response_success_json
+        http_response_factory.side_effect = respond
+        started = time.perf_counter()
+        flow = execute('deadline', server_port=httpd.server_port)
+        assert not flow.succeeded
+        assert time.perf_counter() - started < 1.5
+        assert http_response_factory.call_count == 1
+
     def test_flow_with_profile(self, httpd, http_response_factory):
         flow = execute('profile_sub', profile='foo', profiles=['bar', 'baz'], server_port=httpd.server_port)
         assert flow.substitute.step_url.endswith('/Foo/Bar/Baz')
@@ -119,3 +256,106 @@ class TestIntegration:
     def test_empty_flow(self, httpd, http_response_factory):
         flow = execute('empty', server_port=httpd.server_port)
         assert flow.succeeded
+
+    def test_execute_async(self, httpd, http_response_factory):
+        pytest.importorskip('httpx')
+        flow = asyncio.run(execute_async('has_prerequisite', server_port=httpd.server_port))
+        assert flow.succeeded
+        assert flow.prerequisite_flow.prerequisite_step.id == '123abc'
+
+    def test_execute_async_concurrent_flows(self, httpd, http_response_factory):
+        pytest.importorskip('httpx')
+
+        async def run_all():
+            return await asyncio.gather(*[
+                execute_async('post_requests', server_port=httpd.server_port) for _ in range(5)
+            ])
+        assert all(flow.succeeded for flow in asyncio.run(run_all()))
+
+    def test_streamed_response(self, httpd, http_response_factory, tmp_path):
+        pytest.importorskip('ijson')
+        body = json.dumps({'count': 500, 'items': [{'id': i, 'name': 'x' * 200} for i in range(500)]})
+        http_response_factory.return_value = ComplexNamespace(
+            status_code=200,
+            headers={'Content-Type': 'application/json'},
+            body=body
+        )
+        spool_path = str(tmp_path / 'export.json')
+        flow = execute('streamed', server_port=httpd.server_port, spool_path=spool_path)
+        assert flow.succeeded
+        assert flow.export.count == 500
+        assert flow.export.ids == list(range(500))
+        assert flow.export.step_spool_path == spool_path
+        assert flow.export.step_request.response_body == ''
+        with open(spool_path) as spool:
+            assert spool.read() == body
+
+    def test_streamed_response_async(self, httpd, http_response_factory, tmp_path):
+        pytest.importorskip('httpx')
+        pytest.importorskip('ijson')
+        spool_path = str(tmp_path / 'export.json')
+        flow = asyncio.run(execute_async('streamed', server_port=httpd.server_port, spool_path=spool_path))
+        assert flow.succeeded
+        with open(spool_path) as spool:
+            assert json.load(spool) == {'id': '123abc'}
+
+    def test_streamed_response_failure(self, httpd, http_response_factory, tmp_path):
+        pytest.importorskip('ijson')
+        http_response_factory.return_value = response_fail_json
+        spool_path = tmp_path / 'export.json'
+        flow = execute('streamed', server_port=httpd.server_port, spool_path=str(spool_path))
+        assert not flow.succeeded
+        assert flow.export.step_request.response_body == {'id': '123abc'}
+        assert not spool_path.exists()
+
+    @pytest.mark.parametrize('run', [execute, lambda *args, **kwargs: asyncio.run(execute_async(*args, **kwargs))])
+    def test_streamed_upload(self, httpd, http_response_factory, run):
+        pytest.importorskip('httpx')
+        uploads = []
+
+        def receive_upload(handler):
+            assert handler.headers['Transfer-Encoding'] == 'chunked'
+            body = b''
+            while True:
+                size = int(handler.rfile.readline().strip(), 16)
+                body += handler.rfile.read(size)
+                handler.rfile.readline()
+                if size == 0:
+                    break
+            uploads.append(body)
+            return response_success_json
+        http_response_factory.side_effect = receive_upload
+        flow = run('streamed_upload', server_port=httpd.server_port, str_value='STREAMED')
+        assert flow.succeeded
+        assert uploads == [b'The value is STREAMED.\n']
+
+    def test_parallel_steps(self, httpd, http_response_factory):
+        flow = execute('parallel_steps', server_port=httpd.server_port)
+        assert flow.succeeded
+        assert flow.first.step_url.endswith('/first/123abc')
+        assert flow.summary.step_request.response_succeeded
+        assert flow.summary.step_url.endswith('/summary/third')
+
+    def test_parallel_steps_async(self, httpd, http_response_factory):
+        pytest.importorskip('httpx')
+        flow = asyncio.run(execute_async('parallel_steps', server_port=httpd.server_port))
+        assert flow.succeeded
+        assert flow.second.step_headers['X-Session'] == '123abc'
+
+    def test_load_test(self, httpd, http_response_factory):
+        report = LoadTest('has_prerequisite', iterations=6, concurrency=3, server_port=httpd.server_port).run()
+        assert report.iterations == 6
+        assert report.failures == 0
+        assert report.step_latency['dependency']['count'] == 6
+        assert report.step_latency['prerequisite_flow.prerequisite_step']['count'] == 6
+        assert report.step_latency['dependency']['p99'] > 0
+
+    def test_concurrent_flows_are_isolated(self, httpd, http_response_factory):
+        def run(flow_name):
+            return execute(flow_name, server_port=httpd.server_port)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            flows = list(executor.map(run, ['has_prerequisite', 'function_sub'] * 8))
+        for flow in flows:
+            assert flow.succeeded
+            assert flow.previous_flow is flow
+            assert flow.previous_step.parent is flow
@@ -0,0 +1,15 @@
+import pytest
+from api_flow.jsonpath import compile_jsonpath
+
+
+class TestJsonPath:
+    def test_compile_jsonpath(self):
+        expression = compile_jsonpath('$.foo[0].bar')
+        assert [match.value for match in expression.find({'foo': [{'bar': 'BAR'}]})] == ['BAR']
+
+    def test_compile_jsonpath_is_cached(self):
+        assert compile_jsonpath('$.cached') is compile_jsonpath('$.cached')
+
+    def test_compile_jsonpath_invalid(self):
+        with pytest.raises(ValueError):
+            compile_jsonpath('$.foo[')
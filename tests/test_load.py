@@ -0,0 +1,64 @@
+import json
+import os
+import pytest
+from unittest.mock import patch
+from api_flow.config import Config
+from api_flow.flow import Flow
+from api_flow.load import LoadReport, LoadTest, percentile
+
+
+@pytest.fixture(autouse=True)
+def setup():
+    Config.data_path = os.path.join(os.path.dirname(__file__), 'test_data')
+    yield
+    Config.data_path = None
+
+
+class TestLoad:
+    def test_percentile(self):
+        values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+        assert percentile(values, 50) == 5
+        assert percentile(values, 90) == 9
+        assert percentile(values, 99) == 10
+        assert percentile(values, 0) == 1
+        assert percentile([], 50) is None
+
+    def test_profiles_loaded_once(self):
+        with patch('api_flow.load.Profiles') as mock_profiles:
+            mock_profiles.return_value.items.return_value = [('foo', 'Foo')]
+            load_test = LoadTest('empty', profile='foo', iterations=3, bar='Bar')
+            report = load_test.run()
+            mock_profiles.assert_called_once_with(profile='foo', profiles=None)
+        assert report.iterations == 3
+        assert all(flow.foo == 'Foo' and flow.bar == 'Bar' for flow, _, _ in load_test.results)
+
+    def test_exceptions_counted_as_failures(self):
+        with patch.object(Flow, 'execute', side_effect=ConnectionError('refused')):
+            report = LoadTest('empty', iterations=4, concurrency=2).run()
+        assert report.failures == 4
+        assert report.error_rate == 1.0
+        assert report.exceptions == {'ConnectionError': 4}
+
+    def test_flow_creation_errors_counted_as_failures(self):
+        with patch('api_flow.load.Flow', side_effect=ValueError('invalid flow')):
+            report = LoadTest('empty', iterations=2).run()
+        assert report.failures == 2
+        assert report.exceptions == {'ValueError': 2}
+        assert report.step_latency == {}
+        assert 'ValueError: 2' in report.format()
+
+    def test_rate_limits_flow_starts(self):
+        with patch('api_flow.load.time.sleep') as mock_sleep:
+            LoadTest('empty', iterations=3, rate=2).run()
+            assert mock_sleep.call_count >= 1
+            assert max(call.args[0] for call in mock_sleep.call_args_list) <= 1.0
+
+    def test_report(self):
+        report = LoadReport('empty', [(Flow('empty'), 0.5, None), (Flow('empty'), 1.5, None)], 2.0)
+        assert report.throughput == 1.0
+        assert report.flow_latency['p50'] == 0.5
+        assert report.flow_latency['max'] == 1.5
+        assert report.failures == 2
+        assert report.as_dict()['iterations'] == 2
+        assert json.loads(report.to_json())['flow_latency']['max'] == 1.5
+        assert 'flow empty' in report.format()
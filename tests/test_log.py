@@ -0,0 +1,38 @@
+import io
+import logging
+import pytest
+from unittest.mock import MagicMock
+from api_flow.config import Config
+from api_flow.log import LazyMessage, configure_logging, truncate
+
+
+@pytest.fixture(autouse=True)
+def reset_logging():
+    logger = logging.getLogger('api_flow')
+    handlers = list(logger.handlers)
+    level = logger.level
+    yield
+    logger.handlers = handlers
+    logger.setLevel(level)
+    Config.log_body_limit = None
+
+
+class TestLog:
+    def test_truncate(self):
+        assert truncate('abcdef', 10) == 'abcdef'
+        assert truncate('abcdef', 3) == 'abc... (3 more characters)'
+        assert truncate('abcdef', 0) == 'abcdef'
+
+    def test_truncate_uses_config(self):
+        Config.log_body_limit = 2
+        assert truncate('abcdef') == 'ab... (4 more characters)'
+
+    def test_lazy_message_only_built_when_emitted(self):
+        stream = io.StringIO()
+        configure_logging(logging.INFO, stream=stream)
+        build = MagicMock(return_value='BUILT')
+        logging.getLogger('api_flow.test').debug('%s', LazyMessage(build))
+        build.assert_not_called()
+        logging.getLogger('api_flow.test').info('%s', LazyMessage(build))
+        build.assert_called_once()
+        assert stream.getvalue() == 'BUILT\n'
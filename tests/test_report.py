@@ -0,0 +1,39 @@
+import json
+from unittest.mock import MagicMock
+from api_flow.complex_namespace import ComplexNamespace
+from api_flow.report import PHASES, RunReport
+
+
+def mock_step(status_code, elapsed, **timings):
+    step = MagicMock()
+    step.step_succeeded = status_code < 400
+    step.step_status_code = status_code
+    step.step_attempts = 1
+    step.step_elapsed = elapsed
+    step.step_timings = ComplexNamespace(**timings)
+    return step
+
+
+class TestRunReport:
+    def test_report(self):
+        flow = MagicMock()
+        flow.flow_name = 'my_flow'
+        flow.succeeded = False
+        flow.flow_elapsed = 1.5
+        flow.get_executed_steps.return_value = [
+            ('prerequisite.login', mock_step(200, 0.5, render=0.1, wait=0.3)),
+            ('orders', mock_step(500, 0.75, wait=0.5, parse=0.25)),
+        ]
+        report = RunReport(flow)
+        assert report.phases == {
+            'render': 0.1, 'wait': 0.8, 'download': 0.0, 'parse': 0.25, 'outputs': 0.0, 'sleep': 0.0
+        }
+        assert report.steps['orders'] == {
+            'succeeded': False,
+            'status_code': 500,
+            'attempts': 1,
+            'elapsed': 0.75,
+            'timings': dict((phase, {'wait': 0.5, 'parse': 0.25}.get(phase, 0.0)) for phase in PHASES),
+        }
+        assert json.loads(report.to_json()) == report.as_dict()
+        assert report.as_dict()['flow_name'] == 'my_flow'
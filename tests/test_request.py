@@ -1,8 +1,11 @@
+import asyncio
 import json
 import pytest
-from unittest.mock import MagicMock, patch
+import threading
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
 from api_flow.complex_namespace import ComplexNamespace
-from api_flow.request import Request, DEFAULT_HEADERS
+from api_flow.request import AsyncRequest, Request, DEFAULT_HEADERS
 
 
 @pytest.fixture
@@ -28,6 +31,11 @@ def mock_step():
     }
     mock_step.step_url = 'https://test'
     mock_step.step_method = 'GET'
+    mock_step.flow_session = None
+    mock_step.step_timeout = (10, 60)
+    mock_step.step_time_remaining = None
+    mock_step.step_timings = ComplexNamespace()
+    mock_step.step_stream = None
     yield mock_step
 
 
@@ -58,7 +66,8 @@ class TestRequest:
             headers={
                 **DEFAULT_HEADERS,
                 'Accept': 'application/pdf',
-            }
+            },
+            timeout=(10, 60)
         )
 
     def test_get_request_no_response_headers(self, mock_step, mock_successful_response, mock_requests_get):
@@ -74,7 +83,8 @@ class TestRequest:
             headers={
                 **DEFAULT_HEADERS,
                 'Accept': 'application/pdf',
-            }
+            },
+            timeout=(10, 60)
         )
 
     def test_get_request_not_a_json_response(self, mock_step, mock_successful_response, mock_requests_get):
@@ -90,7 +100,8 @@ class TestRequest:
             headers={
                 **DEFAULT_HEADERS,
                 'Accept': 'application/pdf',
-            }
+            },
+            timeout=(10, 60)
         )
 
     def test_get_request_no_body(self, mock_step, mock_successful_response, mock_requests_get):
@@ -106,7 +117,8 @@ class TestRequest:
             headers={
                 **DEFAULT_HEADERS,
                 'Accept': 'application/pdf',
-            }
+            },
+            timeout=(10, 60)
         )
 
     def test_post_request(self, mock_step, mock_successful_response, mock_requests_post):
@@ -124,6 +136,7 @@ class TestRequest:
                 **DEFAULT_HEADERS,
                 'Accept': 'application/pdf',
             },
+            timeout=(10, 60),
             json={'a': 'A'}
         )
 
@@ -139,6 +152,7 @@ class TestRequest:
                 **DEFAULT_HEADERS,
                 'Accept': 'application/pdf',
             },
+            timeout=(10, 60),
             json={'a': 'A'}
         )
 
@@ -157,5 +171,148 @@ class TestRequest:
                 **DEFAULT_HEADERS,
                 'Accept': 'application/pdf',
             },
+            timeout=(10, 60),
+            data='NOT A JSON BODY'
+        )
+
+    def test_timeout_limited_by_deadline(self, mock_step, mock_requests_get):
+        mock_step.step_time_remaining = 4
+        assert Request(mock_step).execute()
+        assert mock_requests_get.call_args.kwargs['timeout'] == (4, 4)
+        mock_step.step_timeout = (None, None)
+        mock_step.step_time_remaining = -1
+        assert Request(mock_step).execute()
+        assert mock_requests_get.call_args.kwargs['timeout'] == (0.001, 0.001)
+
+    def test_request_uses_flow_session(self, mock_step, mock_successful_response, mock_requests_get):
+        mock_step.flow_session = MagicMock()
+        mock_step.flow_session.request.return_value = mock_successful_response
+        request = Request(mock_step)
+        assert request.execute()
+        mock_requests_get.assert_not_called()
+        mock_step.flow_session.request.assert_called_with(
+            'GET',
+            'https://test',
+            headers={
+                **DEFAULT_HEADERS,
+                'Accept': 'application/pdf',
+            },
+            timeout=(10, 60)
+        )
+
+    def test_response_succeeded_httpx_response(self, mock_step, mock_successful_response, mock_requests_get):
+        request = Request(mock_step)
+        del mock_successful_response.ok
+        mock_successful_response.is_success = False
+        assert not request.execute()
+
+    def test_async_request_uses_flow_session(self, mock_step, mock_successful_response):
+        mock_step.step_method = 'POST'
+        mock_step.step_body = 'NOT A JSON BODY'
+        mock_step.flow_session = MagicMock()
+        mock_step.flow_session.request = AsyncMock(return_value=mock_successful_response)
+        request = AsyncRequest(mock_step)
+        assert asyncio.run(request.execute())
+        mock_step.flow_session.request.assert_awaited_with(
+            'POST',
+            'https://test',
+            headers={
+                **DEFAULT_HEADERS,
+                'Accept': 'application/pdf',
+            },
+            timeout=(10, 60),
             data='NOT A JSON BODY'
         )
+
+    def test_async_streamed_body_read_off_the_event_loop(self):
+        threads = []
+
+        def chunks():
+            for chunk in (b'a', b'b'):
+                threads.append(threading.get_ident())
+                yield chunk
+
+        async def read():
+            return [chunk async for chunk in AsyncRequest._iterate_async(chunks())], threading.get_ident()
+
+        received, loop_thread = asyncio.run(read())
+        assert received == [b'a', b'b']
+        assert len(threads) == 2
+        assert loop_thread not in threads
+
+    def test_templates_rendered_once_per_attempt(self, mock_step, mock_requests_get):
+        url = PropertyMock(return_value='https://test')
+        type(mock_step).step_url = url
+        request = Request(mock_step)
+        assert request.execute()
+        assert url.call_count == 1
+        assert request.request_url == 'https://test'
+        assert request.execute()
+        assert url.call_count == 2
+
+    def test_timings_split_wait_and_download(self, mock_step, mock_successful_response, mock_requests_get):
+        mock_successful_response.elapsed = timedelta(seconds=0.25)
+        request = Request(mock_step)
+        with patch('api_flow.request.time.perf_counter', side_effect=[1.0, 1.5, 2.0, 3.0]):
+            assert request.execute()
+        assert mock_step.step_timings.render == 0.5
+        assert mock_step.step_timings.wait == 0.25
+        assert mock_step.step_timings.download == 0.75
+
+    def test_release(self, mock_step, mock_successful_response, mock_requests_get):
+        mock_successful_response.content = b'{"a": "A"}'
+        request = Request(mock_step)
+        assert request.execute()
+        assert request.response_body == {'a': 'A'}
+        request.release()
+        assert not request.request_executed
+        assert request.response_body == ''
+
+    def test_response_body_parsed_once(self, mock_step, mock_successful_response, mock_requests_get):
+        mock_successful_response.content = b'{"a": "A"}'
+        request = Request(mock_step)
+        with patch('api_flow.request.json_loads', wraps=json.loads) as mock_loads:
+            assert request.execute()
+            assert request.response_body == {'a': 'A'}
+            assert request.response_body is request.response_body
+            mock_loads.assert_called_once()
+
+    def test_response_body_reparsed_for_new_response(self, mock_step, mock_successful_response, mock_requests_get):
+        mock_successful_response.content = b'{"a": "A"}'
+        request = Request(mock_step)
+        assert request.execute()
+        assert request.response_body == {'a': 'A'}
+        second_response = MagicMock(headers={'Content-Type': 'application/json'}, content=b'[1, 2]')
+        mock_requests_get.return_value = second_response
+        assert request.execute()
+        assert request.response_body == [1, 2]
+
+    def test_response_body_plain_text(self, mock_step, mock_successful_response, mock_requests_get):
+        mock_successful_response.headers = {'Content-Type': 'text/plain'}
+        mock_successful_response.text = 'NOT A JSON DOCUMENT'
+        request = Request(mock_step)
+        assert request.execute()
+        assert request.response_body == 'NOT A JSON DOCUMENT'
+
+    def test_response_body_sniffs_json_text(self, mock_step, mock_successful_response, mock_requests_get):
+        mock_successful_response.headers = {}
+        mock_successful_response.text = ' {"a": "A"}'
+        request = Request(mock_step)
+        assert request.execute()
+        assert request.response_body == {'a': 'A'}
+
+    def test_response_body_falls_back_to_standard_json(self, mock_step, mock_successful_response, mock_requests_get):
+        mock_successful_response.content = b'{"a": 123456789012345678901234567890}'
+        request = Request(mock_step)
+        with patch('api_flow.request.json_loads', side_effect=ValueError('Value is too big')):
+            assert request.execute()
+            assert request.response_body == {'a': 123456789012345678901234567890}
+
+    def test_request_logging_is_lazy(self, mock_step, mock_successful_response, mock_requests_get):
+        request = Request(mock_step)
+        with patch.object(Request, '_format_body') as mock_format_body:
+            with patch('api_flow.request.logger') as mock_logger:
+                mock_logger.isEnabledFor.return_value = False
+                assert request.execute()
+                mock_logger.debug.assert_not_called()
+            mock_format_body.assert_not_called()
@@ -0,0 +1,107 @@
+import pytest
+from email.utils import formatdate
+from unittest.mock import MagicMock, patch
+from api_flow.complex_namespace import ComplexNamespace
+from api_flow.retry import ResponseCondition, RetryPolicy
+
+
+def failed_request(status_code=503, body=None, headers=None):
+    request = MagicMock()
+    request.response_status_code = status_code
+    request.response_body = body if body is not None else {}
+    request.response_headers = headers or {}
+    return request
+
+
+class TestResponseCondition:
+    def test_expression(self):
+        condition = ResponseCondition('$.error.retryable')
+        assert condition.matches({'error': {'retryable': True}})
+        assert not condition.matches({'error': {'retryable': False}})
+        assert not condition.matches({})
+
+    def test_map(self):
+        condition = ResponseCondition(ComplexNamespace(**{'$.status': ['QUEUED', 'RUNNING'], '$.ready': False}))
+        assert condition.matches({'status': 'RUNNING', 'ready': False})
+        assert not condition.matches({'status': 'RUNNING', 'ready': True})
+        assert not condition.matches({'status': 'DONE', 'ready': False})
+
+    def test_non_json_body(self):
+        assert not ResponseCondition('$.status').matches('THIS IS THE RESPONSE')
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            ResponseCondition('$.status[')
+        with pytest.raises(ValueError):
+            ResponseCondition(42)
+
+
+class TestRetryPolicy:
+    def test_first_attempt_not_delayed(self):
+        assert RetryPolicy(attempt=3, delay=5).get_first_delay() == 0
+        assert RetryPolicy(attempt=3, delay=5, delay_first=True).get_first_delay() == 5
+
+    def test_fixed_delay(self):
+        policy = RetryPolicy(attempt=3, delay=5)
+        assert policy.get_next_delay(1, 0, failed_request()) == 5
+        assert policy.get_next_delay(2, 5, failed_request()) == 5
+        assert policy.get_next_delay(3, 10, failed_request()) is None
+
+    def test_exponential_backoff(self):
+        policy = RetryPolicy(attempt=10, delay=1, backoff=2, max_delay=6)
+        assert [policy.get_next_delay(attempt, 0, failed_request()) for attempt in range(1, 6)] == [1, 2, 4, 6, 6]
+
+    def test_full_jitter(self):
+        policy = RetryPolicy(attempt=3, delay=4, jitter=True)
+        with patch('api_flow.retry.random.uniform', return_value=1.5) as mock_uniform:
+            assert policy.get_next_delay(1, 0, failed_request()) == 1.5
+            mock_uniform.assert_called_once_with(0, 4)
+
+    def test_max_elapsed(self):
+        policy = RetryPolicy(attempt=10, delay=5, max_elapsed=12)
+        assert policy.get_next_delay(1, 6, failed_request()) == 5
+        assert policy.get_next_delay(2, 8, failed_request()) is None
+
+    def test_retry_after_seconds(self):
+        policy = RetryPolicy(attempt=3, delay=1)
+        assert policy.get_next_delay(1, 0, failed_request(429, headers={'Retry-After': '7'})) == 7
+        assert policy.get_next_delay(1, 0, failed_request(429, headers={'Retry-After': 'soon'})) == 1
+
+    def test_retry_after_date(self):
+        with patch('api_flow.retry.time.time', return_value=1000000000.0):
+            request = failed_request(429, headers={'Retry-After': formatdate(1000000030.0, usegmt=True)})
+            assert RetryPolicy(attempt=3, delay=1).get_next_delay(1, 0, request) == 30
+
+    def test_retry_on_status(self):
+        policy = RetryPolicy(attempt=3, delay=1, retry_on=ComplexNamespace(status=[429, 503]))
+        assert policy.get_next_delay(1, 0, failed_request(503)) == 1
+        assert policy.get_next_delay(1, 0, failed_request(400)) is None
+
+    def test_retry_on_body(self):
+        policy = RetryPolicy(attempt=3, delay=1, retry_on=ComplexNamespace(body={'$.error.code': 'LOCKED'}))
+        assert policy.get_next_delay(1, 0, failed_request(400, {'error': {'code': 'LOCKED'}})) == 1
+        assert policy.get_next_delay(1, 0, failed_request(400, {'error': {'code': 'INVALID'}})) is None
+
+    def test_retry_on_exceptions(self):
+        policy = RetryPolicy(attempt=3, delay=1, retry_on=ComplexNamespace(exceptions=['ConnectionError']))
+        assert policy.retries_exception(ConnectionRefusedError())
+        assert not policy.retries_exception(ValueError())
+        assert policy.get_next_delay(1, 0, failed_request(), ConnectionResetError()) == 1
+        assert not RetryPolicy(attempt=3, delay=1).retries_exception(ConnectionError())
+
+    def test_unlimited_attempts(self):
+        policy = RetryPolicy(attempt=None, delay=1, max_elapsed=100)
+        assert policy.get_next_delay(1000, 50, failed_request()) == 1
+        assert policy.get_next_delay(1000, 100, failed_request()) is None
+
+    def test_until(self):
+        policy = RetryPolicy(attempt=5, delay=1, until={'$.status': 'DONE'}, retry_on=ComplexNamespace(status=[503]))
+        assert policy.is_complete({'status': 'DONE'})
+        assert not policy.is_complete({'status': 'PENDING'})
+        pending = failed_request(200, {'status': 'PENDING'})
+        pending.response_succeeded = True
+        assert policy.get_next_delay(1, 0, pending) == 1
+        rejected = failed_request(400)
+        rejected.response_succeeded = False
+        assert policy.get_next_delay(1, 0, rejected) is None
+        assert RetryPolicy().is_complete({})
@@ -0,0 +1,39 @@
+from unittest.mock import MagicMock
+from api_flow.config import Config
+from api_flow.context import Context
+from api_flow.run import Run
+
+
+class TestRun:
+    def test_tracking_defaults(self):
+        run = Run()
+        assert run.current_flow is None
+        assert run.previous_flow is None
+        assert run.current_step is None
+        assert run.previous_step is None
+
+    def test_is_a_context(self):
+        run = Run(foo='Foo')
+        assert isinstance(run, Context)
+        assert run['foo'] == 'Foo'
+
+    def test_retain_steps(self):
+        Config.retain_responses = 2
+        try:
+            run = Run()
+        finally:
+            Config.retain_responses = None
+        steps = [MagicMock(step_succeeded=True) for _ in range(4)]
+        failed = MagicMock(step_succeeded=False)
+        for step in steps[:2] + [failed] + steps[2:]:
+            run.retain_step(step)
+        steps[0].compact.assert_called_once_with()
+        steps[1].compact.assert_called_once_with()
+        for step in steps[2:] + [failed]:
+            step.compact.assert_not_called()
+
+    def test_retain_all_by_default(self):
+        run = Run()
+        step = MagicMock(step_succeeded=True)
+        run.retain_step(step)
+        step.compact.assert_not_called()
@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from api_flow.complex_namespace import ComplexNamespace
+from api_flow.session import AsyncSession, Session, get_timeout
+
+
+@pytest.fixture
+def mock_session_request():
+    with patch('requests.Session.request') as mock_session_request:
+        yield mock_session_request
+
+
+class TestSession:
+    def test_mounts_pooled_adapters(self):
+        with Session(pool_size=3, max_connections=7) as session:
+            for prefix in ('http://', 'https://'):
+                adapter = session.client.get_adapter(f'{prefix}example.com')
+                assert adapter._pool_connections == 3
+                assert adapter._pool_maxsize == 7
+
+    def test_request(self, mock_session_request):
+        session = Session()
+        session.request('post', 'https://test', data='BODY')
+        mock_session_request.assert_called_with('POST', 'https://test', data='BODY')
+
+    def test_http2(self):
+        httpx = pytest.importorskip('httpx')
+        pytest.importorskip('h2')
+        with Session(http2=True) as session:
+            assert isinstance(session.client, httpx.Client)
+            with patch.object(session.client, 'request') as mock_request:
+                session.request('put', 'https://test', data='BODY')
+                mock_request.assert_called_with('PUT', 'https://test', content='BODY')
+                session.request('get', 'https://test', timeout=(2, 30))
+                assert mock_request.call_args.kwargs['timeout'] == httpx.Timeout(30, connect=2)
+
+    def test_http2_requires_httpx(self):
+        with patch.dict('sys.modules', {'httpx': None}):
+            with pytest.raises(ImportError):
+                Session(http2=True)
+
+    def test_async_request(self):
+        pytest.importorskip('httpx')
+
+        async def run():
+            async with AsyncSession() as session:
+                with patch.object(session.client, 'request', new_callable=AsyncMock) as mock_request:
+                    await session.request('post', 'https://test', data='BODY')
+                    mock_request.assert_awaited_with('POST', 'https://test', content='BODY')
+        asyncio.run(run())
+
+    def test_async_requires_httpx(self):
+        with patch.dict('sys.modules', {'httpx': None}):
+            with pytest.raises(ImportError):
+                AsyncSession()
+
+    def test_get_timeout(self):
+        assert get_timeout(None) == (10, 60)
+        assert get_timeout(None, (1, 2)) == (1, 2)
+        assert get_timeout(5, (1, 2)) == (5, 5)
+        assert get_timeout(ComplexNamespace(read=30), (1, 2)) == (1, 30)
+        assert get_timeout(ComplexNamespace(connect=0, read=30), (1, 2)) == (None, 30)
+
+    def test_get_timeout_invalid(self):
+        with pytest.raises(ValueError):
+            get_timeout('soon')
+        with pytest.raises(ValueError):
+            get_timeout(ComplexNamespace(write=3))
@@ -1,7 +1,11 @@
+import asyncio
+import os
 import pytest
+from api_flow.config import Config
 from api_flow.context import Context
-from api_flow.step import Step, DEFAULT_ATTEMPT_COUNT, DEFAULT_DELAY_SECONDS
-from unittest.mock import patch
+from api_flow.run import Run
+from api_flow.step import AsyncStep, Step, DEFAULT_ATTEMPT_COUNT, DEFAULT_DELAY_SECONDS, POLL
+from unittest.mock import AsyncMock, PropertyMock, patch
 
 
 @pytest.fixture
@@ -17,6 +21,21 @@ def mock_request():
         yield mock_request
 
 
+@pytest.fixture
+def mock_async_request():
+    with patch('api_flow.step.AsyncRequest', autospec=True) as mock_async_request:
+        mock_async_request.return_value.execute = AsyncMock(side_effect=[False, True])
+        mock_async_request.return_value.response_body = {'foo': 'FOO'}
+        mock_async_request.return_value.response_succeeded = True
+        yield mock_async_request
+
+
+@pytest.fixture
+def mock_async_sleep():
+    with patch('asyncio.sleep', new_callable=AsyncMock) as mock_async_sleep:
+        yield mock_async_sleep
+
+
 @pytest.fixture
 def mock_sleep():
     with patch('time.sleep') as mock_sleep:
@@ -27,7 +46,7 @@ def mock_sleep():
 def mock_parent_flow():
     yield Context(
         flow_description='Mock Parent Flow',
-        flow_store=Context()
+        flow_store=Run()
     )
 
 
@@ -100,3 +119,230 @@ class TestStep:
         assert step.foo == 'FOO'
         assert step.bar == 'BAR'
         assert step.baz == 'BAZ'
+
+    def test_execute_async(self, mock_async_request, mock_async_sleep, mock_sleep, mock_parent_flow):
+        step = AsyncStep('name', {
+            'url': 'https://test',
+            'wait_for_success': {
+                'attempt': 2,
+                'delay': 8,
+            },
+            'outputs': {
+                'foo': '$.foo',
+            }
+        }, parent=mock_parent_flow)
+        assert asyncio.run(step.execute())
+        mock_async_sleep.assert_called_with(8)
+        mock_sleep.assert_not_called()
+        assert step.foo == 'FOO'
+
+    def test_first_attempt_not_delayed(self, mock_request, mock_sleep, mock_parent_flow):
+        step = Step('name', {
+            'url': 'https://test',
+            'wait_for_success': {
+                'attempt': 3,
+                'delay': 2,
+                'backoff': 3,
+            },
+        }, parent=mock_parent_flow)
+        assert step.execute()
+        assert [call.args[0] for call in mock_sleep.call_args_list] == [2, 6]
+
+    def test_retry_on_exception(self, mock_request, mock_sleep, mock_parent_flow):
+        mock_request.return_value.execute.side_effect = [ConnectionError('refused'), True]
+        step = Step('name', {
+            'url': 'https://test',
+            'wait_for_success': {
+                'delay': 1,
+                'retry_on': {'exceptions': ['ConnectionError']},
+            },
+        }, parent=mock_parent_flow)
+        assert step.execute()
+        assert mock_request.return_value.execute.call_count == 2
+        assert step.step_attempts == 2
+        assert step.step_timings.get('sleep') is not None
+
+    def test_retry_on_exception_exhausted(self, mock_request, mock_sleep, mock_parent_flow):
+        mock_request.return_value.execute.side_effect = ConnectionError('refused')
+        step = Step('name', {
+            'url': 'https://test',
+            'wait_for_success': {
+                'attempt': 2,
+                'delay': 1,
+                'retry_on': {'exceptions': ['ConnectionError']},
+            },
+        }, parent=mock_parent_flow)
+        with pytest.raises(ConnectionError):
+            step.execute()
+        assert mock_request.return_value.execute.call_count == 2
+
+    def test_retry_on_exception_exhausted_async(self, mock_async_request, mock_async_sleep, mock_parent_flow):
+        mock_async_request.return_value.execute = AsyncMock(side_effect=ConnectionError('refused'))
+        step = AsyncStep('name', {
+            'url': 'https://test',
+            'wait_for_success': {
+                'attempt': 2,
+                'delay': 1,
+                'retry_on': {'exceptions': ['ConnectionError']},
+            },
+        }, parent=mock_parent_flow)
+        with pytest.raises(ConnectionError):
+            asyncio.run(step.execute())
+        assert mock_async_request.return_value.execute.await_count == 2
+        assert step.step_attempts == 2
+        mock_async_sleep.assert_awaited_once_with(1)
+        assert step.step_timings.get('sleep') == 1
+
+    def test_outputs_timing_excludes_parse(self, mock_request, mock_parent_flow):
+        clock = [0.0]
+
+        def parse_body():
+            if not clock[0]:
+                clock[0] += 1.0
+            return {'foo': 'FOO'}
+        mock_request.return_value.execute.side_effect = None
+        mock_request.return_value.execute.return_value = True
+        step = Step('name', {'url': 'https://test', 'outputs': {'foo': '$.foo'}}, parent=mock_parent_flow)
+        type(mock_request.return_value).response_body = PropertyMock(side_effect=parse_body)
+        with patch('api_flow.step.time.perf_counter', side_effect=lambda: clock[0]):
+            assert step.execute()
+        assert step.foo == 'FOO'
+        assert step.step_timings.outputs == 0.0
+
+    def test_exception_not_retried(self, mock_request, mock_sleep, mock_parent_flow):
+        mock_request.return_value.execute.side_effect = ConnectionError('refused')
+        step = Step('name', {'url': 'https://test', 'wait_for_success': True}, parent=mock_parent_flow)
+        with pytest.raises(ConnectionError):
+            step.execute()
+        assert mock_request.return_value.execute.call_count == 1
+
+    def test_retry_config_invalid(self, mock_parent_flow):
+        with pytest.raises(ValueError):
+            Step('name', {'url': 'https://test', 'wait_for_success': {'tries': 3}}, parent=mock_parent_flow)
+
+    def test_poll_until(self, mock_request, mock_sleep, mock_parent_flow):
+        bodies = iter([{'status': 'QUEUED'}, {'status': 'RUNNING'}, {'status': 'DONE', 'result': 42}])
+
+        def execute():
+            mock_request.return_value.response_body = next(bodies)
+            return True
+        mock_request.return_value.execute.side_effect = execute
+        step = Step('name', {
+            'url': 'https://test',
+            'wait_for_success': {'until': {'$.status': 'DONE'}, 'delay': 1, 'backoff': 2},
+            'outputs': {'result': '$.result'},
+        }, parent=mock_parent_flow)
+        assert step.step_retry_config.attempt is None
+        assert step.step_retry_config.max_elapsed == POLL['max_elapsed']
+        assert step.execute()
+        assert [call.args[0] for call in mock_sleep.call_args_list] == [1, 2]
+        assert step.result == 42
+
+    def test_poll_until_deadline(self, mock_request, mock_sleep, mock_parent_flow):
+        mock_request.return_value.execute.side_effect = None
+        mock_request.return_value.execute.return_value = True
+        mock_request.return_value.response_body = {'status': 'RUNNING'}
+        step = Step('name', {
+            'url': 'https://test',
+            'wait_for_success': {'until': '$.done', 'delay': 1, 'backoff': 1, 'max_elapsed': 5},
+        }, parent=mock_parent_flow)
+        with patch('api_flow.step.time.perf_counter', side_effect=[0, 0, 2, 4, 6, 6]):
+            assert not step.execute()
+        assert mock_request.return_value.execute.call_count == 3
+
+    def test_poll_until_async(self, mock_async_request, mock_async_sleep, mock_parent_flow):
+        mock_async_request.return_value.execute = AsyncMock(return_value=True)
+        mock_async_request.return_value.response_body = {'done': True}
+        step = AsyncStep('name', {
+            'url': 'https://test',
+            'wait_for_success': {'until': '$.done'},
+        }, parent=mock_parent_flow)
+        assert asyncio.run(step.execute())
+        mock_async_sleep.assert_not_called()
+
+    def test_timeout(self, mock_parent_flow):
+        assert Step('name', {'url': 'https://test'}, parent=mock_parent_flow).step_timeout == (10, 60)
+        mock_parent_flow.flow_timeout = (3, 30)
+        assert Step('name', {'url': 'https://test'}, parent=mock_parent_flow).step_timeout == (3, 30)
+        step = Step('name', {'url': 'https://test', 'timeout': {'read': 5}}, parent=mock_parent_flow)
+        assert step.step_timeout == (3, 5)
+
+    def test_deadline_passed(self, mock_request, mock_sleep, mock_parent_flow):
+        mock_parent_flow.flow_deadline = 100
+        step = Step('name', {'url': 'https://test'}, parent=mock_parent_flow)
+        with patch('api_flow.step.time.perf_counter', return_value=101):
+            assert not step.execute()
+        mock_request.return_value.execute.assert_not_called()
+        assert step.step_time_remaining < 0
+
+    def test_deadline_stops_retries(self, mock_request, mock_sleep, mock_parent_flow):
+        mock_parent_flow.flow_deadline = 100
+        step = Step('name', {'url': 'https://test', 'wait_for_success': {'delay': 5}}, parent=mock_parent_flow)
+        with patch('api_flow.step.time.perf_counter', return_value=96):
+            assert not step.execute()
+        mock_request.return_value.execute.assert_called_once()
+        mock_sleep.assert_not_called()
+
+    def test_deadline_timeout_fails_cleanly(self, mock_request, mock_sleep, mock_parent_flow):
+        mock_parent_flow.flow_deadline = 100
+        mock_request.return_value.execute.side_effect = TimeoutError('read timed out')
+        step = Step('name', {'url': 'https://test'}, parent=mock_parent_flow)
+        with patch('api_flow.step.time.perf_counter', side_effect=[90, 90, 90, 101, 101, 101, 101]):
+            assert not step.execute()
+
+    def test_compact(self, mock_request, mock_sleep, mock_parent_flow):
+        mock_request.return_value.execute.side_effect = [True]
+        mock_request.return_value.response_status_code = 200
+        step = Step('name', {'url': 'https://test', 'outputs': {'foo': '$.foo'}}, parent=mock_parent_flow)
+        assert step.execute()
+        record = step.compact()
+        assert mock_parent_flow.name is record
+        assert record.foo == 'FOO'
+        assert record.step_succeeded
+        assert record.step_status_code == 200
+        assert record.step_attempts == 1
+        assert not hasattr(record, 'bar')
+        assert not hasattr(record, '__dict__')
+        mock_request.return_value.release.assert_called_once_with()
+
+    def test_stream(self, mock_request, mock_sleep, mock_parent_flow):
+        pytest.importorskip('ijson')
+        mock_request.return_value.execute.side_effect = [True]
+        mock_request.return_value.response_matches = {'foo': ['FOO'], 'ids': [1, 2]}
+        step = Step('name', {
+            'url': 'https://test',
+            'stream': {'spool': '{? flow_description ?}.json'},
+            'outputs': {'foo': '$.foo', 'ids': '$.items[*].id'}
+        }, parent=mock_parent_flow)
+        assert step.step_spool_path == 'Mock Parent Flow.json'
+        assert step.execute()
+        assert step.foo == 'FOO'
+        assert step.ids == [1, 2]
+
+    def test_stream_config_invalid(self, mock_parent_flow):
+        pytest.importorskip('ijson')
+        with pytest.raises(ValueError):
+            Step('name', {'url': 'https://test', 'stream': {'file': 'out.json'}}, parent=mock_parent_flow)
+        with pytest.raises(ValueError):
+            Step('name', {'url': 'https://test', 'stream': True, 'outputs': {'foo': '$..foo'}},
+                 parent=mock_parent_flow)
+        with pytest.raises(ValueError):
+            Step('name', {'url': 'https://test', 'stream': True, 'wait_for_success': {'until': '$.done'}},
+                 parent=mock_parent_flow)
+
+    def test_stream_body(self, mock_parent_flow, monkeypatch):
+        monkeypatch.setattr(Config, 'data_path', os.path.join(os.path.dirname(__file__), 'test_data'))
+        mock_parent_flow.str_value = 'H'
+        step = Step('name', {
+            'url': 'https://test',
+            'body': 'template:test_template.txt',
+            'stream_body': True
+        }, parent=mock_parent_flow)
+        assert b''.join(step.step_body) == b'The value is H.\n'
+
+    def test_stream_body_config_invalid(self, mock_parent_flow):
+        with pytest.raises(ValueError):
+            Step('name', {'url': 'https://test', 'body': {'a': 'A'}, 'stream_body': True}, parent=mock_parent_flow)
+        with pytest.raises(ValueError):
+            Step('name', {'url': 'https://test', 'body': 'template:a.json', 'stream_body': 'yes'},
+                 parent=mock_parent_flow)
@@ -0,0 +1,67 @@
+import pytest
+ijson = pytest.importorskip('ijson')
+from unittest.mock import patch
+from api_flow.stream import ANY_INDEX, ANY_KEY, StreamExtractor, compile_stream_path
+
+
+def extract(outputs, document, chunk_size=7):
+    extractor = StreamExtractor(outputs)
+    for start in range(0, len(document), chunk_size):
+        extractor.feed(document[start:start + chunk_size])
+    return extractor.close()
+
+
+class TestStream:
+    def test_requires_ijson(self):
+        with patch.dict('sys.modules', {'ijson': None}):
+            with pytest.raises(ImportError, match='ijson'):
+                StreamExtractor({'id': '$.id'})
+
+    def test_compile_stream_path(self):
+        assert compile_stream_path('$') == []
+        assert compile_stream_path('$.a.b') == ['a', 'b']
+        assert compile_stream_path("$['a b'][2]") == ['a b', 2]
+        assert compile_stream_path('$.a.*') == ['a', ANY_KEY]
+        assert compile_stream_path('$.a[*].id') == ['a', ANY_INDEX, 'id']
+
+    @pytest.mark.parametrize('expression', ['$..id', '$.a[-1]', '$.a[0:2]', '$.a[?(@.id)]', '$.a[0,1]'])
+    def test_compile_stream_path_unsupported(self, expression):
+        with pytest.raises(ValueError):
+            compile_stream_path(expression)
+
+    def test_extract(self):
+        document = b'{"count": 3, "items": [{"id": 1, "tags": ["a"]}, {"id": 2.5}, {"id": null}], "done": true}'
+        assert extract({
+            'count': '$.count',
+            'ids': '$.items[*].id',
+            'second': '$.items[1]',
+            'tag': '$.items[0].tags[0]',
+            'done': '$.done',
+            'missing': '$.missing',
+        }, document) == {
+            'count': [3],
+            'ids': [1, 2.5, None],
+            'second': [{'id': 2.5}],
+            'tag': ['a'],
+            'done': [True],
+            'missing': [],
+        }
+
+    def test_extract_nested_matches(self):
+        document = b'{"a": {"b": {"c": [1, {"d": 2}]}, "e": "E"}}'
+        assert extract({'a': '$.a', 'values': '$.a.*', 'c': '$.a.b.c', 'd': '$.a.b.c[1].d'}, document, 3) == {
+            'a': [{'b': {'c': [1, {'d': 2}]}, 'e': 'E'}],
+            'values': [{'c': [1, {'d': 2}]}, 'E'],
+            'c': [[1, {'d': 2}]],
+            'd': [2],
+        }
+
+    def test_extract_key_wildcard_skips_arrays(self):
+        assert extract({'keys': '$.list.*'}, b'{"list": [1, 2]}') == {'keys': []}
+
+    def test_extract_non_object(self):
+        assert extract({'id': '$.id'}, b'[{"id": 1}]') == {}
+
+    def test_extract_invalid(self):
+        with pytest.raises(ijson.JSONError):
+            extract({'id': '$.id'}, b'{"id": 1')
@@ -1,8 +1,11 @@
+import json
 import os
 import pytest
+from api_flow.complex_namespace import ComplexNamespace, freeze
 from api_flow.config import Config
 from api_flow.context import Context
-from api_flow.template import Template
+from api_flow.template import CompiledTemplate, Template
+from unittest.mock import patch
 
 
 @pytest.fixture(autouse=True)
@@ -79,3 +82,102 @@ class TestTemplate:
             'five': '',
             'six': 'The value is H.\n'
         }
+
+    def test_interpolate_namespace_without_downgrading(self, mock_context):
+        body = ComplexNamespace(**freeze({'items': [{'id': '{? str_value ?}'}], 'count': 1}))
+        with patch.object(ComplexNamespace, 'as_dict') as mock_as_dict:
+            output = Template.interpolate(body, mock_context)
+            assert Template.references(body) == {'str_value'}
+            mock_as_dict.assert_not_called()
+        assert output == {'items': [{'id': 'H'}], 'count': 1}
+        output['items'].append({})
+
+    def test_references(self):
+        assert Template.references({
+            'url': 'http://{? host ?}/{? step_one.id ?}/{? context.step_two["key"] ?}',
+            'list': ['{? step_three[0] ?}', 'template:test_template.txt', 123],
+            'function': '{? echo("not_a_reference") ?}',
+        }) == {'host', 'step_one', 'step_two', 'step_three', 'str_value'}
+        assert Template.references(None) == set()
+
+    def test_compile_is_cached_by_source(self):
+        compiled = Template.compile('Hello {? str_value ?}!')
+        assert isinstance(compiled, CompiledTemplate)
+        assert Template.compile('Hello {? str_value ?}!') is compiled
+        assert compiled.segments[0] == 'Hello '
+        assert compiled.segments[2] == '!'
+        assert compiled.references == {'str_value'}
+
+    def test_compiled_render(self, mock_context):
+        compiled = Template.compile(
+            '{? list_value[0] ?}{? context.dict_value.f.g ?}{? dict_value[d] ?}{? str_value!r ?}{? str_value:>3 ?}'
+        )
+        assert compiled.render(mock_context) == "aGD'H'  H"
+        assert Template.compile('no tags').render(mock_context) == 'no tags'
+        assert Template.compile('').render(mock_context) == ''
+
+    @pytest.mark.parametrize('field_name', [
+        'context', 'context.a', 'context.a.b[0].c', 'context[0][1]', 'context.a[x y]', 'context.a[-1]', 'context.a[b.c]'
+    ])
+    def test_split_field_name_matches_str_format(self, field_name):
+        class Recorder:
+            def __getattr__(self, name):
+                accessed.append((True, name))
+                return self
+
+            def __getitem__(self, key):
+                accessed.append((False, key))
+                return self
+
+            def __format__(self, format_spec):
+                return ''
+
+        accessed = []
+        f'{{{field_name}}}'.format(context=Recorder())
+        assert CompiledTemplate._split_field_name(field_name) == accessed
+
+    def test_split_field_name_unsupported(self):
+        assert CompiledTemplate._split_field_name('context.a.') is None
+        assert CompiledTemplate._split_field_name('context.a[0') is None
+
+    def test_compiled_render_missing_value(self, mock_context):
+        with pytest.raises(AttributeError):
+            Template.compile('{? missing_value ?}').render(mock_context)
+
+    def test_compiled_function_arguments_decoded_once(self, mock_context):
+        with patch('api_flow.template.json.loads', wraps=json.loads) as mock_loads:
+            compiled = CompiledTemplate('{? echo("ONCE") ?}')
+            assert compiled.render(mock_context) == 'ONCE'
+            assert compiled.render(mock_context) == 'ONCE'
+            mock_loads.assert_called_once()
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 8, 13, 64 * 1024])
+    def test_stream(self, mock_context, chunk_size):
+        with patch('api_flow.template.TEMPLATE_CHUNK_SIZE', chunk_size):
+            chunks = list(Template.stream('template:streamed_template.json', mock_context))
+        body = b''.join(chunks).decode('utf-8')
+        assert body == Template.interpolate_str('template:streamed_template.json', mock_context)
+        assert json.loads(body)['items'][1]['value'] == 'b'
+        assert json.loads(body)['pair'] == 'HH'
+        if chunk_size < 8:
+            assert len(chunks) > 1
+
+    def test_stream_closes_template_file(self, mock_context):
+        opened = []
+
+        def tracking_open(*args):
+            opened.append(open(*args))
+            return opened[-1]
+        chunks = Template.stream('template:test_template.txt', mock_context)
+        with patch('api_flow.template.open', side_effect=tracking_open):
+            assert next(chunks) == b'The value is H.\n'
+        assert not opened[0].closed
+        chunks.close()
+        assert opened[0].closed
+
+    def test_stream_plain_string(self, mock_context):
+        assert list(Template.stream('Hello {? str_value ?}', mock_context)) == [b'Hello H']
+
+    def test_stream_references(self):
+        with patch('api_flow.template.TEMPLATE_CHUNK_SIZE', 4):
+            assert Template.references('template:streamed_template.json') == {'str_value', 'list_value', 'dict_value'}